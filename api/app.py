@@ -1,21 +1,32 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 from pathlib import Path
+import hashlib
+import json
 import logging
 import math
-
-# Pull from algo
-from suggestion_algo import (
-    suggest_top_cities,
-    df_master,                 # master dataframe
-    PCA_SCORES                 # dict: feature -> weight (we use abs() as relevance)
-)
-
-# Try to import feature handling details for better “reason” scoring
-try:
-    from suggestion_algo import invert_vars, gold_vars
-except Exception:
-    invert_vars, gold_vars = [], []
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+_T_IMPORT = time.perf_counter()    # fallback startup clock where /proc isn't available
+
+# Pulled from suggestion_algo by _load_model() (background warm-up, see below)
+suggestion_algo = None         # df_master is parsed lazily on first access
+score_cities = None
+explain_rows = None            # batched per-city "topFeatures"
+quantize_prefs = None          # canonical prefs -> response-cache key
+ScoringSession = None          # incremental (per-slider) rescoring
+PREF_FEATURES = None
+CITY_INDEX = None              # normalized (city, state) -> row position
+CITY_FIPS = None               # raw county FIPS per row
+
+from response_cache import ResponseCache
+from metrics import METRICS, begin_timing, end_timing, server_timing_header
+from static_assets import StaticAssets
 
 HERE = Path(__file__).resolve().parent
 ROOT = HERE.parent
@@ -25,6 +36,37 @@ CORS(app, resources={r"/api/*": {"origins": "*"}})
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("cityfinder")
 
+# /api/suggest response cache (SUGGEST_CACHE_ENTRIES=0 disables; set
+# SUGGEST_CACHE_PATH to a SQLite file to share entries between workers)
+SUGGEST_QUANTUM      = float(os.getenv("SUGGEST_CACHE_QUANTUM", "0.1"))
+SUGGEST_GOLD_QUANTUM = float(os.getenv("SUGGEST_CACHE_GOLD_QUANTUM", "0.005"))
+SUGGEST_CACHE = ResponseCache(
+    max_entries=int(os.getenv("SUGGEST_CACHE_ENTRIES", "2048")),
+    max_bytes=int(float(os.getenv("SUGGEST_CACHE_MB", "32")) * (1 << 20)),
+    version="",                # set once the model is loaded
+    path=os.getenv("SUGGEST_CACHE_PATH") or None,
+)
+
+# "stream": true on /api/suggest -> NDJSON, enriched this many rows at a time
+SUGGEST_STREAM_CHUNK = int(os.getenv("SUGGEST_STREAM_CHUNK", "10"))
+_STREAM_CHUNK_MAX = 200
+
+# Static files: memory-cached, fingerprinted, precompressed by
+# `python static_assets.py --build` (see static_assets.py for the knobs)
+STATIC = StaticAssets(ROOT)
+
+# Model warm-up: MODEL_WARMUP=background (default) loads the recommender on a
+# thread so the worker serves /api/health, static files and /api/route at
+# once; model endpoints answer 503 + Retry-After until /api/ready says so.
+# MODEL_WARMUP=eager loads it during import, as before.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "background").strip().lower()
+WARMUP_RETRY_AFTER = int(os.getenv("WARMUP_RETRY_AFTER", "2"))       # seconds
+
+# Stage histograms at /api/metrics (METRICS_ENABLED=0 turns recording off);
+# a request opts in to a Server-Timing header with "X-Server-Timing: 1" or
+# ?timing=1, unless SERVER_TIMING=0.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1").strip().lower() not in ("0", "false", "no", "")
+
 
 # ─────────────────────────────────────────────────────────
 # helpers
@@ -49,31 +91,11 @@ def _row_to_dict(row):
 
 
 def _find_master_row(city, state):
-    """Loose match on common columns: city + state."""
-    if df_master is None or getattr(df_master, "empty", True):
-        return None
-
-    city = (city or "").strip().lower()
-    state = (state or "").strip().lower()
-
-    city_cols  = [c for c in ["city_ascii", "city", "City"] if c in df_master.columns]
-    state_cols = [c for c in ["State", "state", "STATE"] if c in df_master.columns]
-    if not city_cols or not state_cols:
+    """Loose match on common columns: city + state (precomputed hash index)."""
+    pos = CITY_INDEX.lookup(city, state)
+    if pos is None:
         return None
-
-    df = df_master
-    mask_city = False
-    for c in city_cols:
-        mask_city = mask_city | (df[c].astype(str).str.strip().str.lower() == city)
-
-    mask_state = False
-    for s in state_cols:
-        mask_state = mask_state | (df[s].astype(str).str.strip().str.lower() == state)
-
-    hits = df[mask_city & mask_state]
-    if hits.empty:
-        return None
-    return hits.iloc[0]
+    return suggestion_algo.df_master.iloc[pos]
 
 
 def _derive_state_fips(row_dict):
@@ -102,93 +124,181 @@ def _clamp(x, lo=0, hi=100):
     return max(lo, min(hi, x))
 
 
-# Precompute global stats for features we can reason about
-import pandas as pd
-_num_cols = []
-_means = {}
-_stds  = {}
-_ranges = {}
+def _bad_request(detail: str, error: str = "bad_request"):
+    return jsonify({"error": error, "detail": detail}), 400
 
-if df_master is not None and not df_master.empty:
-    for f in PCA_SCORES.keys():
-        if f in df_master.columns:
-            try:
-                s = pd.to_numeric(df_master[f], errors="coerce")
-                if s.notna().sum() > 3:
-                    _num_cols.append(f)
-                    _means[f]  = float(s.mean())
-                    _stds[f]   = float(s.std(ddof=0)) or 0.0
-                    _ranges[f] = float(s.max() - s.min()) or 0.0
-            except Exception:
-                pass
+
+def _positive_int(value, default: int, key: str = "limit", cap: int | None = None) -> int:
+    """A positive integer payload field (clamped to `cap`); ValueError otherwise."""
+    if value is None or value == "":
+        return default
+    try:
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError
+        n = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f'"{key}" must be an integer') from None
+    if n < 1:
+        raise ValueError(f'"{key}" must be >= 1')
+    return n if cap is None else min(n, cap)
+
+
+def _suggest_cache_key(qprefs: dict, limit: int, scale: str, filters=None) -> str:
+    """Quantized prefs + everything else that shapes the response."""
+    blob = json.dumps([suggestion_algo.MODEL_VERSION, limit, scale,
+                       [qprefs[f] for f in PREF_FEATURES], filters or None],
+                      separators=(",", ":"), sort_keys=True)
+    return hashlib.blake2b(blob.encode(), digest_size=16).hexdigest()
 
 
-def _city_top_features(city: str, state: str, prefs: dict, k: int = 5):
+def _city_top_features(city: str, state: str, prefs: dict, k: int = 5, pos=None):
     """
     Compute city-specific reasons:
       - For 'gold' features: score by closeness to the user's ideal (1 - |v-ideal|/range)
       - For others: score by |z-score| (how extreme the city is) with inversion respected
       Then weight by |PCA| * user importance.
     Returns a list of feature keys (NOT friendly names).
+    Single-city wrapper over explain_rows(); pass `pos` if already known.
     """
-    row = _find_master_row(city, state)
-    if row is None:
+    if pos is None:
+        pos = CITY_INDEX.lookup(city, state)
+    if pos is None:
         return []
+    return explain_rows([pos], prefs, k=k)[0]
 
-    scores = []
-    for f in _num_cols:
-        try:
-            v = float(row.get(f))
-        except Exception:
-            continue
-
-        pca_w = abs(float(PCA_SCORES.get(f, 0.0)))
-        if pca_w <= 0:
-            continue
-
-        # user importance: radio sliders 1..5, gold sliders are numeric "ideal"
-        raw_imp = prefs.get(f, 0)
-        try:
-            imp = float(raw_imp)
-        except Exception:
-            imp = 0.0
 
-        # Skip if the user said "not important" (or missing)
-        if imp <= 0:
-            continue
+# ─────────────────────────────────────────────────────────
+# model warm-up / readiness
+# ─────────────────────────────────────────────────────────
+MODEL_READY = threading.Event()
+STARTUP: dict = {"warmup": MODEL_WARMUP}
+_MODEL_ENDPOINTS = {"api_suggest", "api_suggest_session_new", "api_suggest_session_update"}
 
-        if f in gold_vars:
-            # Ideal value from prefs for gold features
-            ideal = imp  # for gold, we stored the slider numeric as the value itself
-            rng   = _ranges.get(f, 0.0)
-            if rng <= 0:
-                continue
-            # closeness 0..1
-            closeness = 1.0 - (abs(v - ideal) / rng)
-            closeness = max(0.0, min(1.0, closeness))
-            feat_score = pca_w * closeness
-        else:
-            # Standard z-score magnitude (how distinctive is this city)
-            mu  = _means.get(f, 0.0)
-            sd  = _stds.get(f, 0.0) or 0.0
-            if sd <= 0:
-                continue
-            z = (v - mu) / sd
-            # if "bad-is-high" invert feature, flip sign so high value becomes bad
-            if f in invert_vars:
-                z = -z
-            feat_score = pca_w * abs(z)
 
-        # Finally weight by user *importance* for non-gold (1..5).
-        # For gold, we already used the ideal numeric; scale by 1 (treat closeness itself as the "importance").
-        if f not in gold_vars:
-            feat_score *= imp
+def _process_age() -> float:
+    """Seconds since this process started (exec, or fork for a gunicorn worker)."""
+    try:
+        with open("/proc/self/stat") as fh:
+            ticks = int(fh.read().rsplit(")", 1)[1].split()[19])       # field 22: starttime
+        with open("/proc/uptime") as fh:
+            uptime = float(fh.read().split()[0])
+        return max(0.0, uptime - ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.perf_counter() - _T_IMPORT
+
+
+def _load_model(strict: bool = False) -> None:
+    """Import the recommender, score once (pages in the mmapped arrays), then publish it."""
+    global suggestion_algo, score_cities, explain_rows, quantize_prefs, ScoringSession
+    global PREF_FEATURES, CITY_INDEX, CITY_FIPS
+    t0 = time.perf_counter()
+    try:
+        import suggestion_algo as sa
+        sa.score_cities({}, top_n=1)
+    except Exception as e:
+        if strict:
+            raise
+        STARTUP["error"] = f"{type(e).__name__}: {e}"
+        log.exception("model warm-up failed")
+        return
+    suggestion_algo, score_cities, explain_rows = sa, sa.score_cities, sa.explain_rows
+    quantize_prefs, ScoringSession = sa.quantize_prefs, sa.ScoringSession
+    PREF_FEATURES, CITY_INDEX, CITY_FIPS = sa.PREF_FEATURES, sa.CITY_INDEX, sa.CITY_FIPS
+    SUGGEST_CACHE.ensure_version(sa.MODEL_VERSION)
+    STARTUP["modelSeconds"] = round(time.perf_counter() - t0, 3)
+    STARTUP["readySeconds"] = round(_process_age(), 3)
+    MODEL_READY.set()
+    log.info("pid %s model ready: loaded in %.2fs, %.2fs after process start",
+             os.getpid(), STARTUP["modelSeconds"], STARTUP["readySeconds"])
+
+
+def _start_warmup() -> None:
+    threading.Thread(target=_load_model, name="model-warmup", daemon=True).start()
+
+
+def _restart_warmup_after_fork() -> None:
+    # forked (gunicorn preload_app) before the parent's warm-up finished: the
+    # thread didn't come along, so drop any half-imported model and start over
+    if not MODEL_READY.is_set():
+        sys.modules.pop("suggestion_algo", None)
+        STARTUP.pop("error", None)
+        _start_warmup()
+
+
+def _unavailable(body: dict):
+    resp = jsonify(body)
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(WARMUP_RETRY_AFTER)
+    return resp
 
-        if feat_score > 0:
-            scores.append((feat_score, f))
 
-    scores.sort(reverse=True)
-    return [f for _, f in scores[:k]]
+# ─────────────────────────────────────────────────────────
+# instrumentation
+# ─────────────────────────────────────────────────────────
+def _timing_requested() -> bool:
+    return SERVER_TIMING and (request.headers.get("X-Server-Timing", "") not in ("", "0")
+                              or request.args.get("timing", "") not in ("", "0"))
+
+
+@app.before_request
+def _start_timing():
+    wanted = _timing_requested()
+    if METRICS.enabled or wanted:
+        g.t0 = time.perf_counter()
+        if wanted:
+            begin_timing()
+
+
+@app.before_request
+def _require_model():
+    if (request.endpoint in _MODEL_ENDPOINTS and request.method != "OPTIONS"
+            and not MODEL_READY.is_set()):
+        METRICS.inc("warmup_rejected", endpoint=request.endpoint)
+        failed = STARTUP.get("error")
+        return _unavailable({"error": "model_unavailable", "detail": failed} if failed else
+                            {"error": "model_warming_up", "retryAfter": WARMUP_RETRY_AFTER})
+
+
+@app.after_request
+def _finish_timing(resp):
+    t0 = g.pop("t0", None)
+    if t0 is None:
+        return resp
+    total = time.perf_counter() - t0
+    METRICS.observe("request_seconds", total, endpoint=request.endpoint or "unknown",
+                    status=str(resp.status_code))
+    timings = end_timing()
+    if timings is not None:
+        resp.headers["Server-Timing"] = server_timing_header(timings, total)
+        resp.headers["Timing-Allow-Origin"] = "*"
+    return resp
+
+
+@app.teardown_request
+def _drop_timing(exc=None):
+    end_timing()                                   # never leak into the next request
+
+
+METRICS.describe("request_seconds", "Wall time per request, by endpoint and status.")
+METRICS.gauge("suggest_cache", lambda: {(("stat", k),): v for k, v in SUGGEST_CACHE.stats().items()
+                                        if k in ("entries", "bytes", "hits", "misses", "evictions")},
+              "Response cache counters for /api/suggest (this worker).")
+METRICS.gauge("static_cache", lambda: {(("stat", k),): v for k, v in STATIC.stats().items()},
+              "Static file cache counters (this worker).")
+METRICS.gauge("startup_seconds", lambda: {(("phase", k.removesuffix("Seconds")),): v
+                                          for k, v in STARTUP.items() if k.endswith("Seconds")},
+              "Startup: process start -> serving, model load, process start -> ready.")
+METRICS.describe("warmup_rejected", "Model requests answered 503 during warm-up.")
+METRICS.gauge("suggest_sessions", lambda: {(): len(_SESSIONS)}, "Live scoring sessions (this worker).")
+
+
+@app.get("/api/metrics")
+def api_metrics():
+    """Prometheus text format: stage / request histograms and counters (this worker)."""
+    if not METRICS.enabled:
+        return jsonify({"error": "metrics_disabled"}), 404
+    return app.response_class(METRICS.render(),
+                              content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 # ─────────────────────────────────────────────────────────
@@ -200,78 +310,91 @@ def api_suggest():
     Returns top-N suggestions enriched with:
       - stateFIPS (for image lookup)
       - topFeatures (city-specific reasons using PCA + user prefs + city stats)
-      - scaledScore (0-100 using *global* min/max across all cities)
+      - scaledScore (0-100 using *global* min/max across all cities, or the
+        city's global percentile when payload "scale" == "percentile")
+    Optional "filters" (radius / states / numeric ranges, see row_filter)
+    restrict which cities are scored; scaling then uses the filtered set.
+    A malformed filter or limit is a 400.
+    Preferences are quantized first (quantize_prefs) and the response body is
+    cached per (quantized prefs, limit, scale, model version); a hit skips
+    scoring, explanations and FIPS lookup. X-Cache says which one happened.
+    "stream": true (or Accept: application/x-ndjson) streams NDJSON instead,
+    see _stream_suggestions.
     """
     payload = request.get_json(silent=True) or {}
-    prefs   = payload.get("preferences") or {}
-    limit   = int(payload.get("limit") or payload.get("top") or 25)
+    try:
+        limit = _positive_int(payload.get("limit") or payload.get("top"), 25)
+        chunk = _positive_int(payload.get("chunk"), SUGGEST_STREAM_CHUNK, "chunk", _STREAM_CHUNK_MAX)
+    except ValueError as e:
+        return _bad_request(str(e))
+    scale   = str(payload.get("scale") or "minmax").strip().lower()
+    prefs   = quantize_prefs(payload.get("preferences") or {},
+                             SUGGEST_QUANTUM, SUGGEST_GOLD_QUANTUM)
+    filters = payload.get("filters") or None
+    stream  = bool(payload.get("stream")) or "application/x-ndjson" in request.headers.get("Accept", "")
+
+    SUGGEST_CACHE.ensure_version(suggestion_algo.MODEL_VERSION)
+    cache_key = _suggest_cache_key(prefs, limit, scale, filters)
+    body = SUGGEST_CACHE.get(cache_key)
+    if body is not None:
+        if stream:
+            return _ndjson_response(_stream_cached(body, scale), "HIT")
+        return app.response_class(body, mimetype="application/json",
+                                  headers={"X-Cache": "HIT"})
+
+    # 1) One scoring pass: top-N + global distribution (min/max/percentiles)
+    try:
+        result = score_cities(prefs, top_n=limit, filters=filters)
+    except ValueError as e:
+        return _bad_request(str(e), "bad_filter")
 
-    # 1) Get top-N (these may include raw 'score')
-    topN = suggest_top_cities(prefs, top_n=limit)
+    if stream:
+        return _ndjson_response(_stream_suggestions(result, prefs, scale, chunk), "MISS")
 
-    # 2) Global min/max (try to score all; fallback to topN range)
-    global_min = None
-    global_max = None
-    try:
-        all_scored = suggest_top_cities(prefs, top_n=10_000_000)
-        if all_scored and isinstance(all_scored, list):
-            vals = []
-            for it in all_scored:
-                if isinstance(it, dict) and "score" in it:
-                    try: vals.append(float(it["score"]))
-                    except Exception: pass
-            if vals:
-                global_min, global_max = min(vals), max(vals)
-    except Exception as e:
-        log.info("Global min/max fallback (reason: %s)", e)
-
-    if global_min is None or global_max is None:
-        vals = []
-        for it in (topN or []):
-            if isinstance(it, dict) and "score" in it:
-                try: vals.append(float(it["score"]))
-                except Exception: pass
-        if vals:
-            global_min, global_max = min(vals), max(vals)
-
-    if global_min is None: global_min = 0.0
-    if global_max is None: global_max = 1.0
-    same = (abs(global_max - global_min) < 1e-12)
-
-    # 3) Normalize + enrich
-    items = []
-    for item in (topN or []):
-        # Normalize city/state and pull through algo-provided score (if present)
-        if isinstance(item, str):
-            city_part, state_part = (item.split(",", 1) + [""])[:2]
-            city_part  = city_part.strip()
-            state_part = state_part.strip()
-            raw_score  = None
-        elif isinstance(item, dict):
-            city_part  = (item.get("cityName") or item.get("city_ascii")
-                          or item.get("city") or "").strip()
-            state_part = (item.get("stateName") or item.get("State")
-                          or item.get("state") or "").strip()
-            raw_score  = item.get("score", None)
-        else:
-            city_part, state_part, raw_score = str(item), "", None
+    # 2) + 3) reasons, FIPS, scaling
+    items = _suggestion_items(result, prefs, scale)
+    with METRICS.stage("suggest.serialize"):
+        resp = jsonify({"suggestions": items})
+    SUGGEST_CACHE.put(cache_key, resp.get_data())
+    resp.headers["X-Cache"] = "MISS"
+    return resp
 
-        # state FIPS for image path
-        row = _find_master_row(city_part, state_part)
-        state_fips = _derive_state_fips(_row_to_dict(row))
 
-        # universal 0–100 scaling
-        if raw_score is not None and not same:
-            try:
-                scaled = 100.0 * (float(raw_score) - float(global_min)) / (float(global_max) - float(global_min))
-                scaled = int(round(_clamp(scaled)))
-            except Exception:
-                scaled = None
-        else:
-            scaled = 100 if raw_score is not None else None
+def _suggestion_items(result, prefs: dict, scale: str) -> dict:
+    """{"1": {...}, "2": {...}} for a ScoreResult, as /api/suggest returns them."""
+    items = _enrich(result, result.top_idx, prefs, scale)
+    return {str(i): it for i, it in enumerate(items, start=1)}
+
+
+def _enrich(result, positions, prefs: dict, scale: str) -> list:
+    """Response items for `positions` (all of top_idx, or one streamed chunk)."""
+    with METRICS.stage("suggest.rows"):
+        topN = result.suggestions(positions)
+
+    # City-specific reasons for every returned row in one batched pass
+    with METRICS.stage("suggest.explain"):
+        reasons_all = explain_rows(positions, prefs, k=5)
 
-        # city-specific reasons
-        reasons = _city_top_features(city_part, state_part, prefs, k=5)
+    # state FIPS for image path
+    with METRICS.stage("suggest.fips"):
+        fips_all = [_derive_state_fips({"FIPS": CITY_FIPS[pos]}) for pos in positions]
+
+    # Normalize + enrich
+    items = []
+    for item, reasons, state_fips in zip(topN, reasons_all, fips_all):
+        city_part  = item["cityName"].strip()
+        state_part = item["stateName"].strip()
+        raw_score  = item["score"]
+
+        # universal 0–100 scaling
+        try:
+            if scale == "percentile":
+                scaled = result.percentile_rank(raw_score)
+            else:
+                scaled = result.minmax_scaled(raw_score)
+            scaled = int(round(_clamp(scaled)))
+        except Exception:
+            scaled = None
 
         items.append({
             "cityName": city_part,
@@ -281,9 +404,206 @@ def api_suggest():
             "rawScore": raw_score,
             "scaledScore": scaled
         })
+    return items
+
+
+# ── NDJSON streaming ─────────────────────────────────────────────────
+# One JSON object per line:
+#   {"meta": {"count": N, "scale": ..., "chunk": ...}}
+#   {"rank": 1, "cityName": ..., ...}      one line per suggestion, best first
+#   {"done": true, "count": N}              (or {"error": ...} if enrichment fails)
+# Scoring happens before the first byte (ranking needs every score);
+# reasons / FIPS / serialization then run one chunk at a time, so the first
+# cards arrive without waiting for the whole list. Chunks start at "chunk"
+# rows and double (up to _STREAM_CHUNK_MAX) so long lists keep batch speed.
+# Streamed responses read the response cache but don't fill it.
+def _ndjson(obj) -> bytes:
+    return (json.dumps(obj, separators=(",", ":")) + "\n").encode()
+
+
+def _ndjson_response(lines, cache: str):
+    return app.response_class(lines, mimetype="application/x-ndjson",
+                              headers={"X-Cache": cache, "X-Accel-Buffering": "no"})
+
+
+def _stream_suggestions(result, prefs: dict, scale: str, chunk: int):
+    n = len(result.top_idx)
+    yield _ndjson({"meta": {"count": n, "scale": scale, "chunk": chunk}})
+    try:
+        start, size = 0, chunk
+        while start < n:
+            items = _enrich(result, result.top_idx[start:start + size], prefs, scale)
+            with METRICS.stage("suggest.serialize"):
+                block = b"".join(_ndjson({"rank": start + i, **it})
+                                 for i, it in enumerate(items, start=1))
+            yield block
+            start += size
+            size = max(size, min(2 * size, _STREAM_CHUNK_MAX))
+    except Exception as e:
+        # headers are gone already: report in-band so the client can tell
+        log.exception("suggest stream failed")
+        yield _ndjson({"error": "stream_failed", "detail": str(e)})
+        return
+    yield _ndjson({"done": True, "count": n})
+
+
+def _stream_cached(body: bytes, scale: str):
+    items = json.loads(body).get("suggestions") or {}
+    yield _ndjson({"meta": {"count": len(items), "scale": scale, "chunk": len(items)}})
+    yield b"".join(_ndjson({"rank": int(r), **it}) for r, it in items.items())
+    yield _ndjson({"done": True, "count": len(items)})
+
+
+# ── incremental sessions (live re-ranking while a slider moves) ──────
+SESSION_MAX = int(os.getenv("SUGGEST_SESSION_MAX", "1000"))
+SESSION_TTL = float(os.getenv("SUGGEST_SESSION_TTL", "1800"))      # seconds idle
+_SESSIONS: "OrderedDict[str, dict]" = OrderedDict()
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _session_get(sid: str):
+    with _SESSIONS_LOCK:
+        entry = _SESSIONS.get(sid)
+        if entry is None or time.monotonic() - entry["seen"] > SESSION_TTL:
+            _SESSIONS.pop(sid, None)
+            return None
+        entry["seen"] = time.monotonic()
+        _SESSIONS.move_to_end(sid)
+        return entry
+
 
-    suggestions = {str(i): it for i, it in enumerate(items, start=1)}
-    return jsonify({"suggestions": suggestions})
+def _session_put(sid: str, entry: dict) -> None:
+    entry["seen"] = time.monotonic()
+    with _SESSIONS_LOCK:
+        _SESSIONS[sid] = entry
+        _SESSIONS.move_to_end(sid)
+        while len(_SESSIONS) > SESSION_MAX:
+            _SESSIONS.popitem(last=False)
+
+
+def _session_response(sid: str, entry: dict, limit: int, scale: str, t0: float):
+    with entry["lock"]:
+        sess = entry["session"]
+        result = sess.result(limit)
+        items = _suggestion_items(result, sess.prefs, scale)
+    return jsonify({"sessionId": sid, "suggestions": items,
+                    "serverMs": round((time.perf_counter() - t0) * 1000, 3)})
+
+
+def _new_session(prefs: dict, limit: int, scale: str) -> dict:
+    prefs = dict(prefs) if isinstance(prefs, dict) else {}
+    return {"session": ScoringSession(quantize_prefs(prefs, SUGGEST_QUANTUM, SUGGEST_GOLD_QUANTUM)),
+            "raw": prefs, "lock": threading.Lock(), "limit": limit, "scale": scale}
+
+
+@app.post("/api/suggest/session")
+def api_suggest_session_new():
+    """
+    Start a scoring session: {"preferences", "limit", "scale"} -> the same
+    suggestions as /api/suggest plus a sessionId for incremental updates.
+    """
+    t0 = time.perf_counter()
+    payload = request.get_json(silent=True) or {}
+    try:
+        limit = _positive_int(payload.get("limit") or payload.get("top"), 25)
+    except ValueError as e:
+        return _bad_request(str(e))
+    scale = str(payload.get("scale") or "minmax").strip().lower()
+    sid = uuid.uuid4().hex
+    entry = _new_session(payload.get("preferences") or {}, limit, scale)
+    _session_put(sid, entry)
+    return _session_response(sid, entry, limit, scale, t0)
+
+
+@app.post("/api/suggest/session/<sid>")
+def api_suggest_session_update(sid):
+    """
+    {"changes": {feature: value, ...}} -> re-ranked suggestions, applying
+    only the changed features (rank-1 updates). Sessions live per worker and
+    expire when idle; sending the full "preferences" too lets a worker that
+    doesn't know the session rebuild it instead of answering 404.
+    """
+    t0 = time.perf_counter()
+    payload = request.get_json(silent=True) or {}
+    changes = payload.get("changes") or {}
+    if not isinstance(changes, dict):
+        return _bad_request('"changes" must be an object')
+    entry = _session_get(sid)
+    if entry is None or entry["session"].version != suggestion_algo.MODEL_VERSION:
+        if not isinstance(payload.get("preferences"), dict):
+            return jsonify({"error": "session_not_found"}), 404
+        entry = _new_session(payload["preferences"], 25, "minmax")
+        _session_put(sid, entry)
+    try:
+        limit = _positive_int(payload.get("limit"), entry["limit"])
+    except ValueError as e:
+        return _bad_request(str(e))
+    scale = str(payload.get("scale") or entry["scale"]).strip().lower()
+    with entry["lock"]:
+        entry["raw"].update(changes)
+        # same quantization as /api/suggest; update() skips unchanged values
+        entry["session"].update(quantize_prefs(entry["raw"], SUGGEST_QUANTUM,
+                                               SUGGEST_GOLD_QUANTUM))
+    return _session_response(sid, entry, limit, scale, t0)
+
+
+@app.delete("/api/suggest/session/<sid>")
+def api_suggest_session_end(sid):
+    with _SESSIONS_LOCK:
+        _SESSIONS.pop(sid, None)
+    return ("", 204)
+
+
+@app.get("/api/cache/stats")
+def api_cache_stats():
+    """Hit-rate / size counters for this worker's response cache."""
+    return jsonify({"suggest": SUGGEST_CACHE.stats()})
+
+
+def _route_params(payload: dict) -> dict:
+    """
+    build_route keyword arguments from a route payload; ValueError when
+    malformed, so bad options are a 400 before anything is geocoded.
+    trip_mapper caps starts / budget / stage budgets, so a client can't ask
+    for unbounded work.
+    """
+    from trip_mapper import CONSTRUCTORS, SOLVER_MODES  # type: ignore
+
+    out = {}
+    for key, kind in (("starts", "an integer"), ("seed", "an integer"), ("budget", "a number"),
+                      ("dayKm", "a number")):
+        v = payload.get(key)
+        if v is None or v == "":
+            out[key] = None
+            continue
+        try:
+            if isinstance(v, bool):
+                raise ValueError
+            x = float(v)
+            if not math.isfinite(x) or (kind == "an integer" and not x.is_integer()):
+                raise ValueError
+            out[key] = int(x) if kind == "an integer" else x
+        except (TypeError, ValueError):
+            raise ValueError(f'"{key}" must be {kind}') from None
+    if out["dayKm"] is not None and out["dayKm"] <= 0:
+        raise ValueError('"dayKm" must be > 0')
+
+    mode = payload.get("mode") or "fast"
+    if not isinstance(mode, str) or mode not in SOLVER_MODES:
+        raise ValueError(f'"mode" must be one of {", ".join(SOLVER_MODES)}')
+    construct = payload.get("construct") or None
+    if construct is not None and (not isinstance(construct, str) or construct not in CONSTRUCTORS):
+        raise ValueError(f'"construct" must be one of {", ".join(CONSTRUCTORS)}')
+    improve = payload.get("improve")
+    if improve is not None and not isinstance(improve, list):
+        raise ValueError('"improve" must be a list of stages')
+    large = payload.get("large")
+    if large is not None and not isinstance(large, bool):
+        raise ValueError('"large" must be true or false')
+
+    return {"mode": mode, "construct": construct, "improve": improve, "large": large,
+            "day_km": out["dayKm"], "starts": out["starts"] or 1, "seed": out["seed"],
+            "budget": out["budget"]}
 
 
 @app.route("/api/route", methods=["POST", "OPTIONS"])
@@ -295,18 +615,25 @@ def api_route():
     payload = request.get_json(silent=True) or {}
     home  = (payload.get("home") or "").strip()
     stops = payload.get("stops") or []
+    try:
+        params = _route_params(payload)
+    except ValueError as e:
+        return _bad_request(str(e))
 
     try:
         # Keep using your Google-backed solver
         from trip_mapper import build_route  # type: ignore
-        data = build_route(home, stops)
+        data = build_route(home, stops, **params)
 
         # Validate expected shape for the frontend
         if not isinstance(data, dict) or "coordinates" not in data or "order" not in data:
-            raise ValueError("trip_mapper.build_route returned unexpected shape")
+            raise RuntimeError("trip_mapper.build_route returned unexpected shape")
 
         return jsonify(data)
 
+    except ValueError as e:
+        # bad solver options (unknown stage / mode, non-numeric budgets, ...)
+        return _bad_request(str(e))
     except Exception as e:
         # Important: return JSON, not a proxy 502, so GH Pages can show a useful message
         app.logger.exception("build_route failed")
@@ -320,37 +647,56 @@ def api_route():
 # static
 # ─────────────────────────────────────────────────────────
 @app.get("/")
-def index(): return send_from_directory(ROOT, "index.html")
+def index(): return STATIC.page("index.html")
 
 @app.get("/assets/<path:fn>")
-def assets(fn): return send_from_directory(ROOT / "assets", fn)
+def assets(fn): return STATIC.serve(f"assets/{fn}")
 
 @app.get("/css/<path:fn>")
-def css(fn): return send_from_directory(ROOT / "css", fn)
+def css(fn): return STATIC.serve(f"css/{fn}")
 
 @app.get("/js/<path:fn>")
-def js(fn): return send_from_directory(ROOT / "js", fn)
+def js(fn): return STATIC.serve(f"js/{fn}")
 
 @app.get("/components/<path:fn>")
-def components(fn): return send_from_directory(ROOT / "components", fn)
+def components(fn): return STATIC.serve(f"components/{fn}")
 
 @app.get("/city_images/<path:fn>")
-def city_images(fn): return send_from_directory(ROOT / "city_images", fn)
+def city_images(fn): return STATIC.serve(f"city_images/{fn}")
 
 @app.get("/data/<path:fn>")
-def data_files(fn): return send_from_directory(ROOT / "data", fn)
+def data_files(fn): return STATIC.serve(f"data/{fn}")
 
 @app.get("/favicon.ico")
 def favicon():
-    assets_dir = ROOT / "assets"
-    ico = assets_dir / "favicon.ico"
-    if ico.exists():
-        return send_from_directory(assets_dir, "favicon.ico")
+    if (ROOT / "assets" / "favicon.ico").exists():
+        return STATIC.serve("assets/favicon.ico")
     return ("", 204)
 
 @app.get("/api/health")
 def api_health():
-    return jsonify({"ok": True})
+    """Liveness: this worker answers (the model may still be warming up)."""
+    return jsonify({"ok": True, "ready": MODEL_READY.is_set()})
+
+@app.get("/api/ready")
+def api_ready():
+    """Readiness: 200 once the model is loaded, else 503 + Retry-After."""
+    if not MODEL_READY.is_set():
+        return _unavailable({"ready": False, **STARTUP})
+    return jsonify({"ready": True, **STARTUP})
+
+
+# startup: eager loads the model before the worker can serve; background
+# serves right away and publishes the model from a thread
+if MODEL_WARMUP == "eager":
+    _load_model(strict=True)
+STARTUP["servingSeconds"] = round(_process_age(), 3)
+log.info("pid %s serving %.2fs after process start (warm-up: %s)",
+         os.getpid(), STARTUP["servingSeconds"], MODEL_WARMUP)
+if MODEL_WARMUP != "eager":
+    _start_warmup()
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_warmup_after_fork)
 
 if __name__ == "__main__":
     app.run(port=5000, debug=True)
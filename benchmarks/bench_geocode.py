@@ -0,0 +1,92 @@
+"""
+Geocoding fan-out: sequential vs the bounded thread pool in trip_mapper,
+against a local fake geocoder with injected latency and its own QPS cap
+(it answers OVER_QUERY_LIMIT when the cap is exceeded, like Google does).
+
+    python benchmarks/bench_geocode.py                         # 10 / 30 / 100 stops
+    python benchmarks/bench_geocode.py --latency 0.15 --workers 16 --qps 50
+    python benchmarks/bench_geocode.py --provider-qps 20       # force quota errors
+
+No network and no persistent cache are touched.
+"""
+
+
+from __future__ import annotations
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import trip_mapper as tm  # noqa: E402
+from googlemaps import exceptions as gmaps_exc  # noqa: E402
+from rate_limit import TokenBucket  # noqa: E402
+
+
+class FakeGeocoder:
+    """Stands in for googlemaps.Client: sleeps `latency` (+/- jitter) per call."""
+
+    def __init__(self, latency: float, jitter: float = 0.3, provider_qps: float = 0.0,
+                 seed: int = 0) -> None:
+        self.latency, self.jitter, self.provider_qps = latency, jitter, provider_qps
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent: deque = deque()
+        self.calls = self.rejected = 0
+        self.in_flight = self.peak = 0
+
+    def geocode(self, q: str):
+        with self._lock:
+            now = time.perf_counter()
+            self.calls += 1
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            if self.provider_qps and len(self._recent) >= self.provider_qps:
+                self.rejected += 1
+                raise gmaps_exc.ApiError("OVER_QUERY_LIMIT", "fake quota")
+            self._recent.append(now)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            delay = self.latency * (1 + self._rng.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        with self._lock:
+            self.in_flight -= 1
+        h = sum(map(ord, q))
+        return [{"geometry": {"location": {"lat": 25 + h % 24, "lng": -124 + h % 57}}}]
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 30, 100])
+    ap.add_argument("--latency", type=float, default=0.1, help="seconds per fake call")
+    ap.add_argument("--workers", type=int, default=tm.GEOCODE_WORKERS)
+    ap.add_argument("--qps", type=float, default=tm.GEOCODE_QPS, help="our token-bucket rate")
+    ap.add_argument("--provider-qps", type=float, default=0.0,
+                    help="fake provider's cap (0 = unlimited)")
+    args = ap.parse_args(argv)
+
+    print(f"{'stops':>6} {'workers':>7} {'seconds':>8} {'calls':>6} {'rejected':>8} "
+          f"{'peak':>5} {'speedup':>8}")
+    for n in args.sizes:
+        names = [f"Fake City {i}, ST" for i in range(n)]
+        base = None
+        for workers in (1, args.workers):
+            fake = FakeGeocoder(args.latency, provider_qps=args.provider_qps)
+            limiter = TokenBucket(args.qps)          # fresh, in-process bucket per run
+            t0 = time.perf_counter()
+            out = tm._geocode_many(names, fake, cache=False, workers=workers,
+                                   limiter=limiter, local=[])
+            dt = time.perf_counter() - t0
+            assert list(out) == names, "results out of input order"
+            base = base or dt
+            print(f"{n:>6} {workers:>7} {dt:>8.2f} {fake.calls:>6} {fake.rejected:>8} "
+                  f"{fake.peak:>5} {base / dt:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
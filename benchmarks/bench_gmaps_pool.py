@@ -0,0 +1,98 @@
+"""
+Per-request googlemaps clients vs the pooled process-wide client, against a
+local keep-alive HTTP server that fakes the Geocoding API. A simulated
+handshake delay is paid on every new connection (stand-in for TCP + TLS).
+
+    python benchmarks/bench_gmaps_pool.py                     # 20 routes x 8 stops
+    python benchmarks/bench_gmaps_pool.py --routes 50 --handshake 0.08
+
+Reports wall time plus connection-setup vs request time from http_pool. The
+fake handshake runs server-side after accept, so it lands in the request
+time of each fresh connection; "connects" is the number to compare.
+"""
+
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import trip_mapper as tm  # noqa: E402
+from http_pool import HTTP_TIMING  # noqa: E402
+from rate_limit import TokenBucket  # noqa: E402
+
+FAKE_KEY = "AIzaFakeKeyForLocalBenchmarkOnly"
+
+
+def fake_server(handshake: float, latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"          # keep-alive
+        wbufsize = 64 * 1024                   # headers + body in one segment (no Nagle stall)
+
+        def setup(self):
+            time.sleep(handshake)              # once per new connection
+            super().setup()
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = json.dumps({"status": "OK", "results": [
+                {"geometry": {"location": {"lat": 30.0, "lng": -97.0}}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def run(routes: int, stops: int, pooled: bool) -> float:
+    limiter = TokenBucket(10_000)
+    t0 = time.perf_counter()
+    for r in range(routes):
+        client = tm._gmaps_client() if pooled else tm._new_gmaps_client()
+        names = [f"Route {r} Stop {i}" for i in range(stops)]
+        tm._geocode_many(names, client, cache=False, local=[], limiter=limiter)
+    return time.perf_counter() - t0
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--routes", type=int, default=20)
+    ap.add_argument("--stops", type=int, default=8)
+    ap.add_argument("--handshake", type=float, default=0.05, help="seconds per new connection")
+    ap.add_argument("--latency", type=float, default=0.01, help="seconds per request")
+    args = ap.parse_args(argv)
+
+    srv = fake_server(args.handshake, args.latency)
+    os.environ["GMAPS_KEY"] = FAKE_KEY
+    os.environ["GMAPS_BASE_URL"] = f"http://127.0.0.1:{srv.server_address[1]}"
+
+    print(f"{'client':>12} {'seconds':>8} {'connects':>9} {'connect ms':>11} "
+          f"{'requests':>9} {'request avg ms':>15}")
+    for label, pooled in (("per-request", False), ("pooled", True)):
+        HTTP_TIMING.reset()
+        dt = run(args.routes, args.stops, pooled)
+        snap = HTTP_TIMING.snapshot()
+        conn, req = snap.get("connect", {}), snap.get("request", {})
+        print(f"{label:>12} {dt:>8.2f} {conn.get('count', 0):>9} {conn.get('totalMs', 0):>11.1f} "
+              f"{req.get('count', 0):>9} {req.get('avgMs', 0):>15.2f}")
+    srv.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
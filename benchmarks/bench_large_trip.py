@@ -0,0 +1,65 @@
+"""
+Very large trips: one solve_tour over every stop vs the divide-and-conquer
+solver (solve_large), on random points across the contiguous US.
+
+    python benchmarks/bench_large_trip.py                     # 5k / 20k / 50k stops
+    python benchmarks/bench_large_trip.py --sizes 20000 --workers 1 4 8
+    python benchmarks/bench_large_trip.py --modes quality --cluster-size 500
+
+"km" is the looped route length; the clustered rows also show how many
+clusters were solved and how long the seam repair took.
+"""
+
+
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import trip_mapper as tm  # noqa: E402
+
+
+def random_points(n: int, seed: int = 0):
+    r = np.random.default_rng(seed)
+    return list(zip(r.uniform(25, 49, n).tolist(), r.uniform(-124, -67, n).tolist()))
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[5_000, 20_000, 50_000])
+    ap.add_argument("--modes", nargs="+", default=["fast", "quality"], choices=list(tm.SOLVER_MODES))
+    ap.add_argument("--workers", type=int, nargs="+", default=[tm._solver_workers()])
+    ap.add_argument("--cluster-size", type=int, default=tm.TRIP_CLUSTER_SIZE)
+    ap.add_argument("--skip-single", action="store_true", help="only run the clustered solver")
+    args = ap.parse_args(argv)
+
+    tm._neighbor_lists(tm._build_distance_matrix(random_points(3000)))   # sklearn import off the clock
+    print(f"{'stops':>7} {'mode':>8} {'solver':>12} {'seconds':>8} {'km':>10} {'clusters':>9} {'repair s':>9}")
+    for n in args.sizes:
+        pts = random_points(n)
+        for mode in args.modes:
+            if not args.skip_single:
+                t0 = time.perf_counter()
+                D = tm._build_distance_matrix(pts)
+                tour, _ = tm.solve_tour(D, pts, 0, mode=mode)
+                secs = time.perf_counter() - t0
+                print(f"{n:>7} {mode:>8} {'single':>12} {secs:>8.2f} "
+                      f"{tm._tour_length(tour, D) / 1000:>10.0f} {'':>9} {'':>9}", flush=True)
+            for w in args.workers:
+                t0 = time.perf_counter()
+                tour, stats = tm.solve_large(pts, 0, mode=mode, cluster_size=args.cluster_size, workers=w)
+                secs = time.perf_counter() - t0
+                km = stats["stages"][-1]["km"]
+                repair = stats["stages"][-1]["ms"] / 1000
+                print(f"{n:>7} {mode:>8} {f'clusters/{w}':>12} {secs:>8.2f} {km:>10.0f} "
+                      f"{stats['clusters']:>9} {repair:>9.2f}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
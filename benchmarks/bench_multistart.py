@@ -0,0 +1,58 @@
+"""
+Multi-start routing: tour length of the single-start pipeline vs the best of
+K seeded starts (solve_multistart), on random points across the contiguous US.
+
+    python benchmarks/bench_multistart.py                       # 50 / 200 / 500 stops
+    python benchmarks/bench_multistart.py --starts 4 8 16 --workers 4
+    python benchmarks/bench_multistart.py --mode quality --budget 5
+
+Every run is repeated with the same seed and must return the same tour
+unless the budget cut it short ("repro" column).
+"""
+
+
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import trip_mapper as tm  # noqa: E402
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 500])
+    ap.add_argument("--starts", type=int, nargs="+", default=[8])
+    ap.add_argument("--mode", default="fast", choices=list(tm.SOLVER_MODES))
+    ap.add_argument("--budget", type=float, default=tm.MULTISTART_BUDGET)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    print(f"{'stops':>6} {'starts':>6} {'seconds':>8} {'single km':>10} {'best km':>10} "
+          f"{'gain':>7} {'best start':>12} {'repro':>6}")
+    for n in args.sizes:
+        r = np.random.default_rng(n)
+        pts = list(zip(r.uniform(25, 49, n).tolist(), r.uniform(-124, -67, n).tolist()))
+        for k in args.starts:
+            t0 = time.perf_counter()
+            tour, stats = tm.solve_multistart(pts, 0, mode=args.mode, starts=k, seed=args.seed,
+                                              budget=args.budget, workers=args.workers)
+            secs = time.perf_counter() - t0
+            again, _ = tm.solve_multistart(pts, 0, mode=args.mode, starts=k, seed=args.seed,
+                                           budget=args.budget, workers=args.workers)
+            m = stats["multistart"]
+            repro = "yes" if again == tour else ("cut" if not m["reproducible"] else "NO")
+            best = f"{m['best']['start']}/{m['best']['kind']}"
+            print(f"{n:>6} {k:>6} {secs:>8.2f} {m['singleKm']:>10.0f} {m['bestKm']:>10.0f} "
+                  f"{m['improvementPct']:>6.2f}% {best:>12} {repro:>6}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
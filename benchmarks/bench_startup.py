@@ -0,0 +1,117 @@
+"""
+Worker startup: time from process spawn until the port answers /api/health
+(liveness) and until /api/ready turns 200 (model loaded), with the model
+loaded eagerly at import vs on the background warm-up thread.
+
+    python benchmarks/bench_startup.py                   # warm + cold model artifact
+    python benchmarks/bench_startup.py --runs 10 --server gunicorn
+    python benchmarks/bench_startup.py --artifacts cold  # forces a model rebuild per run
+
+"cold" points CITY_MODEL_PATH at a fresh file, so every run recompiles the
+model from the CSVs (what a deploy after a data change pays). Timings are
+medians over --runs spawns, polled every --poll ms; "first /api/suggest" is the
+first request the worker answers 200 (a client retrying on 503 would see it).
+"""
+
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+
+_WERKZEUG = ("import sys; sys.path[:0] = [{root!r}, {api!r}]\n"
+             "from werkzeug.serving import make_server\n"
+             "import app\n"
+             "make_server('127.0.0.1', {port}, app.app, threaded=True).serve_forever()\n")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str, data: Optional[bytes] = None) -> Optional[int]:
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=2) as r:
+            r.read()
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None                                   # not listening yet
+
+
+def spawn_once(server: str, warmup: str, artifact: Optional[str], poll: float = 0.02,
+               timeout: float = 120) -> Dict:
+    port = _free_port()
+    env = dict(os.environ, MODEL_WARMUP=warmup, SUGGEST_CACHE_ENTRIES="0", METRICS_ENABLED="1")
+    if artifact:
+        env["CITY_MODEL_PATH"] = artifact
+    if server == "gunicorn":
+        cmd = [sys.executable, "-m", "gunicorn", "-w", "1", "-b", f"127.0.0.1:{port}",
+               "--chdir", str(ROOT / "api"), "--pythonpath", str(ROOT), "app:app"]
+    else:
+        cmd = [sys.executable, "-c", _WERKZEUG.format(root=str(ROOT), api=str(ROOT / "api"), port=port)]
+    base = f"http://127.0.0.1:{port}"
+    suggest = json.dumps({"preferences": {}, "limit": 10}).encode()
+    out: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, cwd=str(ROOT),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - t0 < timeout and len(out) < 3:
+            if "health" not in out and _get(base + "/api/health") == 200:
+                out["health"] = time.perf_counter() - t0
+            if "health" in out and "ready" not in out and _get(base + "/api/ready") == 200:
+                out["ready"] = time.perf_counter() - t0
+            if "health" in out and "suggest" not in out:
+                if _get(base + "/api/suggest", suggest) == 200:
+                    out["suggest"] = time.perf_counter() - t0
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with {proc.returncode}")
+            time.sleep(poll)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return out
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--poll", type=float, default=20, help="ms between probes")
+    ap.add_argument("--server", default="werkzeug", choices=["werkzeug", "gunicorn"])
+    ap.add_argument("--artifacts", nargs="+", default=["warm", "cold"], choices=["warm", "cold"])
+    args = ap.parse_args(argv)
+
+    print(f"{'artifact':>8} {'warm-up':>10} {'/api/health s':>14} {'/api/ready s':>13} "
+          f"{'first /api/suggest s':>21}")
+    for kind in args.artifacts:
+        for warmup in ("eager", "background"):
+            runs = []
+            for _ in range(args.runs):
+                with tempfile.TemporaryDirectory() as tmp:
+                    artifact = str(Path(tmp) / "city_model.npz") if kind == "cold" else None
+                    runs.append(spawn_once(args.server, warmup, artifact, args.poll / 1000))
+            med = {k: statistics.median(r[k] for r in runs) for k in ("health", "ready", "suggest")}
+            print(f"{kind:>8} {warmup:>10} {med['health']:>14.3f} {med['ready']:>13.3f} "
+                  f"{med['suggest']:>21.3f}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Static files: plain send_from_directory vs StaticAssets (memory cache,
+precompressed bodies, ETag revalidation), through the Flask test client.
+
+    python benchmarks/bench_static.py                  # every file the landing page loads
+    python benchmarks/bench_static.py --iters 500
+    python static_assets.py --build && python benchmarks/bench_static.py   # with .br/.gz copies
+
+"first" is a cold browser (no cache, Accept-Encoding: br, gzip); "repeat" is
+the same browser coming back: it skips responses still fresh by Cache-Control
+and revalidates the rest (If-None-Match / If-Modified-Since). Bytes are
+response bodies as sent; "range ms" is one 64 KiB slice of the landing video.
+"""
+
+
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from flask import Flask, send_from_directory
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from static_assets import ROOT, STATIC_DIRS, StaticAssets  # noqa: E402
+
+PAGE = ["index.html", "assets/fontawesome-6.5.2/css/all.min.css", "css/global.css", "js/main.js",
+        "components/landing/landing.js", "components/tools/tools.js",
+        "components/preferences/data.js", "components/suggestions/suggestions.js",
+        "components/preferences/preferences.js", "components/footer/footer.js",
+        "components/trip-planner/trip-planner.js", "assets/fontawesome-6.5.2/webfonts/fa-solid-900.woff2",
+        "assets/city.jpg", "assets/beach.jpg", "assets/loading_icon.gif",
+        "city_images/06000.jpg", "city_images/48000.jpg", "city_images/36000.jpg"]
+
+
+def make_app(kind: str) -> Tuple[Flask, StaticAssets | None]:
+    app = Flask(kind, static_folder=None)
+    static = StaticAssets(ROOT) if kind == "cached" else None
+
+    @app.get("/")
+    def index():
+        return static.page("index.html") if static else send_from_directory(ROOT, "index.html")
+
+    @app.get("/<path:fn>")
+    def files(fn):
+        if fn.split("/")[0] not in STATIC_DIRS:
+            return ("", 404)
+        if static:
+            return static.serve(fn)
+        return send_from_directory(ROOT, fn)
+
+    return app, static
+
+
+def _fresh(cache_control: str) -> bool:
+    """Would a browser reuse this response without asking (within the benchmark's seconds)?"""
+    parts = [p.strip() for p in cache_control.split(",")]
+    if "no-cache" in parts or "no-store" in parts:
+        return False
+    return any(p.startswith("max-age=") and int(p[8:]) > 0 for p in parts)
+
+
+def load_page(client, urls: List[str], seen: Dict[str, Dict[str, str]]) -> Tuple[int, int, int]:
+    """One page load: skips fresh responses, revalidates the rest with what `seen` holds.
+
+    Returns (requests, bytes, 304s) and updates `seen` for the next load.
+    """
+    requests = sent = not_modified = 0
+    for url in urls:
+        prev = seen.get(url, {})
+        if prev.get("fresh"):
+            continue
+        headers = {"Accept-Encoding": "br, gzip"}
+        headers.update({k: v for k, v in prev.items() if k != "fresh"})
+        r = client.get(url, headers=headers)
+        requests += 1
+        sent += len(r.get_data())
+        not_modified += r.status_code == 304
+        v = {"fresh": _fresh(r.headers.get("Cache-Control", ""))}
+        if r.headers.get("ETag"):
+            v["If-None-Match"] = r.headers["ETag"]
+        if r.headers.get("Last-Modified"):
+            v["If-Modified-Since"] = r.headers["Last-Modified"]
+        seen[url] = v
+    return requests, sent, not_modified
+
+
+def page_urls(client, static: StaticAssets | None) -> List[str]:
+    """The landing page's URLs: fingerprinted where the served index.html links them so."""
+    html = client.get("/").get_data(as_text=True)
+    urls = ["/"]
+    for rel in PAGE[1:]:
+        hashed = static.url_for(rel) if static else rel
+        urls.append("/" + (hashed if f'"{hashed}"' in html else rel))
+    return urls
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--iters", type=int, default=200, help="page loads per row")
+    args = ap.parse_args(argv)
+
+    print(f"{'server':>8} {'load':>7} {'ms/page':>8} {'requests':>9} {'KiB/page':>9} {'304s':>5} {'range ms':>9}")
+    for kind in ("plain", "cached"):
+        app, static = make_app(kind)
+        client = app.test_client()
+        urls = page_urls(client, static)
+        for load in ("first", "repeat"):
+            seen: Dict[str, Dict[str, str]] = {}
+            load_page(client, urls, seen)                           # warm up (and fill the browser cache)
+            t0 = time.perf_counter()
+            for _ in range(args.iters):
+                reqs, sent, hits = load_page(client, urls, dict(seen) if load == "repeat" else {})
+            ms = (time.perf_counter() - t0) / args.iters * 1000
+            t0 = time.perf_counter()
+            for i in range(args.iters):
+                client.get("/assets/aerial.mp4", headers={"Range": f"bytes={i * 65536}-{i * 65536 + 65535}"})
+            range_ms = (time.perf_counter() - t0) / args.iters * 1000
+            print(f"{kind:>8} {load:>7} {ms:>8.2f} {reqs:>9} {sent / 1024:>9.0f} {hits:>5} "
+                  f"{range_ms:>9.3f}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
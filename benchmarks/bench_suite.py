@@ -0,0 +1,338 @@
+"""
+Benchmark suite for the suggestion and routing hot paths, with a baseline
+check that fails on regressions.
+
+    python benchmarks/bench_suite.py                            # run + compare to baseline.json
+    python benchmarks/bench_suite.py --save-baseline            # record a new baseline
+    python benchmarks/bench_suite.py --only route --quick       # subset, fewer iterations
+    python benchmarks/bench_suite.py --tolerance 0.25 --out run.json
+
+Cases (seeded inputs, so runs are comparable):
+  suggest_top_cities, city_top_features, find_master_row, distance_matrix/N,
+  nn_two_opt/N, api_suggest (response cache off) and api_route/N (Flask test
+  client; a fake in-process geocoder instead of Google, no geocode cache).
+
+Each case reports p50/p95/p99 latency (GC off, best of --rounds rounds),
+throughput, and peak traced memory (tracemalloc, measured in a separate
+pass so it doesn't skew timings). A short fixed calibration workload runs
+before each case; comparisons scale latencies by its ratio to the baseline,
+so shared or throttled machines don't report drift as regressions.
+Results go to build/bench/latest.json. A case regresses when its p50 or p95
+latency, or its peak memory, exceeds the baseline by more than --tolerance
+(and by more than a small absolute floor) on the first run and on --confirm
+re-measurements of that case; any regression exits 1.
+Baselines are machine-specific: record one on the box that runs the checks.
+"""
+
+
+from __future__ import annotations
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+# Geocoding stays in-process: no persistent cache, no gazetteer, no pacing
+os.environ["GEOCODE_CACHE_PATH"] = ""
+os.environ["GEOCODERS"] = "google"
+os.environ["GEOCODE_QPS"] = "1000000"
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "api"))
+
+import numpy as np  # noqa: E402
+
+import suggestion_algo as S  # noqa: E402
+import trip_mapper as tm  # noqa: E402
+from bench_geocode import FakeGeocoder  # noqa: E402
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+RESULTS = ROOT / "build" / "bench" / "latest.json"
+ABS_FLOOR_MS = 0.05          # ignore latency deltas below this (timer noise)
+ABS_FLOOR_KB = 64            # ignore memory deltas below this
+
+Case = Tuple[str, Callable[[int], Callable[[], object]], int]   # name, make(seed) -> op, iters
+
+
+# ─────────────────────────────────────────────────────────
+# inputs
+# ─────────────────────────────────────────────────────────
+def random_prefs(rng: random.Random) -> Dict[str, float]:
+    prefs: Dict[str, float] = {f: rng.randint(0, 5) for f in S.NORM_FEATURES}
+    for j, g in enumerate(S.GOLD_FEATURES):
+        col = S._X_GOLD[:, j]
+        prefs[g] = float(np.nanpercentile(col, rng.uniform(10, 90)))
+    return prefs
+
+
+def random_points(n: int, seed: int) -> List[Tuple[float, float]]:
+    r = np.random.default_rng(seed)
+    return list(zip(r.uniform(25, 49, n).tolist(), r.uniform(-124, -67, n).tolist()))
+
+
+def _cycle(items: list) -> Callable[[], object]:
+    it = iter(range(10**12))
+    return lambda: items[next(it) % len(items)]
+
+
+# ─────────────────────────────────────────────────────────
+# cases
+# ─────────────────────────────────────────────────────────
+def _app():
+    import app as api                       # imported lazily: Flask + routes
+    api.MODEL_READY.wait(60)                # model loads on a background thread
+    api.SUGGEST_CACHE.max_entries = 0       # measure the scoring path, not cache hits
+    return api
+
+
+def case_suggest(seed: int):
+    rng = random.Random(seed)
+    next_prefs = _cycle([random_prefs(rng) for _ in range(64)])
+    return lambda: S.suggest_top_cities(next_prefs(), 25)
+
+
+def _city_rows(seed: int, n: int = 64) -> list:
+    rng = random.Random(seed)
+    live = np.flatnonzero(~S._NAN_ROWS)
+    return [(str(S._CITY_NAMES[p]), str(S._STATE_NAMES[p])) for p in rng.choices(live.tolist(), k=n)]
+
+
+def case_top_features(seed: int):
+    api = _app()
+    rng = random.Random(seed)
+    next_row = _cycle(_city_rows(seed))
+    prefs = random_prefs(rng)
+    return lambda: api._city_top_features(*next_row(), prefs)
+
+
+def case_find_row(seed: int):
+    api = _app()
+    next_row = _cycle(_city_rows(seed))
+    api._find_master_row(*next_row())       # df_master parses on first use
+    return lambda: api._find_master_row(*next_row())
+
+
+def case_distance_matrix(n: int):
+    def make(seed: int):
+        pts = random_points(n, seed)
+        return lambda: tm._build_distance_matrix(pts)
+    return make
+
+
+def case_nn_two_opt(n: int):
+    def make(seed: int):
+        D = tm._build_distance_matrix(random_points(n, seed))
+        return lambda: tm._two_opt(tm._nearest_neighbor(D, 0), D)
+    return make
+
+
+def case_api_suggest(seed: int):
+    client = _app().app.test_client()
+    rng = random.Random(seed)
+    next_prefs = _cycle([random_prefs(rng) for _ in range(64)])
+
+    def op():
+        r = client.post("/api/suggest", json={"preferences": next_prefs(), "limit": 25})
+        assert r.status_code == 200, r.status_code
+    return op
+
+
+def case_api_route(n: int):
+    def make(seed: int):
+        client = _app().app.test_client()
+        fake = FakeGeocoder(latency=0.0, jitter=0.0)
+        tm._gmaps_client = lambda: fake      # no network, no key needed
+        rng = random.Random(seed)
+        trips = [[f"Bench Stop {rng.randrange(10**6)}, ST" for _ in range(n)] for _ in range(32)]
+        next_trip = _cycle(trips)
+
+        def op():
+            stops = next_trip()
+            r = client.post("/api/route", json={"home": stops[0], "stops": stops[1:]})
+            assert r.status_code == 200, r.get_json()
+        return op
+    return make
+
+
+def cases(quick: bool) -> List[Case]:
+    k = 0.25 if quick else 1.0
+    it = lambda n: max(10, int(n * k))      # noqa: E731
+    out: List[Case] = [
+        ("suggest_top_cities", case_suggest, it(400)),
+        ("city_top_features", case_top_features, it(2000)),
+        ("find_master_row", case_find_row, it(5000)),
+    ]
+    out += [(f"distance_matrix/{n}", case_distance_matrix(n), it(c)) for n, c in
+            ((10, 2000), (100, 500), (1000, 40))]
+    out += [(f"nn_two_opt/{n}", case_nn_two_opt(n), it(c)) for n, c in
+            ((10, 1000), (50, 200), (200, 20))]
+    out += [("api_suggest", case_api_suggest, it(300))]
+    out += [(f"api_route/{n}", case_api_route(n), it(c)) for n, c in ((8, 200), (25, 60))]
+    return out
+
+
+# ─────────────────────────────────────────────────────────
+# measurement
+# ─────────────────────────────────────────────────────────
+def calibrate() -> float:
+    """ms for a fixed interpreter + BLAS workload (best of 5): machine speed right now."""
+    a = np.random.default_rng(0).random((200, 200))
+    best = np.inf
+    for _ in range(5):
+        t0 = time.perf_counter()
+        acc = 0
+        for i in range(20000):
+            acc += i * i
+        a @ a
+        best = min(best, time.perf_counter() - t0)
+    return best * 1e3
+
+
+def measure(make: Callable[[int], Callable[[], object]], iters: int, seed: int,
+            rounds: int = 3) -> Dict:
+    op = make(seed)
+    for _ in range(max(3, iters // 20)):                 # warm caches / lazy loads
+        op()
+    calib = calibrate()
+    # iterations split into rounds; each percentile keeps its best round
+    # (like timeit's min-of-repeats), which damps one-off machine noise
+    per_round = max(5, iters // rounds)
+    pcts, means, wall = [], [], 0.0
+    for _ in range(rounds):
+        lat = np.empty(per_round)
+        gc.collect()
+        gc.disable()
+        try:
+            t_start = time.perf_counter()
+            for i in range(per_round):
+                t0 = time.perf_counter()
+                op()
+                lat[i] = time.perf_counter() - t0
+            wall += time.perf_counter() - t_start
+        finally:
+            gc.enable()
+        pcts.append(np.percentile(lat * 1e3, (50, 95, 99)))
+        means.append(float(lat.mean() * 1e3))
+
+    # peak memory in its own pass; tracemalloc slows allocation-heavy code
+    tracemalloc.start()
+    for _ in range(max(3, min(iters, 20))):
+        op()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.min(pcts, axis=0)
+    return {"iterations": per_round * rounds, "rounds": rounds, "calib_ms": round(calib, 4),
+            "p50_ms": round(float(p50), 4), "p95_ms": round(float(p95), 4),
+            "p99_ms": round(float(p99), 4), "mean_ms": round(min(means), 4),
+            "throughput_per_s": round(per_round * rounds / wall, 2),
+            "peak_kb": round(peak / 1024, 1)}
+
+
+def environment() -> Dict:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        sha = ""
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "git": sha,
+            "python": platform.python_version(), "numpy": np.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+            "model_version": S.MODEL_VERSION, "cities": S.N_CITIES}
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """One line per regression (empty list = pass)."""
+    bad = []
+    for name, cur in results["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            continue
+        # latencies are rescaled to the baseline's machine speed (calibration
+        # ratio), so a busy or throttled box doesn't read as a regression
+        speed = 1.0
+        if base.get("calib_ms") and cur.get("calib_ms"):
+            speed = base["calib_ms"] / cur["calib_ms"]
+        for key, floor in (("p50_ms", ABS_FLOOR_MS), ("p95_ms", ABS_FLOOR_MS),
+                           ("peak_kb", ABS_FLOOR_KB)):
+            old, new = base.get(key), cur.get(key)
+            if old is None or new is None:
+                continue
+            if key.endswith("_ms"):
+                new = round(new * speed, 4)
+            if new > old * (1 + tolerance) and new - old > floor:
+                bad.append(f"{name}: {key} {old:g} -> {new:g} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return bad
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--only", nargs="*", default=[], help="run cases whose name contains any of these")
+    ap.add_argument("--quick", action="store_true", help="quarter of the iterations")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--rounds", type=int, default=3, help="timing rounds per case (best kept)")
+    ap.add_argument("--out", default=str(RESULTS))
+    ap.add_argument("--baseline", default=str(BASELINE))
+    ap.add_argument("--save-baseline", action="store_true", help="write results to --baseline")
+    ap.add_argument("--tolerance", type=float, default=0.3, help="allowed fractional slowdown")
+    ap.add_argument("--confirm", type=int, default=2, help="re-measurements before a regression counts")
+    args = ap.parse_args(argv)
+
+    selected = [c for c in cases(args.quick) if not args.only or any(s in c[0] for s in args.only)]
+    results = {"environment": environment(), "cases": {}}
+    print(f"{'case':>20} {'iters':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'ops/s':>9} {'peak KB':>9}")
+    for name, make, iters in selected:
+        r = results["cases"][name] = measure(make, iters, args.seed, max(1, args.rounds))
+        print(f"{name:>20} {iters:>6} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+              f"{r['throughput_per_s']:>9.1f} {r['peak_kb']:>9.1f}")
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"results -> {out}")
+
+    base_path = Path(args.baseline)
+    if args.save_baseline:
+        base_path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"baseline -> {base_path}")
+        return 0
+    if not base_path.exists():
+        print(f"no baseline at {base_path}; run with --save-baseline to record one")
+        return 0
+    baseline = json.loads(base_path.read_text())
+    bad = compare(results, baseline, args.tolerance)
+    # a regression has to reproduce: re-measure flagged cases, keep the best run
+    makers = {name: (make, iters) for name, make, iters in selected}
+    for attempt in range(args.confirm):
+        flagged = sorted({line.split(":")[0] for line in bad})
+        if not flagged:
+            break
+        print(f"re-measuring {', '.join(flagged)} ({attempt + 1}/{args.confirm})")
+        for name in flagged:
+            make, iters = makers[name]
+            again = measure(make, iters, args.seed, max(1, args.rounds))
+            if not compare({"cases": {name: again}}, baseline, args.tolerance):
+                results["cases"][name] = again
+        out.write_text(json.dumps(results, indent=2) + "\n")
+        bad = compare(results, baseline, args.tolerance)
+    if bad:
+        print(f"\nREGRESSION vs {base_path.name} "
+              f"(git {baseline.get('environment', {}).get('git', '?')}, tolerance {args.tolerance:.0%}):")
+        for line in bad:
+            print(f"  {line}")
+        return 1
+    print(f"no regressions vs {base_path.name} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
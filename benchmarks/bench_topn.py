@@ -0,0 +1,103 @@
+"""
+Top-N retrieval: TopNIndex (threshold algorithm) vs scoring every city, on
+synthetic models shaped like the real one (same feature counts and weights,
+correlated normalized features, gold columns resampled from the real data
+with ~10% missing).
+
+    python benchmarks/bench_topn.py                        # 3k / 100k / 1M cities
+    python benchmarks/bench_topn.py --sizes 100000 --queries 200 --top 25
+
+Every query is checked against brute force; "scored" is the mean share of
+rows the index evaluated exactly and "TA" the share of queries answered by
+the threshold algorithm (the rest use the reduced column scan).
+"""
+
+
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import suggestion_algo as S  # noqa: E402
+from topn_index import TopNIndex  # noqa: E402
+
+
+def synthetic_model(n: int, rank: int = 6, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    f, g = len(S.NORM_FEATURES), len(S.GOLD_FEATURES)
+    # low-rank latent structure + noise, squashed into 0..1 like df_norm
+    z = rng.standard_normal((n, rank)) @ rng.standard_normal((rank, f)) / np.sqrt(rank)
+    x_norm = 1.0 / (1.0 + np.exp(-(z + 0.5 * rng.standard_normal((n, f)))))
+    x_gold = np.empty((n, g))
+    for j in range(g):
+        real = S._X_GOLD[:, j]
+        real = real[~np.isnan(real)]
+        x_gold[:, j] = rng.choice(real, n) * rng.normal(1.0, 0.05, n)
+        x_gold[rng.random(n) < 0.1, j] = np.nan
+    return x_norm, x_gold
+
+
+def profiles(count: int, kind: str = "ui", seed: int = 1):
+    """
+    "ui": like the front end, every normal feature at the default rating (1)
+    except a handful the user changed, and a gold ideal near the middle of
+    each feature's observed values.
+    "sparse": two or three normal features rated, no gold ideals (API use).
+    """
+    rng = np.random.default_rng(seed)
+    f, g = len(S.NORM_FEATURES), len(S.GOLD_FEATURES)
+    if kind == "sparse":
+        rating = np.zeros((count, f))
+        for p in range(count):
+            rating[p, rng.choice(f, rng.integers(2, 4), replace=False)] = rng.integers(1, 6)
+        return rating / 5.0, np.zeros((count, g))
+    rating = np.where(rng.random((count, f)) < 0.25, rng.integers(0, 6, (count, f)), 1)
+    lo = np.nanpercentile(S._X_GOLD, 10, axis=0)
+    hi = np.nanpercentile(S._X_GOLD, 90, axis=0)
+    return rating / 5.0, rng.uniform(lo, hi, (count, g))
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[3_000, 100_000, 1_000_000])
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--workloads", nargs="+", default=["ui", "sparse"], choices=["ui", "sparse"])
+    args = ap.parse_args(argv)
+
+    print(f"{'cities':>9} {'workload':>8} {'build s':>8} {'index MB':>9} {'brute ms':>9} "
+          f"{'index ms':>9} {'speedup':>8} {'scored':>7} {'TA':>5}")
+    for n in args.sizes:
+        x_norm, x_gold = synthetic_model(n)
+        t0 = time.perf_counter()
+        idx = TopNIndex(x_norm, S._W_NORM, x_gold, S._W_GOLD, S._GOLD_RNG)
+        build = time.perf_counter() - t0
+        for kind in args.workloads:
+            imp, ideal = profiles(args.queries, kind)
+            brute = fast = 0.0
+            scored = ta = 0
+            for p in range(args.queries):
+                t0 = time.perf_counter()
+                ref_rows, ref_s = idx.brute_force(imp[p], ideal[p], args.top)
+                t1 = time.perf_counter()
+                rows, s, stats = idx.top_k(imp[p], ideal[p], args.top)
+                t2 = time.perf_counter()
+                assert np.allclose(s, ref_s, rtol=0, atol=1e-12), "index disagrees with brute force"
+                brute += t1 - t0
+                fast += t2 - t1
+                scored += stats["scored"]
+                ta += stats["path"] == "threshold"
+            print(f"{n:>9} {kind:>8} {build:>8.2f} {idx.nbytes / 2**20:>9.1f} "
+                  f"{brute / args.queries * 1e3:>9.2f} {fast / args.queries * 1e3:>9.2f} "
+                  f"{brute / fast:>7.1f}x {scored / args.queries / n:>6.1%} {ta / args.queries:>4.0%}")
+        del idx, x_norm, x_gold
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Tour quality / runtime: legacy first-improvement 2-opt vs the neighbor-list
+2-opt in trip_mapper, both seeded from the same nearest-neighbor path.
+
+    python benchmarks/bench_two_opt.py                 # 50 / 200 / 1000 stops
+    python benchmarks/bench_two_opt.py --sizes 100 500 --seeds 3
+    python benchmarks/bench_two_opt.py --legacy-max 400  # skip slow legacy runs
+
+Lengths are for the looped route actually returned to users (home -> ... -> home).
+"""
+
+
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import trip_mapper as tm  # noqa: E402
+
+
+def legacy_two_opt(path: List[int], dist: Dict[Tuple[int, int], float]) -> List[int]:
+    """The pre-neighbor-list implementation, kept verbatim for comparison."""
+    improved = True
+    n = len(path)
+    while improved:
+        improved = False
+        for i in range(1, n - 2):
+            for j in range(i + 1, n - 1):
+                if j - i == 1:
+                    continue
+                a, b = path[i - 1], path[i]
+                c, d = path[j], path[j + 1]
+                old = dist[(a, b)] + dist[(c, d)]
+                new = dist[(a, c)] + dist[(b, d)]
+                if new < old:
+                    path[i:j + 1] = reversed(path[i:j + 1])
+                    improved = True
+                    break
+            if improved:
+                break
+    return path
+
+
+def random_stops(n: int, seed: int) -> List[Tuple[float, float]]:
+    """n (lat, lon) points scattered over the contiguous U.S. bounding box."""
+    rng = random.Random(seed)
+    return [(rng.uniform(25.0, 49.0), rng.uniform(-124.0, -67.0)) for _ in range(n)]
+
+
+def loop_km(order: List[int], D) -> float:
+    legs = zip(order, order[1:] + order[:1])
+    return sum(D[a][b] for a, b in legs if a != b) / 1000.0
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000])
+    ap.add_argument("--seeds", type=int, default=2, help="instances per size")
+    ap.add_argument("--legacy-max", type=int, default=1000,
+                    help="skip the legacy solver above this many stops")
+    args = ap.parse_args(argv)
+
+    print(f"{'stops':>6} {'seed':>4} {'nn km':>10} {'legacy km':>10} {'legacy s':>9} "
+          f"{'new km':>10} {'new s':>8} {'gain':>7}")
+    for n in args.sizes:
+        for seed in range(args.seeds):
+            D = tm._build_distance_matrix(random_stops(n, seed))
+            nn = tm._nearest_neighbor(D, 0)
+
+            t0 = time.perf_counter()
+            new = tm._two_opt(list(nn), D)
+            t_new = time.perf_counter() - t0
+
+            if n <= args.legacy_max:
+                t0 = time.perf_counter()
+                dist = {(a, b): D[a][b] for a in range(n) for b in range(n) if a != b}
+                old = legacy_two_opt(list(nn), dist)
+                t_old = time.perf_counter() - t0
+                old_km, old_s = loop_km(old, D), f"{t_old:9.3f}"
+            else:
+                old_km, old_s = float("nan"), f"{'skipped':>9}"
+
+            new_km = loop_km(new, D)
+            gain = (old_km - new_km) / old_km * 100 if old_km == old_km else float("nan")
+            print(f"{n:>6} {seed:>4} {loop_km(nn, D):>10.0f} {old_km:>10.0f} {old_s} "
+                  f"{new_km:>10.0f} {t_new:>8.3f} {gain:>6.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
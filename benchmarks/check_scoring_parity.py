@@ -0,0 +1,84 @@
+"""
+Parity check: score_vector (mat-vec + vectorized gold kernel) against the
+scalar reference scorer _row_score, row by row over the real model.
+
+    python benchmarks/check_scoring_parity.py                 # 10 random profiles
+    python benchmarks/check_scoring_parity.py --profiles 50 --seed 3
+
+Profiles are random slider ratings (0..5) with gold ideals drawn from each
+feature's observed range, plus a few edge cases (empty, all max, strings and
+out-of-range values). For every profile both scorers must agree on which rows
+are NaN, on the ranking (argsort), and to within --tol on every score.
+Exits 1 on the first mismatch.
+"""
+
+
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import suggestion_algo as S  # noqa: E402
+
+
+def random_profile(rng: random.Random) -> Dict[str, object]:
+    prefs: Dict[str, object] = {f: rng.randint(0, 5) for f in S.NORM_FEATURES if rng.random() < 0.8}
+    for j, g in enumerate(S.GOLD_FEATURES):
+        if rng.random() < 0.8:
+            prefs[g] = float(np.nanpercentile(S._X_GOLD[:, j], rng.uniform(0, 100)))
+    return prefs
+
+
+def edge_profiles() -> List[Dict[str, object]]:
+    every = list(S.NORM_FEATURES) + list(S.GOLD_FEATURES)
+    return [
+        {},
+        {f: 5 for f in every},
+        {f: str(i % 6) for i, f in enumerate(every)},             # numeric strings
+        {f: (-3, 9, "x", None)[i % 4] for i, f in enumerate(every)},   # clipped / unparseable
+    ]
+
+
+def check(prefs: Dict[str, object], tol: float) -> float:
+    """Max |score_vector - _row_score| for one profile; AssertionError on mismatch."""
+    fast = S.score_vector(prefs)
+    ref = np.array([S._row_score(i, prefs) for i in range(S.N_CITIES)], dtype=np.float64)
+    assert np.array_equal(np.isnan(fast), np.isnan(ref)), "NaN rows differ"
+    assert np.array_equal(np.argsort(fast, kind="stable"), np.argsort(ref, kind="stable")), \
+        "ranking differs"
+    ok = ~np.isnan(ref)
+    diff = float(np.max(np.abs(fast[ok] - ref[ok]))) if ok.any() else 0.0
+    assert diff <= tol, f"max abs diff {diff:.3g} > {tol:.3g}"
+    return diff
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--profiles", type=int, default=10, help="random profiles (plus the edge cases)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--tol", type=float, default=1e-12)
+    args = ap.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    cases = edge_profiles() + [random_profile(rng) for _ in range(args.profiles)]
+    worst = 0.0
+    t0 = time.perf_counter()
+    for n, prefs in enumerate(cases, start=1):
+        try:
+            worst = max(worst, check(prefs, args.tol))
+        except AssertionError as e:
+            print(f"profile {n}: {e}\n  {prefs}")
+            return 1
+    print(f"{len(cases)} profiles x {S.N_CITIES} rows: same NaN rows, same ranking, "
+          f"max abs diff {worst:.3g} (tol {args.tol:.0e}) in {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+Offline geocoding: a local gazetteer of U.S. places (name, state -> lat/lon)
+
+`Geocoder`                 : backend interface, lookup(query) -> (lat, lon) | None
+`Gazetteer.load(csv)`      : in-memory backend over data/gazetteer.csv
+`Gazetteer.lookup(query)`  : "Austin, TX" / "austin texas" / "Austin"
+                             exact hash hit first, trigram fuzzy match second
+
+Queries are split into place + state (code or full name, after a comma or as
+the trailing words); hyphens and periods are folded away. Without a state,
+the most populous match wins. Misses return None so trip_mapper can fall
+back to Google.
+
+The CSV (columns city, state, state_id, lat, lon, population; rows sorted
+by population) is built with:
+    python gazetteer.py build --from-zipcodes       # shipped CSV: ZIP centroids (pip install zipcodes)
+    python gazetteer.py build --from-cache          # from the warmed geocode cache
+    python gazetteer.py build --from uscities.csv   # any CSV with name/state/lat/lon
+    python gazetteer.py lookup "Springfield, IL"
+"""
+
+
+from __future__ import annotations
+import argparse
+import csv
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from name_index import NameIndex, normalize
+
+BASE = Path(__file__).resolve().parent
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", str(BASE / "data" / "gazetteer.csv"))
+# Trigram Dice needed for a fuzzy hit; stricter when no state narrows it down
+GAZETTEER_FUZZY_CUTOFF = float(os.getenv("GAZETTEER_FUZZY_CUTOFF", "0.6"))
+_FUZZY_CUTOFF_NO_STATE = 0.8
+
+COLUMNS = ["city", "state", "state_id", "lat", "lon", "population"]
+
+US_STATES: Dict[str, str] = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas",
+    "CA": "California", "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware",
+    "DC": "District of Columbia", "FL": "Florida", "GA": "Georgia", "HI": "Hawaii",
+    "ID": "Idaho", "IL": "Illinois", "IN": "Indiana", "IA": "Iowa", "KS": "Kansas",
+    "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+    "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi",
+    "MO": "Missouri", "MT": "Montana", "NE": "Nebraska", "NV": "Nevada",
+    "NH": "New Hampshire", "NJ": "New Jersey", "NM": "New Mexico", "NY": "New York",
+    "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio", "OK": "Oklahoma",
+    "OR": "Oregon", "PA": "Pennsylvania", "PR": "Puerto Rico", "RI": "Rhode Island",
+    "SC": "South Carolina", "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas",
+    "UT": "Utah", "VT": "Vermont", "VA": "Virginia", "WA": "Washington",
+    "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+}
+_STATE_KEYS = {**{normalize(c): c for c in US_STATES},
+               **{normalize(n): c for c, n in US_STATES.items()}}
+_COUNTRY_SUFFIXES = (", usa", ", us", ", united states", " usa")
+_PUNCT = str.maketrans({"-": " ", ".": "", "'": "", "’": ""})
+
+
+def clean(s) -> str:
+    """normalize() with hyphens/periods folded: 'St. Louis' -> 'st louis'."""
+    return normalize(str(s if s is not None else "").translate(_PUNCT))
+
+
+def state_code(s) -> Optional[str]:
+    """'tx' / 'Texas' / 'D.C.' -> 'TX' / 'TX' / 'DC'; None if not a state."""
+    return _STATE_KEYS.get(clean(s))
+
+
+def split_query(query) -> Tuple[str, Optional[str]]:
+    """'Austin, TX' -> ('austin', 'TX'); 'austin texas' -> ('austin', 'TX')."""
+    q = clean(query)
+    for suffix in _COUNTRY_SUFFIXES:
+        if q.endswith(suffix):
+            q = q[: -len(suffix)].rstrip(" ,")
+    if "," in q:
+        name, qual = (p.strip() for p in q.rsplit(",", 1))
+        code = state_code(qual)
+        if code:
+            return name, code
+        return q, None                  # not a state: keep the whole string
+    words = q.split()
+    for k in (2, 1):                    # "new york", "tx"
+        if len(words) > k:
+            code = state_code(" ".join(words[-k:]))
+            if code:
+                return " ".join(words[:-k]), code
+    return q, None
+
+
+class Geocoder(ABC):
+    """Backend interface for trip_mapper: return (lat, lon), or None on a miss."""
+    name = "geocoder"
+
+    @abstractmethod
+    def lookup(self, query: str) -> Optional[Tuple[float, float]]:
+        ...
+
+
+class Gazetteer(Geocoder):
+    name = "gazetteer"
+
+    def __init__(self, rows: Iterable[Dict], fuzzy_cutoff: float = GAZETTEER_FUZZY_CUTOFF):
+        rows = sorted(rows, key=lambda r: -float(r.get("population") or 0))
+        self.coords: List[Tuple[float, float]] = [(float(r["lat"]), float(r["lon"])) for r in rows]
+        self.names = [r["city"] for r in rows]
+        self.states = [r["state_id"] for r in rows]
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.index = NameIndex.from_columns([[clean(n) for n in self.names]], [self.states])
+        self.hits = self.fuzzy_hits = self.misses = 0
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH, **kw) -> "Gazetteer":
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls(csv.DictReader(f), **kw)
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def find(self, query) -> Optional[int]:
+        """Row position for the query (exact, then fuzzy), or None."""
+        name, state = split_query(query)
+        if not name:
+            return None
+        if state:
+            pos = self.index.lookup(name, state)
+        else:
+            hits = self.index.lookup_any(name)
+            pos = hits[0] if hits else None             # most populous
+        if pos is not None:
+            self.hits += 1
+            return pos
+        cutoff = self.fuzzy_cutoff if state else max(self.fuzzy_cutoff, _FUZZY_CUTOFF_NO_STATE)
+        near = self.index.fuzzy(name, state, limit=1, cutoff=cutoff)
+        if near:
+            self.fuzzy_hits += 1
+            return near[0]
+        self.misses += 1
+        return None
+
+    def lookup(self, query) -> Optional[Tuple[float, float]]:
+        pos = self.find(query)
+        return None if pos is None else self.coords[pos]
+
+    def stats(self) -> Dict:
+        return {"rows": len(self), "hits": self.hits, "fuzzyHits": self.fuzzy_hits,
+                "misses": self.misses}
+
+
+# ─────────────────────────────────────────────────────────
+# building the CSV
+# ─────────────────────────────────────────────────────────
+_NAME_COLS = ("city_ascii", "city", "name", "place")
+_STATE_COLS = ("state_id", "state", "State", "state_name", "st")
+_LAT_COLS = ("lat", "latitude", "Lat")
+_LON_COLS = ("lon", "lng", "long", "longitude", "Lon", "Lng")
+_POP_COLS = ("population", "pop", "new_city_pop")
+
+
+def _pick(row: Dict, cols) -> Optional[str]:
+    return next((row[c] for c in cols if row.get(c) not in (None, "")), None)
+
+
+def rows_from_csv(path) -> List[Dict]:
+    """Normalize any city CSV with name / state / lat / lon columns."""
+    out = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            name, state = _pick(r, _NAME_COLS), _pick(r, _STATE_COLS)
+            lat, lon = _pick(r, _LAT_COLS), _pick(r, _LON_COLS)
+            code = state_code(state) if state else None
+            if not (name and code and lat and lon):
+                continue
+            out.append({"city": name.strip(), "state": US_STATES[code], "state_id": code,
+                        "lat": float(lat), "lon": float(lon),
+                        "population": float(_pick(r, _POP_COLS) or 0)})
+    return out
+
+
+def rows_from_cache(cache, master_csv) -> List[Dict]:
+    """CityMaster cities whose "{city}, {state}" query is in the geocode cache."""
+    with open(master_csv, newline="", encoding="utf-8") as f:
+        master = [r for r in csv.DictReader(f) if (r.get("city_ascii") or "").strip()]
+    hits = cache.get_many(f"{r['city_ascii']}, {r['State']}" for r in master)
+    out, seen = [], set()
+    for r in master:
+        key = normalize(f"{r['city_ascii']}, {r['State']}")
+        code = state_code(r["State"])
+        if key in hits and code and key not in seen:
+            seen.add(key)
+            lat, lon = hits[key]
+            out.append({"city": r["city_ascii"].strip(), "state": US_STATES[code],
+                        "state_id": code, "lat": lat, "lon": lon,
+                        "population": float(r.get("new_city_pop") or 0)})
+    return out
+
+
+def rows_from_zipcodes(master_csv=None) -> List[Dict]:
+    """
+    Every place in the `zipcodes` package (pip install zipcodes), at the mean
+    of its active ZIP centroids (standard ZIPs; PO-box-only places use those).
+    Population comes from CityMaster where the city matches, else 0.
+    """
+    import zipcodes
+    groups: Dict[Tuple[str, str], Dict[str, List[Tuple[float, float]]]] = {}
+    for z in zipcodes.list_all():
+        code = state_code(z.get("state") or "")
+        if not (z.get("active") and code and z.get("lat") and z.get("long")):
+            continue
+        kind = z.get("zip_code_type")
+        if kind not in ("STANDARD", "PO BOX"):
+            continue
+        pts = groups.setdefault((z["city"].strip(), code), {}).setdefault(kind, [])
+        pts.append((float(z["lat"]), float(z["long"])))
+    pops: Dict[str, float] = {}
+    if master_csv is not None:
+        with open(master_csv, newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                code = state_code(r.get("State") or "")
+                if code and (r.get("city_ascii") or "").strip():
+                    key = normalize(f"{r['city_ascii']}, {code}")
+                    pops[key] = max(pops.get(key, 0.0), raw_population(r.get("new_city_pop")))
+    out = []
+    for (city, code), kinds in groups.items():
+        pts = kinds.get("STANDARD") or kinds["PO BOX"]
+        out.append({"city": city, "state": US_STATES[code], "state_id": code,
+                    "lat": sum(p[0] for p in pts) / len(pts),
+                    "lon": sum(p[1] for p in pts) / len(pts),
+                    "population": pops.get(normalize(f"{city}, {code}"), 0.0)})
+    return out
+
+
+def raw_population(scaled) -> float:
+    """CityMaster's new_city_pop is min-max scaled; back to people (see model_build.RAW_BOUNDS)."""
+    from model_build import RAW_BOUNDS
+    try:
+        x = float(scaled)
+    except (TypeError, ValueError):
+        return 0.0
+    lo, hi = RAW_BOUNDS["new_city_pop"]
+    return round(lo + x * (hi - lo)) if x == x else 0.0
+
+
+def write_csv(rows: List[Dict], path) -> None:
+    rows = sorted(rows, key=lambda r: (-r["population"], r["state_id"], r["city"]))
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=COLUMNS)
+        w.writeheader()
+        w.writerows({**r, "lat": f"{r['lat']:.6f}", "lon": f"{r['lon']:.6f}"} for r in rows)
+    os.replace(tmp, path)
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Local gazetteer for trip_mapper")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="write the gazetteer CSV")
+    src = b.add_mutually_exclusive_group(required=True)
+    src.add_argument("--from", dest="src", help="city CSV with name/state/lat/lon columns")
+    src.add_argument("--from-cache", action="store_true",
+                     help="CityMaster cities already in the geocode cache")
+    src.add_argument("--from-zipcodes", action="store_true",
+                     help="every place in the `zipcodes` package (ZIP centroids)")
+    b.add_argument("-o", "--out", default=GAZETTEER_PATH)
+    lk = sub.add_parser("lookup", help="resolve queries against the gazetteer")
+    lk.add_argument("queries", nargs="+")
+    lk.add_argument("--path", default=GAZETTEER_PATH)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        if args.from_cache:
+            from geocode_cache import GEOCODE_CACHE_PATH, MASTER_CSV, GeocodeCache
+            rows = rows_from_cache(GeocodeCache(GEOCODE_CACHE_PATH), MASTER_CSV)
+        elif args.from_zipcodes:
+            from geocode_cache import MASTER_CSV
+            rows = rows_from_zipcodes(MASTER_CSV)
+        else:
+            rows = rows_from_csv(args.src)
+        write_csv(rows, args.out)
+        print(f"wrote {len(rows)} places to {args.out}")
+        return 0
+
+    t0 = time.perf_counter()
+    gaz = Gazetteer.load(args.path)
+    print(f"loaded {len(gaz)} places in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    for q in args.queries:
+        pos = gaz.find(q)
+        hit = "-" if pos is None else \
+            f"{gaz.names[pos]}, {gaz.states[pos]} {gaz.coords[pos][0]:.4f},{gaz.coords[pos][1]:.4f}"
+        print(f"{q!r:>32} -> {hit}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Persistent geocode cache: normalized query -> (lat, lon), stored in SQLite
+
+Shared by every request and every gunicorn worker (one file, WAL mode), so a
+popular city is sent to Google once per TTL instead of once per route.
+
+`GeocodeCache.get_many(queries)`  : cached coords for the fresh keys
+`GeocodeCache.put_many(items)`    : store {query: (lat, lon)}
+`GeocodeCache.stats()`            : hits / misses (this process), rows, hit rate
+
+CLI:
+    python geocode_cache.py warm                     # every CityMaster city
+    python geocode_cache.py warm --limit 200 --format "{city}, {state}"
+    python geocode_cache.py stats
+    python geocode_cache.py purge                    # drop expired rows
+
+Keys use the same normalization trip_mapper de-dupes stops with, so
+"  Austin,  TX" and "austin, tx" share one row.
+"""
+
+
+from __future__ import annotations
+import argparse
+import csv
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger("geocode_cache")
+
+BASE = Path(__file__).resolve().parent
+MASTER_CSV = BASE / "data" / "CityMaster1.9.5.csv"
+
+# Empty GEOCODE_CACHE_PATH disables the persistent cache.
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", str(BASE / "build" / "geocode_cache.sqlite"))
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL_DAYS", "90")) * 86400.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode (
+    key        TEXT PRIMARY KEY,
+    lat        REAL NOT NULL,
+    lon        REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+_SQL_CHUNK = 500          # stay under SQLite's bound-parameter limit
+
+
+def normalize_query(q) -> str:
+    """Same key as trip_mapper._dedupe_preserve_order: collapse whitespace, lowercase."""
+    return " ".join(str(q or "").split()).lower()
+
+
+class GeocodeCache:
+    """
+    SQLite-backed cache. Connections are per thread and re-opened after a
+    fork, so one instance can be shared by thread pools and pre-forked
+    workers. Rows older than `ttl` seconds count as misses and are replaced
+    on the next put; purge() deletes them outright.
+    """
+
+    def __init__(self, path=GEOCODE_CACHE_PATH, ttl: float = GEOCODE_CACHE_TTL,
+                 clock=time.time) -> None:
+        self.path = str(path)
+        self.ttl = ttl
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    # ── reads ────────────────────────────────────────────────────────
+    def get_many(self, queries: Iterable[str]) -> Dict[str, Tuple[float, float]]:
+        """{normalized key: (lat, lon)} for every query with a fresh row."""
+        keys = list(dict.fromkeys(k for k in map(normalize_query, queries) if k))
+        fresh_after = self._clock() - self.ttl
+        out: Dict[str, Tuple[float, float]] = {}
+        conn = self._conn()
+        for i in range(0, len(keys), _SQL_CHUNK):
+            chunk = keys[i:i + _SQL_CHUNK]
+            rows = conn.execute(
+                f"SELECT key, lat, lon FROM geocode WHERE updated_at >= ? "
+                f"AND key IN ({','.join('?' * len(chunk))})", [fresh_after, *chunk])
+            out.update((k, (lat, lon)) for k, lat, lon in rows)
+        with self._lock:
+            self.hits += len(out)
+            self.misses += len(keys) - len(out)
+        return out
+
+    def get(self, query: str) -> Optional[Tuple[float, float]]:
+        return self.get_many([query]).get(normalize_query(query))
+
+    # ── writes ───────────────────────────────────────────────────────
+    def put_many(self, items: Dict[str, Tuple[float, float]]) -> None:
+        now = self._clock()
+        rows = [(normalize_query(q), float(lat), float(lon), now)
+                for q, (lat, lon) in items.items() if normalize_query(q)]
+        if rows:
+            self._conn().executemany(
+                "INSERT OR REPLACE INTO geocode (key, lat, lon, updated_at) VALUES (?, ?, ?, ?)",
+                rows)
+
+    def put(self, query: str, lat: float, lon: float) -> None:
+        self.put_many({query: (lat, lon)})
+
+    def purge(self) -> int:
+        """Delete expired rows; returns how many went."""
+        cur = self._conn().execute("DELETE FROM geocode WHERE updated_at < ?",
+                                   [self._clock() - self.ttl])
+        return cur.rowcount
+
+    # ── introspection ────────────────────────────────────────────────
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        looked = hits + misses
+        return {"path": self.path, "rows": len(self), "ttlDays": self.ttl / 86400.0,
+                "hits": hits, "misses": misses,
+                "hitRate": round(hits / looked, 4) if looked else None}
+
+
+# ─────────────────────────────────────────────────────────
+# warm-up
+# ─────────────────────────────────────────────────────────
+def master_queries(master_csv=MASTER_CSV, fmt: str = "{city}, {state}") -> List[str]:
+    """One query per CityMaster row, built from its city_ascii / State columns."""
+    with open(master_csv, newline="", encoding="utf-8") as f:
+        rows = csv.DictReader(f)
+        qs = [fmt.format(city=r["city_ascii"].strip(), state=r["State"].strip())
+              for r in rows if (r.get("city_ascii") or "").strip()]
+    return list(dict.fromkeys(qs))
+
+
+def warm(cache: GeocodeCache, queries: List[str], gmaps, geocode_one=None,
+         limit: Optional[int] = None) -> Dict[str, int]:
+    """Geocode the queries missing from the cache; failures are logged and skipped."""
+    if geocode_one is None:
+        from trip_mapper import _geocode_one as geocode_one
+    cached = cache.get_many(queries)
+    todo = [q for q in queries if normalize_query(q) not in cached][:limit]
+    done = failed = 0
+    for q in todo:
+        try:
+            cache.put(q, *geocode_one(q, gmaps))
+            done += 1
+        except RuntimeError as e:
+            failed += 1
+            log.warning("warm: %s", e)
+    return {"queries": len(queries), "cached": len(cached), "geocoded": done, "failed": failed}
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Persistent geocode cache for trip_mapper")
+    ap.add_argument("--db", default=GEOCODE_CACHE_PATH, help="SQLite file (default %(default)s)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("warm", help="pre-geocode the CityMaster cities")
+    w.add_argument("--master", default=str(MASTER_CSV))
+    w.add_argument("--format", default="{city}, {state}",
+                   help="query template; fields {city} and {state}")
+    w.add_argument("--limit", type=int, default=None, help="geocode at most N misses")
+    sub.add_parser("stats", help="row count and TTL")
+    sub.add_parser("purge", help="delete expired rows")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    if not args.db:
+        ap.error("no cache path (GEOCODE_CACHE_PATH is empty)")
+    cache = GeocodeCache(args.db)
+    if args.cmd == "warm":
+        from trip_mapper import _gmaps_client
+        res = warm(cache, master_queries(args.master, args.format), _gmaps_client(),
+                   limit=args.limit)
+        print(" ".join(f"{k}={v}" for k, v in res.items()))
+    elif args.cmd == "purge":
+        print(f"purged={cache.purge()}")
+    else:
+        print(" ".join(f"{k}={v}" for k, v in cache.stats().items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
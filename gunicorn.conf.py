@@ -0,0 +1,34 @@
+"""
+Gunicorn hooks (picked up automatically from the working directory).
+
+Logs each worker's memory once the recommender model is loaded: RSS/PSS
+before and after the model was mapped, plus the shared/private split now.
+With the memory-mapped model (CITY_MODEL_MMAP=1, the default) the model pages
+show up as shared, so per-worker PSS stays flat as workers are added.
+
+The model loads in the background (MODEL_WARMUP in api/app.py), so the report
+runs on its own thread and never holds up the worker accepting requests.
+"""
+import threading
+
+
+def _fmt(m):
+    return " ".join(f"{k}={v}" for k, v in m.items() if k != "pid")
+
+
+def _memory_report(worker):
+    try:
+        import suggestion_algo          # waits for the warm-up's import to finish
+    except Exception as e:
+        worker.log.warning("memory report unavailable: %s", e)
+        return
+    mem = suggestion_algo.MODEL_MEMORY
+    worker.log.info("worker %s model load: before [%s] after [%s]",
+                    worker.pid, _fmt(mem["before"]), _fmt(mem["after"]))
+    worker.log.info("worker %s now: [%s]", worker.pid,
+                    _fmt(suggestion_algo.memory_report()))
+
+
+def post_worker_init(worker):
+    threading.Thread(target=_memory_report, args=(worker,), name="memory-report",
+                     daemon=True).start()
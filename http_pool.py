@@ -0,0 +1,105 @@
+"""
+Pooled, instrumented HTTP sessions for outbound API clients
+
+`pooled_session(pool_size, retries, backoff)` : requests.Session with a
+    keep-alive connection pool and a urllib3 retry policy (connect errors and
+    502/503/504 only; API-level quota errors are handled by the caller)
+`HTTP_TIMING.snapshot()` : per-process totals that separate connection setup
+    (new TCP/TLS connections) from whole request time
+
+Used by trip_mapper's process-wide googlemaps client.
+"""
+
+
+from __future__ import annotations
+import threading
+import time
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+
+class HttpTiming:
+    """Thread-safe count / total / max seconds per event name."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: Dict[str, list] = {}
+
+    def record(self, event: str, seconds: float) -> None:
+        with self._lock:
+            s = self._stats.setdefault(event, [0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += seconds
+            s[2] = max(s[2], seconds)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {k: {"count": n, "totalMs": round(t * 1000, 2),
+                        "avgMs": round(t * 1000 / n, 2) if n else 0.0,
+                        "maxMs": round(m * 1000, 2)}
+                    for k, (n, t, m) in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+HTTP_TIMING = HttpTiming()
+
+
+# ── connection classes that time their own setup ─────────────────────
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self) -> None:
+        t0 = time.perf_counter()
+        super().connect()
+        HTTP_TIMING.record("connect", time.perf_counter() - t0)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self) -> None:                  # TCP + TLS handshake
+        t0 = time.perf_counter()
+        super().connect()
+        HTTP_TIMING.record("connect", time.perf_counter() - t0)
+
+
+class _TimedHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools time connection setup and whole requests."""
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPPool,
+                                                   "https": _TimedHTTPSPool}
+
+    def send(self, request, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return super().send(request, *args, **kwargs)
+        finally:
+            HTTP_TIMING.record("request", time.perf_counter() - t0)
+
+
+def pooled_session(pool_size: int = 10, retries: int = 2,
+                   backoff: float = 0.3) -> requests.Session:
+    """Keep-alive session; at most pool_size open connections per host."""
+    retry = Retry(total=retries, connect=retries, read=0, status=retries,
+                  backoff_factor=backoff, status_forcelist=(502, 503, 504),
+                  allowed_methods=frozenset({"GET"}), raise_on_status=False)
+    adapter = TimedAdapter(pool_connections=4, pool_maxsize=pool_size,
+                           max_retries=retry, pool_block=True)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -0,0 +1,223 @@
+"""
+Per-stage latency histograms and counters, exported as Prometheus text
+
+`METRICS.stage(name)`               : context manager timing one request stage
+`METRICS.observe(metric, v, ...)`   : add a value to a histogram
+`METRICS.inc(metric, n, ...)`       : bump a counter
+`METRICS.render()`                  : exposition text for /api/metrics
+`begin_timing()` / `end_timing()`   : collect this request's stages for a
+                                      Server-Timing header (opt-in per request)
+
+Stages land in one histogram, `<prefix>_stage_seconds{stage="..."}`. With
+METRICS_ENABLED=0 and no Server-Timing requested, `stage()` hands back a
+shared no-op context manager, so instrumented code pays one attribute check.
+Counts are per process (like the response-cache stats): scrape every worker.
+"""
+
+
+from __future__ import annotations
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").strip().lower() not in ("0", "false", "no", "")
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)                      # seconds
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+# stages of the current request, or None when Server-Timing wasn't asked for
+_TIMINGS: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timing", default=None)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed upper bounds; counts are per bucket (made cumulative on render)."""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds) -> None:
+        self.bounds = tuple(float(b) for b in bounds)
+        self.counts = [0] * (len(self.bounds) + 1)         # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "t0")
+
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        self.metrics, self.name = metrics, name
+
+    def __enter__(self) -> "_Stage":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.metrics.record_stage(self.name, time.perf_counter() - self.t0)
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoStage":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NOOP = _NoStage()
+
+
+class Metrics:
+    def __init__(self, enabled: bool = True, prefix: str = "cityfinder") -> None:
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._hist: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[Labels, float]]] = {}
+        self._stages: Dict[str, Histogram] = {}            # stage name -> its series
+        self._help: Dict[str, str] = {"stage_seconds": "Wall time per request stage."}
+
+    # ── recording ───────────────────────────────────────────────────
+    def stage(self, name: str):
+        """`with METRICS.stage("suggest.score"):` times the block."""
+        if not self.enabled and _TIMINGS.get() is None:
+            return _NOOP
+        return _Stage(self, name)
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        """For stages timed by the caller (e.g. the solver's own stage clock)."""
+        if self.enabled:
+            h = self._stages.get(name)
+            with self._lock:
+                if h is None:
+                    series = self._hist.setdefault("stage_seconds", {})
+                    h = series.setdefault((("stage", name),), Histogram(LATENCY_BUCKETS))
+                    self._stages[name] = h
+                h.observe(seconds)
+        timings = _TIMINGS.get()
+        if timings is not None:
+            timings.append((name, seconds))
+
+    def observe(self, metric: str, value: float, buckets=LATENCY_BUCKETS, **labels) -> None:
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._hist.setdefault(metric, {})
+            h = series.get(key)
+            if h is None:
+                h = series[key] = Histogram(buckets)
+            h.observe(float(value))
+
+    def inc(self, metric: str, n: float = 1, **labels) -> None:
+        if not self.enabled or not n:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(metric, {})
+            series[key] = series.get(key, 0) + n
+
+    def gauge(self, metric: str, fn: Callable[[], Dict[Labels, float]], help: str = "") -> None:
+        """Register a callback read at render time ({labels: value})."""
+        self._gauges[metric] = fn
+        if help:
+            self._help[metric] = help
+
+    def describe(self, metric: str, help: str) -> None:
+        self._help[metric] = help
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hist.clear()
+            self._counters.clear()
+            self._stages.clear()
+
+    # ── export ──────────────────────────────────────────────────────
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        p = self.prefix
+        lines: List[str] = []
+        with self._lock:
+            hists = {m: {k: (h.bounds, list(h.counts), h.sum, h.count) for k, h in s.items()}
+                     for m, s in self._hist.items()}
+            counters = {m: dict(s) for m, s in self._counters.items()}
+        for metric in sorted(hists):
+            name = f"{p}_{metric}"
+            lines += _header(name, "histogram", self._help.get(metric))
+            for key, (bounds, counts, total, n) in sorted(hists[metric].items()):
+                acc = 0
+                for le, c in zip([*map(_num, bounds), "+Inf"], counts):
+                    acc += c
+                    lines.append(f"{name}_bucket{_labels(key + (('le', le),))} {acc}")
+                lines.append(f"{name}_sum{_labels(key)} {_num(total)}")
+                lines.append(f"{name}_count{_labels(key)} {n}")
+        for metric in sorted(counters):
+            name = f"{p}_{metric}_total"
+            lines += _header(name, "counter", self._help.get(metric))
+            for key, v in sorted(counters[metric].items()):
+                lines.append(f"{name}{_labels(key)} {_num(v)}")
+        for metric in sorted(self._gauges):
+            try:
+                values = self._gauges[metric]()
+            except Exception:
+                continue                                # a broken gauge mustn't break scraping
+            name = f"{p}_{metric}"
+            lines += _header(name, "gauge", self._help.get(metric))
+            for key, v in sorted(values.items()):
+                lines.append(f"{name}{_labels(key)} {_num(v)}")
+        return "\n".join(lines) + "\n"
+
+
+def _header(name: str, kind: str, help: Optional[str]) -> List[str]:
+    out = [f"# HELP {name} {help}"] if help else []
+    return out + [f"# TYPE {name} {kind}"]
+
+
+def _labels(key: Labels) -> str:
+    if not key:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")  # noqa: E731
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in key) + "}"
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) and not float(v).is_integer() else str(int(v))
+
+
+# ── per-request Server-Timing ─────────────────────────────────────────
+def begin_timing() -> None:
+    """Start collecting stages for the current request (context-local)."""
+    _TIMINGS.set([])
+
+
+def end_timing() -> Optional[List[Tuple[str, float]]]:
+    """Stop collecting; returns what was recorded (None if never begun)."""
+    timings = _TIMINGS.get()
+    _TIMINGS.set(None)
+    return timings
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float | None = None) -> str:
+    """`suggest.score;dur=1.234, ...` (ms); repeated stages are summed, in first-seen order."""
+    merged: Dict[str, float] = {}
+    for name, s in timings:
+        merged[name] = merged.get(name, 0.0) + s
+    parts = [f"{name};dur={s * 1000:.3f}" for name, s in merged.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(parts)
+
+
+METRICS = Metrics(enabled=METRICS_ENABLED)
@@ -0,0 +1,368 @@
+"""
+Model compiler for suggestion_algo: CSVs -> flat NumPy arrays
+
+`load_sources(...)` : parse master / PCA / feature-handling CSVs into frames
+`compile_model(...)` : score matrix, explanation matrix, name columns,
+                       filter columns (coordinates, numeric) + meta
+
+Only imported when the artifact has to be (re)built or a caller asks for
+the raw frames, so pandas stays off the normal import path.
+"""
+
+
+from __future__ import annotations
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple, Iterable
+
+import numpy as np
+import pandas as pd
+
+# ─────────────────────────────────────────────────────────────────────
+# PCA weights (tolerant to header variants)
+# ─────────────────────────────────────────────────────────────────────
+def _pick_header(cands: Iterable[str], cols: Iterable[str]) -> str:
+    norm = {str(c).strip().lower(): c for c in cols}
+    for want in cands:
+        if want in norm:
+            return norm[want]
+    raise KeyError(f"Could not find any of {cands} in PCA columns {list(cols)}")
+
+def _load_pca_scores(pca_csv: Path) -> Dict[str, float]:
+    _df_pca = pd.read_csv(pca_csv)
+    col_feat = _pick_header({"feature", "variable"}, _df_pca.columns)
+    col_pc1  = _pick_header({"pc-1", "pc1", "loading"}, _df_pca.columns)
+    return (
+        _df_pca.assign(**{col_feat: _df_pca[col_feat].astype(str).str.strip()})
+               .set_index(col_feat)[col_pc1]
+               .apply(pd.to_numeric, errors="coerce")
+               .dropna()
+               .to_dict()
+    )
+
+# ─────────────────────────────────────────────────────────────────────
+# Feature handling config (drop / invert / gold)
+# ─────────────────────────────────────────────────────────────────────
+VAR_COL      = "Variable"
+HANDLING_COL = "Handling (Normal scale, 'Goldilocks')"
+INV_COL      = "Inversion (Y/N)"
+
+def _norm_series(s: pd.Series) -> pd.Series:
+    return s.astype(str).str.strip().str.lower()
+
+def _load_feature_cfg(cfg_csv: Path) -> Tuple[List[str], List[str], List[str]]:
+    """Returns (drop_vars, invert_vars, gold_vars)."""
+    df_cfg = pd.read_csv(cfg_csv).fillna("")
+    if not all(c in df_cfg.columns for c in [VAR_COL, HANDLING_COL, INV_COL]):
+        return [], [], []
+    handling = _norm_series(df_cfg[HANDLING_COL])
+    return (
+        df_cfg[handling.str.startswith("obs")][VAR_COL].astype(str).tolist(),
+        df_cfg[_norm_series(df_cfg[INV_COL]).eq("y")][VAR_COL].astype(str).tolist(),
+        df_cfg[handling.eq("gold")][VAR_COL].astype(str).tolist(),
+    )
+
+# ─────────────────────────────────────────────────────────────────────
+# Column resolution / synthesis
+# ─────────────────────────────────────────────────────────────────────
+ALIASES: Dict[str, Iterable[str]] = {
+    "time_zone_C": ["time_zone_CM", "time_zone_CE"],  # synthesize Central from CM/CE when needed
+}
+
+def resolve_col(name: str, frame: pd.DataFrame) -> str | None:
+    """Return a column present in frame for 'name', using ALIASES if needed.
+       If two alias parts exist, synthesize 'name' as their mean."""
+    if name in frame.columns:
+        return name
+    if name in ALIASES:
+        opts = [c for c in ALIASES[name] if c in frame.columns]
+        if len(opts) == 1:
+            frame[name] = frame[opts[0]]
+            return name
+        if len(opts) >= 2:
+            frame[name] = frame[opts].mean(axis=1, skipna=True)
+            return name
+    return None
+
+# ─────────────────────────────────────────────────────────────────────
+# Normalization (min–max) and inversion
+# ─────────────────────────────────────────────────────────────────────
+def _minmax(s: pd.Series) -> pd.Series:
+    s = pd.to_numeric(s, errors="coerce")
+    mn, mx = s.min(skipna=True), s.max(skipna=True)
+    if pd.isna(mn) or pd.isna(mx) or mx == mn:
+        return pd.Series(np.zeros(len(s)), index=s.index)
+    return (s - mn) / (mx - mn)
+
+# ─────────────────────────────────────────────────────────────────────
+# Source load (CSV -> frames)
+# ─────────────────────────────────────────────────────────────────────
+def load_sources(master_csv: Path, pca_csv: Path, cfg_csv: Path,
+                 coords_csv: Path | None = None) -> Dict[str, object]:
+    """
+    Parse the three CSVs into df_master / df / df_norm plus feature config.
+    coords_csv (optional, gazetteer layout) supplies city coordinates.
+    """
+    df_master = pd.read_csv(master_csv, low_memory=False)
+    df = df_master.copy()
+    pca_scores = _load_pca_scores(pca_csv)
+    drop_vars, invert_vars, gold_vars = _load_feature_cfg(cfg_csv)
+
+    # Ensure synthesized columns up-front
+    _ = resolve_col("time_zone_C", df)
+
+    # time_zone_other = not ET/CT/MT/PT
+    if "time_zone_other" not in df.columns:
+        core = ["time_zone_E", "time_zone_C", "time_zone_M", "time_zone_P"]
+        if set(core).issubset(df.columns):
+            df["time_zone_other"] = (1.0 - df[core].sum(axis=1)).clip(lower=0.0)
+
+    df_norm = df.copy()
+    for c in df_norm.columns:
+        if pd.api.types.is_numeric_dtype(df_norm[c]):
+            df_norm[c] = _minmax(df_norm[c])
+
+    # Invert “bad is high” features after normalization
+    for v in invert_vars:
+        if v in df_norm.columns:
+            df_norm[v] = 1.0 - df_norm[v]
+
+    # Gold ranges from raw (non-normalized) values
+    gold_ranges: Dict[str, float] = {}
+    for v in gold_vars:
+        if v in df.columns:
+            series = pd.to_numeric(df[v], errors="coerce")
+            rng = series.max(skipna=True) - series.min(skipna=True)
+            gold_ranges[v] = float(rng) if pd.notna(rng) and rng > 0 else 0.0
+
+    # Every PCA feature the scorer can see gets its column wired up now
+    for var in pca_scores:
+        resolve_col(var, df_norm)
+
+    return {
+        "df_master": df_master, "df": df, "df_norm": df_norm,
+        "pca_scores": pca_scores, "drop_vars": drop_vars,
+        "invert_vars": invert_vars, "gold_vars": gold_vars,
+        "gold_ranges": gold_ranges,
+        "coords_csv": coords_csv if coords_csv and Path(coords_csv).exists() else None,
+    }
+
+# ─────────────────────────────────────────────────────────────────────
+# Dense scoring matrix (compiled once; same rules as _row_score)
+# ─────────────────────────────────────────────────────────────────────
+# Normal features:  score += norm_val * pca_w * imp        -> X_norm @ w
+# Gold features:    score += closeness * pca_w * imp       -> C(ideal) @ w
+# A NaN normalized value poisons the whole row (NaN * anything), exactly as
+# the scalar path does, so those rows are tracked in a mask.
+def _build_score_matrix(src: Dict[str, object]) -> Dict[str, object]:
+    df, df_norm = src["df"], src["df_norm"]
+    gold_rngs = src["gold_ranges"]
+    norm_feats: List[str] = []
+    gold_feats: List[str] = []
+    norm_cols: List[np.ndarray] = []
+    gold_cols: List[np.ndarray] = []
+    norm_w: List[float] = []
+    gold_w: List[float] = []
+    gold_rng: List[float] = []
+
+    for var, pca_w in src["pca_scores"].items():
+        col_norm = resolve_col(var, df_norm)
+        if col_norm is None:
+            continue
+        if var in gold_rngs and var in df.columns and gold_rngs[var] > 0:
+            gold_feats.append(var)
+            gold_cols.append(pd.to_numeric(df[var], errors="coerce").to_numpy(np.float64))
+            gold_w.append(float(pca_w))
+            gold_rng.append(gold_rngs[var])
+        else:
+            norm_feats.append(var)
+            norm_cols.append(pd.to_numeric(df_norm[col_norm], errors="coerce").to_numpy(np.float64))
+            norm_w.append(float(pca_w))
+
+    n = len(df)
+    X_norm = np.column_stack(norm_cols) if norm_cols else np.zeros((n, 0))
+    X_gold = np.column_stack(gold_cols) if gold_cols else np.zeros((n, 0))
+    nan_rows = np.isnan(X_norm).any(axis=1)
+    return {
+        "norm_features": norm_feats, "gold_features": gold_feats,
+        "x_norm": np.ascontiguousarray(np.nan_to_num(X_norm, nan=0.0)),
+        "w_norm": np.asarray(norm_w, dtype=np.float64),
+        "x_gold": np.ascontiguousarray(X_gold),
+        "w_gold": np.asarray(gold_w, dtype=np.float64),
+        "gold_rng": np.asarray(gold_rng, dtype=np.float64),
+        "nan_rows": nan_rows,
+    }
+
+# ─────────────────────────────────────────────────────────────────────
+# Per-city explanations ("topFeatures"), row-aligned with the score matrix
+# ─────────────────────────────────────────────────────────────────────
+#   gold   : |pca| * clip(1 - |v - ideal| / range, 0, 1)
+#   others : |pca| * |z| * importance        (inversion only flips z's sign)
+# Features the user left at <= 0 are never reasons.
+def _build_explain_matrix(src: Dict[str, object]) -> Dict[str, object]:
+    df_master = src["df_master"]
+    gold_list = src["gold_vars"]
+    feats: List[str] = []
+    cols: List[np.ndarray] = []
+    is_gold: List[bool] = []
+    weights: List[float] = []
+    ranges: List[float] = []
+
+    for f, pca_w in src["pca_scores"].items():
+        if f not in df_master.columns:
+            continue
+        s = pd.to_numeric(df_master[f], errors="coerce")
+        if s.notna().sum() <= 3:
+            continue
+        w = abs(float(pca_w))
+        rng = float(s.max() - s.min()) or 0.0
+        if w <= 0:
+            continue
+        v = s.to_numpy(np.float64)
+        if f in gold_list:
+            if rng <= 0:
+                continue
+            cols.append(v)              # raw value; closeness needs the ideal
+        else:
+            sd = float(s.std(ddof=0)) or 0.0
+            if sd <= 0:
+                continue
+            cols.append(w * np.abs((v - float(s.mean())) / sd))
+        feats.append(f)
+        is_gold.append(f in gold_list)
+        weights.append(w)
+        ranges.append(rng)
+
+    X = np.column_stack(cols) if cols else np.zeros((len(df_master), 0))
+    return {
+        "explain_features": feats,
+        "x_explain": np.ascontiguousarray(X),
+        "explain_gold": np.asarray(is_gold, dtype=bool),
+        "explain_w": np.asarray(weights, dtype=np.float64),
+        "explain_rng": np.asarray(ranges, dtype=np.float64),
+    }
+
+# ─────────────────────────────────────────────────────────────────────
+# City/state extraction (robust)
+# ─────────────────────────────────────────────────────────────────────
+CITY_CANDS  = ["city", "City", "city_ascii", "Place", "name", "NAME"]
+STATE_CANDS = ["state", "State", "state_name", "ST", "st", "usps", "STATE"]
+FIPS_CANDS  = ["FIPS", "fips", "FIPS5", "County_FIPS", "county_fips",
+               "FIPS_5digit", "FIPS_Code"]
+
+# Name lookup over df_master: any city column x any state column -> row pos
+LOOKUP_CITY_COLS  = ["city_ascii", "city", "City"]
+LOOKUP_STATE_COLS = ["State", "state", "STATE"]
+
+def _pick_col(cands: Iterable[str], frame: pd.DataFrame) -> str | None:
+    for c in cands:
+        if c in frame.columns:
+            return c
+    return None
+
+def _str_col(s: pd.Series) -> np.ndarray:
+    return s.astype(str).to_numpy(dtype=str)
+
+def _build_name_columns(src: Dict[str, object]) -> Dict[str, object]:
+    df, df_master = src["df"], src["df_master"]
+    n = len(df)
+    city_col, state_col = _pick_col(CITY_CANDS, df), _pick_col(STATE_CANDS, df)
+
+    # First non-empty FIPS-like value per row, as the API used to read it
+    fips = np.full(n, "", dtype=object)
+    for c in FIPS_CANDS:
+        if c in df_master.columns:
+            col = df_master[c]
+            vals = col.astype(str).str.strip().where(col.notna(), "")
+            fips = np.where(fips == "", vals.to_numpy(dtype=object), fips)
+
+    lookup_city = [_str_col(df_master[c]) for c in LOOKUP_CITY_COLS if c in df_master.columns]
+    lookup_state = [_str_col(df_master[c]) for c in LOOKUP_STATE_COLS if c in df_master.columns]
+    return {
+        "city_col": city_col, "state_col": state_col,
+        "city_names": _str_col(df[city_col]) if city_col else df.index.astype(str).to_numpy(dtype=str),
+        "state_names": _str_col(df[state_col]) if state_col else np.full(n, "", dtype=str),
+        "fips": fips.astype(str),
+        "lookup_city": np.array(lookup_city, dtype=str).reshape(len(lookup_city), n),
+        "lookup_state": np.array(lookup_state, dtype=str).reshape(len(lookup_state), n),
+    }
+
+# ─────────────────────────────────────────────────────────────────────
+# Filter columns: coordinates + numeric attributes for pre-filters
+# ─────────────────────────────────────────────────────────────────────
+# Public filter name -> master column, compared in raw units (people, acres,
+# USD, years). CityMaster stores population, acreage and income min-max scaled
+# to 0..1; RAW_BOUNDS undoes that with the (min, max) the scaling used
+# (Prepare_PCA.ipynb / Merge_Personal_Data.ipynb outputs).
+FILTER_COLUMNS = {
+    "population": "new_city_pop",
+    "acreage": "Acreage",
+    "medianIncome": "HHINCOME_median",
+    "medianHomeValue": "VALUEH_median",
+    "medianAge": "AGE_median",
+}
+RAW_BOUNDS = {
+    "new_city_pop": (15.0, 18908608.0),
+    "Acreage": (1274.55, 11720810.39),
+    "HHINCOME_median": (58000.0, 197500.0),
+}
+
+def _city_coordinates(df_master: pd.DataFrame, coords_csv: Path | None) -> np.ndarray:
+    """(N x 2) lat/lon per row from the gazetteer CSV; NaN where unknown."""
+    coords = np.full((len(df_master), 2), np.nan)
+    if coords_csv is None or "city_ascii" not in df_master or "State" not in df_master:
+        return coords
+    from gazetteer import Gazetteer, clean, state_code
+    gaz = Gazetteer.load(coords_csv)
+    for pos, (city, state) in enumerate(zip(df_master["city_ascii"], df_master["State"])):
+        code = state_code(state) if isinstance(state, str) else None
+        hit = gaz.index.lookup(clean(city), code) if code else None
+        if hit is not None:
+            coords[pos] = gaz.coords[hit]
+    return coords
+
+def _build_filter_columns(src: Dict[str, object]) -> Dict[str, object]:
+    df_master = src["df_master"]
+    names = [k for k, col in FILTER_COLUMNS.items() if col in df_master.columns]
+    values = []
+    for k in names:
+        col = FILTER_COLUMNS[k]
+        v = pd.to_numeric(df_master[col], errors="coerce").to_numpy(np.float64)
+        if col in RAW_BOUNDS:
+            lo, hi = RAW_BOUNDS[col]
+            v = lo + v * (hi - lo)
+        values.append(v)
+    return {
+        "filter_columns": names,
+        "filter_values": np.array(values, dtype=np.float64).reshape(len(names), len(df_master)),
+        "coords": _city_coordinates(df_master, src.get("coords_csv")),
+    }
+
+# ─────────────────────────────────────────────────────────────────────
+# Compile
+# ─────────────────────────────────────────────────────────────────────
+def compile_model(src: Dict[str, object], digests: Dict[str, str],
+                  model_format: int) -> Dict[str, np.ndarray]:
+    """Turn the parsed CSVs into the flat array dict stored in the artifact."""
+    parts: Dict[str, object] = {}
+    for build in (_build_score_matrix, _build_explain_matrix, _build_name_columns,
+                  _build_filter_columns):
+        parts.update(build(src))
+
+    meta_keys = ("norm_features", "gold_features", "explain_features", "city_col", "state_col",
+                 "filter_columns")
+    version = hashlib.sha256(
+        json.dumps([model_format, digests], sort_keys=True).encode()).hexdigest()[:12]
+    meta = {
+        "format": model_format, "version": version, "sources": digests,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "pca_scores": src["pca_scores"], "drop_vars": src["drop_vars"],
+        "invert_vars": src["invert_vars"], "gold_vars": src["gold_vars"],
+        "gold_ranges": src["gold_ranges"],
+        **{k: parts.pop(k) for k in meta_keys},
+    }
+    arrays = {k: np.asarray(v) for k, v in parts.items()}
+    arrays["meta"] = np.array(json.dumps(meta))
+    return arrays
@@ -0,0 +1,138 @@
+"""
+Normalized place-name index: (name, qualifier) -> row position
+
+`NameIndex.lookup(name, qualifier)` : exact hash hit (case/space-insensitive)
+`NameIndex.lookup_any(name)`        : exact name hits under any qualifier
+`NameIndex.prefix(text)`            : names starting with text (sorted + bisect)
+`NameIndex.fuzzy(text)`             : trigram candidates ranked by Dice overlap
+
+Qualifier is whatever disambiguates a name (the state, for cities). Built
+once; lookups never scan the whole table. The prefix/trigram structures are
+only materialized on the first prefix()/fuzzy() call.
+"""
+
+
+from __future__ import annotations
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def normalize(s) -> str:
+    """Same key trip_mapper uses: collapse whitespace, lowercase."""
+    return " ".join(str(s if s is not None else "").split()).lower()
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    def __init__(self) -> None:
+        self._exact: Dict[Tuple[str, str], int] = {}
+        self._by_name: Dict[str, List[int]] = {}
+        self._sorted: List[str] = []
+        self._grams: Dict[str, List[str]] = {}
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def add(self, name, qualifier, pos: int) -> None:
+        """Register a row; the first position seen for a key wins."""
+        n, q = normalize(name), normalize(qualifier)
+        if not n:
+            return
+        if (n, q) not in self._exact:
+            self._exact[(n, q)] = pos
+        positions = self._by_name.setdefault(n, [])
+        if pos not in positions:
+            positions.append(pos)
+        self._dirty = True
+
+    @classmethod
+    def from_columns(cls, names: Iterable[Iterable], qualifiers: Iterable[Iterable]
+                     ) -> "NameIndex":
+        """
+        names / qualifiers: one iterable of values per candidate column,
+        all aligned by row position. Every (name col, qualifier col) pair of
+        a row is indexed, so any column variant matches.
+        """
+        idx = cls()
+        name_cols = [list(c) for c in names]
+        qual_cols = [list(c) for c in qualifiers] or [[]]
+        n_rows = max((len(c) for c in name_cols), default=0)
+        for pos in range(n_rows):
+            for nc in name_cols:
+                for qc in qual_cols:
+                    idx.add(nc[pos], qc[pos] if pos < len(qc) else "", pos)
+        return idx
+
+    def _finalize(self) -> None:
+        if not self._dirty:
+            return
+        self._sorted = sorted(self._by_name)
+        grams: Dict[str, List[str]] = {}
+        for n in self._sorted:
+            for g in _trigrams(n):
+                grams.setdefault(g, []).append(n)
+        self._grams = grams
+        self._dirty = False
+
+    # ── lookups ──────────────────────────────────────────────────────
+    def lookup(self, name, qualifier="") -> Optional[int]:
+        return self._exact.get((normalize(name), normalize(qualifier)))
+
+    def lookup_any(self, name) -> List[int]:
+        """Every row position with this exact name, in insertion order."""
+        return list(self._by_name.get(normalize(name), ()))
+
+    def _filter(self, names: Iterable[str], qualifier, limit: int) -> List[int]:
+        q = normalize(qualifier) if qualifier else ""
+        out: List[int] = []
+        for n in names:
+            if q:
+                pos = self._exact.get((n, q))
+                hits = [pos] if pos is not None else []
+            else:
+                hits = self._by_name.get(n, [])
+            for pos in hits:
+                if pos not in out:
+                    out.append(pos)
+                if len(out) >= limit:
+                    return out
+        return out
+
+    def prefix(self, text, qualifier=None, limit: int = 10) -> List[int]:
+        """Row positions whose name starts with text, alphabetical."""
+        self._finalize()
+        p = normalize(text)
+        if not p:
+            return []
+
+        def names():
+            i = bisect_left(self._sorted, p)
+            while i < len(self._sorted) and self._sorted[i].startswith(p):
+                yield self._sorted[i]
+                i += 1
+        return self._filter(names(), qualifier, limit)
+
+    def fuzzy(self, text, qualifier=None, limit: int = 5,
+              cutoff: float = 0.5) -> List[int]:
+        """Row positions of the closest names by trigram Dice similarity."""
+        self._finalize()
+        key = normalize(text)
+        if not key:
+            return []
+        grams = _trigrams(key)
+        shared: Counter = Counter()
+        for g in grams:
+            shared.update(self._grams.get(g, ()))
+        ranked = []
+        for n, common in shared.items():
+            dice = 2.0 * common / (len(grams) + len(_trigrams(n)))
+            if dice >= cutoff:
+                ranked.append((-dice, n))
+        ranked.sort()
+        return self._filter((n for _, n in ranked), qualifier, limit)
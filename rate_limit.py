@@ -0,0 +1,115 @@
+"""
+Token-bucket rate limiter with a shared back-off window
+
+`TokenBucket(rate, burst)`              : in-process, thread-safe
+`TokenBucket(rate, burst, path=db)`     : state lives in a SQLite row, so every
+                                          process using the file shares one budget
+`bucket.acquire()`                      : block until a token is free and no
+                                          back-off is in force
+`bucket.backoff(seconds)`               : pause *all* callers (e.g. after the
+                                          provider answered OVER_QUERY_LIMIT)
+
+Used by trip_mapper to keep concurrent geocoding under the provider's QPS.
+"""
+
+
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit (
+    name          TEXT PRIMARY KEY,
+    tokens        REAL NOT NULL,
+    updated_at    REAL NOT NULL,
+    blocked_until REAL NOT NULL
+)
+"""
+
+# (tokens, updated_at, blocked_until)
+State = Tuple[float, float, float]
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None, path=None,
+                 name: str = "default", clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self.path = str(path) if path else None
+        self.name = name
+        self._clock, self._sleep = clock, sleep
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._state: State = (self.burst, clock(), 0.0)
+        self.waited = 0.0                       # seconds callers spent blocked
+        if self.path:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn()
+
+    # ── state access (in memory, or one row under a write transaction) ──
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO rate_limit VALUES (?, ?, ?, 0)",
+                         (self.name, self.burst, self._clock()))
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _update(self, fn: Callable[[State, float], Tuple[State, float]]) -> float:
+        """Apply fn(state, now) -> (new_state, result) atomically; returns result."""
+        with self._lock:
+            now = self._clock()
+            if not self.path:
+                self._state, result = fn(self._state, now)
+                return result
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated_at, blocked_until FROM rate_limit "
+                                   "WHERE name = ?", (self.name,)).fetchone()
+                state, result = fn(row, now)
+                conn.execute("UPDATE rate_limit SET tokens = ?, updated_at = ?, blocked_until = ? "
+                             "WHERE name = ?", (*state, self.name))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return result
+
+    # ── public ──────────────────────────────────────────────────────
+    def try_acquire(self) -> float:
+        """Take a token if possible; returns 0.0 on success, else seconds to wait."""
+        def take(state: State, now: float) -> Tuple[State, float]:
+            tokens, updated, blocked = state
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            if now < blocked:
+                return (tokens, now, blocked), blocked - now
+            if tokens >= 1.0:
+                return (tokens - 1.0, now, blocked), 0.0
+            return (tokens, now, blocked), (1.0 - tokens) / self.rate
+        return self._update(take)
+
+    def acquire(self) -> None:
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0.0:
+                return
+            self.waited += wait
+            self._sleep(wait)
+
+    def backoff(self, seconds: float) -> None:
+        """Block every caller for `seconds` (extends, never shortens, a pause)."""
+        def block(state: State, now: float) -> Tuple[State, float]:
+            tokens, updated, blocked = state
+            return (tokens, updated, max(blocked, now + seconds)), 0.0
+        self._update(block)
@@ -0,0 +1,168 @@
+"""
+Bounded LRU cache for serialized API responses
+
+`ResponseCache.get(key)` / `.put(key, body)` : bytes in, bytes out
+`ResponseCache.stats()`                       : hits, misses, hit rate, size
+
+Bounded by entry count *and* total bytes (least recently used goes first).
+Every entry belongs to a data version; `ensure_version(v)` drops anything
+built from another version. With a `path`, a SQLite file backs the in-memory
+tier so pre-forked workers share entries (same pattern as geocode_cache).
+"""
+
+
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key       TEXT PRIMARY KEY,
+    version   TEXT NOT NULL,
+    body      BLOB NOT NULL,
+    size      INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+)
+"""
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 32 << 20,
+                 version: str = "", path=None) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = version
+        self.path = str(path) if path else None
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._tick = 0
+        self.hits = self.shared_hits = self.misses = self.evictions = 0
+        if self.path:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            if version:                     # "" = not known yet; ensure_version() prunes later
+                self._conn().execute("DELETE FROM responses WHERE version != ?", (version,))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _next_tick(self) -> int:
+        # monotonically increasing LRU stamp; ns clock keeps workers comparable
+        self._tick = max(self._tick + 1, time.time_ns())
+        return self._tick
+
+    # ── version ─────────────────────────────────────────────────────
+    def ensure_version(self, version: str) -> None:
+        """Drop every entry not built from `version`."""
+        if version == self.version:
+            return
+        with self._lock:
+            self._mem.clear()
+            self._bytes = 0
+            self.version = version
+        if self.path:
+            self._conn().execute("DELETE FROM responses WHERE version != ?", (version,))
+
+    # ── lookups ─────────────────────────────────────────────────────
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            body = self._mem.get(key)
+            if body is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return body
+        if self.path:
+            try:
+                conn = self._conn()
+                row = conn.execute("SELECT body FROM responses WHERE key = ? AND version = ?",
+                                   (key, self.version)).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE responses SET last_used = ? WHERE key = ?",
+                                 (self._next_tick(), key))
+                    body = bytes(row[0])
+                    self._remember(key, body)
+                    with self._lock:
+                        self.hits += 1
+                        self.shared_hits += 1
+                    return body
+            except sqlite3.Error:
+                pass                                    # shared tier is best-effort
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, body: bytes) -> None:
+        if not self.enabled or len(body) > self.max_bytes:
+            return
+        self._remember(key, body)
+        if self.path:
+            try:
+                conn = self._conn()
+                conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                             (key, self.version, body, len(body), self._next_tick()))
+                self._evict_shared(conn)
+            except sqlite3.Error:
+                pass
+
+    def _remember(self, key: str, body: bytes) -> None:
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._mem[key] = body
+            self._bytes += len(body)
+            while self._mem and (len(self._mem) > self.max_entries or self._bytes > self.max_bytes):
+                _, dropped = self._mem.popitem(last=False)
+                self._bytes -= len(dropped)
+                self.evictions += 1
+
+    def _evict_shared(self, conn: sqlite3.Connection) -> None:
+        n, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if n <= self.max_entries and size <= self.max_bytes:
+            return
+        # walk oldest-first until both bounds hold
+        drop, n_left, size_left = [], n, size
+        for key, sz in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if n_left <= self.max_entries and size_left <= self.max_bytes:
+                break
+            drop.append((key,))
+            n_left -= 1
+            size_left -= sz
+        conn.executemany("DELETE FROM responses WHERE key = ?", drop)
+
+    # ── introspection ───────────────────────────────────────────────
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._bytes = 0
+        if self.path:
+            self._conn().execute("DELETE FROM responses")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            looked = self.hits + self.misses
+            return {"version": self.version, "entries": len(self._mem), "bytes": self._bytes,
+                    "maxEntries": self.max_entries, "maxBytes": self.max_bytes,
+                    "hits": self.hits, "sharedHits": self.shared_hits,
+                    "misses": self.misses, "evictions": self.evictions,
+                    "hitRate": round(self.hits / looked, 4) if looked else None,
+                    "shared": bool(self.path)}
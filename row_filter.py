@@ -0,0 +1,168 @@
+"""
+Pre-filters for the recommender: which rows may be scored at all
+
+`RowFilter(coords, states, numeric)` : indexes, built once at model load
+`RowFilter.rows(spec)`               : sorted row positions passing the spec
+
+spec (the "filters" object of /api/suggest):
+    {"near": {"lat": 30.27, "lon": -97.74, "miles": 300}}
+    {"states": ["TX", "Oklahoma"]}
+    {"population": {"min": 50000}, "medianAge": {"max": 40}}      # raw units
+
+near    : haversine BallTree over rows with known coordinates
+states  : rows stable-sorted by state, so each state is one row range
+numeric : rows sorted by value per column, so a range is two bisections
+All filters intersect. States and numeric ranges know their size up front;
+the smallest candidate set is materialized from its index and the other
+filters are checked only on those rows.
+"""
+
+
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from gazetteer import US_STATES, state_code
+from name_index import normalize
+
+EARTH_MILES = 3958.8
+_NEAR_SEED_FRAC = 0.125      # seed from the BallTree unless another filter is this small
+
+
+def _state_key(s) -> str:
+    code = state_code(s)
+    return normalize(US_STATES[code] if code else s)
+
+
+class RowFilter:
+    def __init__(self, coords: np.ndarray, states, numeric: Dict[str, np.ndarray]) -> None:
+        self.n = len(states)
+        # coordinates (radians) + BallTree over rows that have them
+        coords = np.asarray(coords, dtype=np.float64).reshape(self.n, 2)
+        self._geo_rows = np.flatnonzero(np.isfinite(coords).all(axis=1))
+        self._rad = np.radians(coords)
+        self._tree = None
+        if self._geo_rows.size:
+            from sklearn.neighbors import BallTree
+            self._tree = BallTree(self._rad[self._geo_rows], metric="haversine")
+
+        # states: one contiguous range of the state-sorted order per state
+        keys = np.array([_state_key(s) for s in states], dtype=object)
+        uniq, self._state_id = np.unique(keys, return_inverse=True)
+        self._state_order = np.argsort(self._state_id, kind="stable")
+        bounds = np.searchsorted(self._state_id[self._state_order], np.arange(uniq.size + 1))
+        self._state_ranges = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+        self._state_index = {k: i for i, k in enumerate(uniq)}
+
+        # numeric: ascending order per column (NaN sorts last, never matches)
+        self._values = {k: np.asarray(v, dtype=np.float64) for k, v in numeric.items()}
+        self._order = {k: np.argsort(v, kind="stable") for k, v in self._values.items()}
+        self._sorted = {k: v[self._order[k]] for k, v in self._values.items()}
+
+    @property
+    def geo_coverage(self) -> int:
+        """Rows with coordinates (the only ones a "near" filter can keep)."""
+        return int(self._geo_rows.size)
+
+    @property
+    def numeric_columns(self) -> List[str]:
+        return list(self._values)
+
+    # ── spec parsing ────────────────────────────────────────────────
+    def _parse(self, spec: Dict) -> Tuple[Optional[Tuple[float, float, float]],
+                                          Optional[np.ndarray], Dict[str, Tuple[float, float]]]:
+        if not isinstance(spec, dict):
+            raise ValueError("filters must be an object")
+        near = states = None
+        ranges: Dict[str, Tuple[float, float]] = {}
+        for key, val in spec.items():
+            if key == "near":
+                try:
+                    near = (float(val["lat"]), float(val["lon"]), float(val["miles"]))
+                except (TypeError, KeyError, ValueError):
+                    raise ValueError('"near" needs numeric lat, lon and miles') from None
+                if not near[2] >= 0:
+                    raise ValueError('"near.miles" must be >= 0')
+            elif key == "states":
+                names = [val] if isinstance(val, str) else list(val or [])
+                ids = []
+                for s in names:
+                    i = self._state_index.get(_state_key(s))
+                    if i is None:
+                        raise ValueError(f"unknown state: {s!r}")
+                    ids.append(i)
+                states = np.unique(np.asarray(ids, dtype=np.intp))
+            elif key in self._values:
+                if not isinstance(val, dict):
+                    raise ValueError(f'"{key}" needs {{"min": ..., "max": ...}}')
+                try:
+                    lo = float(val["min"]) if val.get("min") is not None else -np.inf
+                    hi = float(val["max"]) if val.get("max") is not None else np.inf
+                except (TypeError, ValueError):
+                    raise ValueError(f'"{key}" min/max must be numbers') from None
+                ranges[key] = (lo, hi)
+            else:
+                raise ValueError(f"unknown filter: {key!r}")
+        return near, states, ranges
+
+    # ── index lookups ───────────────────────────────────────────────
+    def _state_rows(self, ids: np.ndarray) -> np.ndarray:
+        parts = [self._state_order[slice(*self._state_ranges[i])] for i in ids]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+
+    def _range_bounds(self, key: str, lo: float, hi: float) -> Tuple[int, int]:
+        vals = self._sorted[key]
+        return (int(np.searchsorted(vals, lo, side="left")),
+                int(np.searchsorted(vals, hi, side="right")))
+
+    def _near_rows(self, lat: float, lon: float, miles: float) -> np.ndarray:
+        if self._tree is None:
+            return np.empty(0, dtype=np.intp)
+        hits = self._tree.query_radius(np.radians([[lat, lon]]), r=miles / EARTH_MILES)[0]
+        return np.sort(self._geo_rows[hits])
+
+    def _near_mask(self, rows: np.ndarray, lat: float, lon: float, miles: float) -> np.ndarray:
+        la, lo = self._rad[rows, 0], self._rad[rows, 1]
+        la0, lo0 = np.radians(lat), np.radians(lon)
+        h = np.sin((la - la0) / 2) ** 2 + np.cos(la0) * np.cos(la) * np.sin((lo - lo0) / 2) ** 2
+        with np.errstate(invalid="ignore"):
+            d = 2 * EARTH_MILES * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+        return d <= miles                                   # NaN coords -> False
+
+    # ── public ──────────────────────────────────────────────────────
+    def rows(self, spec: Dict | None) -> Optional[np.ndarray]:
+        """Sorted row positions passing every filter; None when spec is empty."""
+        if not spec:
+            return None
+        near, states, ranges = self._parse(spec)
+        if near is not None and self._tree is None:
+            raise ValueError('"near" unavailable: no city coordinates in the model')
+
+        # sizes known without materializing anything
+        sizes = {k: self._range_bounds(k, lo, hi) for k, (lo, hi) in ranges.items()}
+        counts = {k: b - a for k, (a, b) in sizes.items()}
+        if states is not None:
+            counts["states"] = sum(b - a for a, b in (self._state_ranges[i] for i in states))
+        seed = min(counts, key=counts.get) if counts else None
+        if near is not None and (seed is None or counts[seed] > self.n * _NEAR_SEED_FRAC):
+            seed = "near"
+
+        if seed == "near":
+            rows = self._near_rows(*near)
+        elif seed == "states":
+            rows = self._state_rows(states)
+        else:
+            a, b = sizes[seed]
+            rows = np.sort(self._order[seed][a:b])
+
+        # the other filters as predicates on the surviving rows
+        if near is not None and seed != "near":
+            rows = rows[self._near_mask(rows, *near)]
+        if states is not None and seed != "states":
+            rows = rows[np.isin(self._state_id[rows], states)]
+        for k, (lo, hi) in ranges.items():
+            if k != seed:
+                v = self._values[k][rows]
+                rows = rows[(v >= lo) & (v <= hi)]
+        return rows
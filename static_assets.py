@@ -0,0 +1,420 @@
+"""
+Static files for the Flask app: fingerprinted URLs, precompressed bodies,
+ETags, 304s and byte ranges, served from a per-worker memory cache
+
+`StaticAssets.serve(rel)`   : response for e.g. "css/global.css" or the
+                              fingerprinted "css/global.1a2b3c4d.css"
+`StaticAssets.page(rel)`    : an HTML page with its local href/src rewritten
+                              to fingerprinted URLs
+`StaticAssets.url_for(rel)` : "css/global.1a2b3c4d.css"
+`build(out)`                : manifest + .gz/.br copies (the build step)
+
+    python static_assets.py --build        # -> build/static (STATIC_BUILD_DIR)
+
+The manifest maps each file to its content hash, size and mtime, so workers
+trust it instead of hashing at startup; a file whose size/mtime changed since
+the build is rehashed on first request. Fingerprinted URLs are immutable for a
+year; plain URLs get STATIC_MAX_AGE and revalidate by ETag. Brotli copies need
+the optional `brotli` package (skipped without it); without a build, text
+files are gzipped once per worker on first request. Files up to
+STATIC_MEMORY_FILE_MB are kept in memory (LRU, STATIC_CACHE_MB in total);
+bigger ones (the landing video) are streamed from disk, with Range support.
+"""
+
+
+from __future__ import annotations
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent
+
+STATIC_DIRS = ("assets", "css", "js", "components", "city_images", "data")
+STATIC_PAGES = ("index.html",)
+STATIC_BUILD_DIR = Path(os.getenv("STATIC_BUILD_DIR") or ROOT / "build" / "static")
+STATIC_CACHE_MB = float(os.getenv("STATIC_CACHE_MB", "64"))
+STATIC_MEMORY_FILE_MB = float(os.getenv("STATIC_MEMORY_FILE_MB", "2"))
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "300"))      # seconds, plain URLs
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = {".html", ".css", ".js", ".mjs", ".json", ".csv", ".svg", ".txt", ".xml",
+                ".map", ".ttf", ".otf", ".eot", ".ico"}
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))                  # preference order
+MANIFEST = "manifest.json"
+_HASH_LEN = 8                                                  # hex chars in a URL
+_MIN_COMPRESS = 512                                            # bytes
+_MIN_GAIN = 0.9                                                # keep if <= 90% of original
+_CHUNK = 256 << 10
+_FINGERPRINT = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$" % _HASH_LEN)
+_PAGE_REF = re.compile(r'(?P<attr>\b(?:href|src)=)"(?P<url>[^"#?:]+)"')
+
+mimetypes.add_type("text/javascript", ".js")
+mimetypes.add_type("font/woff2", ".woff2")
+mimetypes.add_type("font/ttf", ".ttf")
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _digest_file(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _digest(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _fingerprinted(rel: str, digest: str) -> str:
+    stem, dot, ext = rel.rpartition(".")
+    if not dot or "/" in ext:
+        return f"{rel}.{digest[:_HASH_LEN]}"
+    return f"{stem}.{digest[:_HASH_LEN]}.{ext}"
+
+
+def _compressible(rel: str) -> bool:
+    return Path(rel).suffix.lower() in COMPRESSIBLE
+
+
+class _Entry:
+    """One file as served: identity body (or None = stream from disk) + encoded variants."""
+    __slots__ = ("rel", "path", "mtime_ns", "size", "digest", "ctype", "body", "variants", "vary")
+
+    def __init__(self, rel, path, mtime_ns, size, digest, body=None, variants=None) -> None:
+        self.rel, self.path = rel, path
+        self.mtime_ns, self.size, self.digest = mtime_ns, size, digest
+        ctype = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        if ctype.startswith("text/") or ctype in ("application/json", "image/svg+xml"):
+            ctype += "; charset=utf-8"
+        self.ctype = ctype
+        self.body: Optional[bytes] = body
+        self.variants: Dict[str, bytes] = variants or {}
+        self.vary = _compressible(rel)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body or b"") + sum(map(len, self.variants.values()))
+
+
+# ─────────────────────────────────────────────────────────────────────
+# build step
+# ─────────────────────────────────────────────────────────────────────
+def iter_files(root: Path = ROOT) -> Iterator[str]:
+    """Every servable file, as a root-relative posix path."""
+    for page in STATIC_PAGES:
+        if (root / page).is_file():
+            yield page
+    for d in STATIC_DIRS:
+        for p in sorted((root / d).rglob("*")):
+            if p.is_file() and not p.name.startswith("."):
+                yield p.relative_to(root).as_posix()
+
+
+def build(out: Path = STATIC_BUILD_DIR, root: Path = ROOT) -> Dict:
+    """Hash every file, write .gz (and .br with `brotli`) copies of text ones, then the manifest."""
+    out = Path(out)
+    brotli = _brotli()
+    files: Dict[str, Dict] = {}
+    raw = packed = 0
+    for rel in iter_files(root):
+        path = root / rel
+        st = path.stat()
+        item = {"hash": _digest_file(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "encodings": []}
+        if _compressible(rel) and st.st_size >= _MIN_COMPRESS:
+            body = path.read_bytes()
+            sizes = []
+            for enc, suffix in ENCODINGS:
+                if enc == "br":
+                    if brotli is None:
+                        continue
+                    data = brotli.compress(body, quality=11)
+                else:
+                    data = gzip.compress(body, compresslevel=9, mtime=0)
+                if len(data) > len(body) * _MIN_GAIN:
+                    continue
+                dst = out / (rel + suffix)
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                dst.write_bytes(data)
+                item["encodings"].append(enc)
+                sizes.append(len(data))
+            if sizes:
+                raw, packed = raw + len(body), packed + min(sizes)
+        files[rel] = item
+    out.mkdir(parents=True, exist_ok=True)
+    manifest = {"built": int(time.time()), "brotli": brotli is not None, "files": files}
+    tmp = out / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, out / MANIFEST)
+    manifest["stats"] = {"files": len(files), "compressedFrom": raw, "compressedTo": packed}
+    return manifest
+
+
+# ─────────────────────────────────────────────────────────────────────
+# serving
+# ─────────────────────────────────────────────────────────────────────
+class StaticAssets:
+    def __init__(self, root: Path = ROOT, build_dir: Path = STATIC_BUILD_DIR,
+                 max_bytes: int = int(STATIC_CACHE_MB * (1 << 20)),
+                 max_file: int = int(STATIC_MEMORY_FILE_MB * (1 << 20)),
+                 max_age: int = STATIC_MAX_AGE) -> None:
+        self.root = Path(root).resolve()
+        self.build_dir = Path(build_dir)
+        self.max_bytes, self.max_file, self.max_age = max_bytes, max_file, max_age
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._pages: Dict[str, Tuple[tuple, _Entry]] = {}
+        self.hits = self.misses = self.evictions = self.not_modified = 0
+        self.manifest: Dict[str, Dict] = {}
+        try:
+            with open(self.build_dir / MANIFEST, encoding="utf-8") as f:
+                self.manifest = json.load(f).get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._mem), "bytes": self._bytes, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions,
+                "notModified": self.not_modified, "manifest": len(self.manifest)}
+
+    # ── lookup ──────────────────────────────────────────────────────
+    def _path(self, rel: str) -> Optional[Path]:
+        parts = rel.split("/")
+        if not rel or rel.startswith("/") or "\\" in rel or any(p in ("", ".", "..") for p in parts):
+            return None
+        if parts[0] not in STATIC_DIRS and rel not in STATIC_PAGES:
+            return None
+        return self.root / rel
+
+    def _entry(self, rel: str) -> Optional[_Entry]:
+        """Current entry for `rel` (None if missing); stat-checked, so edits show up."""
+        path = self._path(rel)
+        if path is None:
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        if not path.is_file():
+            return None
+        with self._lock:
+            e = self._mem.get(rel)
+            if e is not None and e.mtime_ns == st.st_mtime_ns and e.size == st.st_size:
+                self._mem.move_to_end(rel)
+                self.hits += 1
+                return e
+        self.misses += 1
+        e = self._load(rel, path, st)
+        self._store(e)                                  # big files: just the digest, no body
+        return e
+
+    def _load(self, rel: str, path: Path, st) -> _Entry:
+        built = self.manifest.get(rel)
+        if built and (built["size"], built["mtime_ns"]) != (st.st_size, st.st_mtime_ns):
+            built = None                                # edited since the build step
+        if st.st_size > self.max_file:
+            digest = built["hash"] if built else _digest_file(path)
+            return _Entry(rel, path, st.st_mtime_ns, st.st_size, digest)
+        body = path.read_bytes()
+        digest = built["hash"] if built else _digest(body)
+        variants: Dict[str, bytes] = {}
+        if built:
+            for enc, suffix in ENCODINGS:
+                if enc in built["encodings"]:
+                    try:
+                        variants[enc] = (self.build_dir / (rel + suffix)).read_bytes()
+                    except OSError:
+                        pass
+        elif _compressible(rel) and len(body) >= _MIN_COMPRESS:
+            data = gzip.compress(body, compresslevel=6, mtime=0)
+            if len(data) <= len(body) * _MIN_GAIN:
+                variants["gzip"] = data
+        return _Entry(rel, path, st.st_mtime_ns, len(body), digest, body, variants)
+
+    def _store(self, e: _Entry) -> None:
+        size = e.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._mem.pop(e.rel, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._mem[e.rel] = e
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._mem:
+                _, gone = self._mem.popitem(last=False)
+                self._bytes -= gone.nbytes
+                self.evictions += 1
+
+    def _resolve(self, rel: str) -> Tuple[Optional[_Entry], bool]:
+        """(entry, immutable): plain paths first, then "name.<hash>.ext"."""
+        e = self._entry(rel)
+        if e is not None:
+            return e, False
+        m = _FINGERPRINT.match(rel)
+        if m is None:
+            return None, False
+        e = self._entry(m["stem"] + m["ext"]) or self._entry(m["stem"])
+        # a stale hash (page older than the deploy) still gets the current file, uncached
+        return e, e is not None and e.digest.startswith(m["hash"])
+
+    def url_for(self, rel: str) -> str:
+        e = self._entry(rel)
+        return _fingerprinted(rel, e.digest) if e is not None else rel
+
+    # ── responses ───────────────────────────────────────────────────
+    def serve(self, rel: str):
+        """Response for one static path (raises NotFound like send_from_directory)."""
+        from werkzeug.exceptions import NotFound
+        e, immutable = self._resolve(rel)
+        if e is None:
+            raise NotFound()
+        return self._respond(e, IMMUTABLE if immutable else f"public, max-age={self.max_age}")
+
+    def page(self, rel: str = "index.html"):
+        """An HTML page whose local href/src point at fingerprinted URLs; always revalidated."""
+        from werkzeug.exceptions import NotFound
+        src = self._entry(rel)
+        if src is None or src.body is None:
+            raise NotFound()
+        text = src.body.decode("utf-8")
+        refs = sorted({m["url"] for m in _PAGE_REF.finditer(text)})
+        current = {r: self._entry(r) for r in refs}
+        key = (src.digest, tuple((r, e.digest) for r, e in current.items() if e is not None))
+        cached = self._pages.get(rel)
+        if cached is None or cached[0] != key:
+            def sub(m):
+                e = current.get(m["url"])
+                return f'{m["attr"]}"{_fingerprinted(e.rel, e.digest)}"' if e else m[0]
+            body = _PAGE_REF.sub(sub, text).encode("utf-8")
+            variants = {}
+            gz = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gz) <= len(body) * _MIN_GAIN:
+                variants["gzip"] = gz
+            brotli = _brotli()
+            if brotli is not None:
+                variants["br"] = brotli.compress(body, quality=11)
+            cached = self._pages[rel] = (key, _Entry(rel, src.path, src.mtime_ns, len(body),
+                                                     _digest(body), body, variants))
+        return self._respond(cached[1], "no-cache")
+
+    def _respond(self, e: _Entry, cache_control: str):
+        from flask import Response, request
+        from werkzeug.http import http_date, parse_date
+
+        ranged = request.range is not None and request.method == "GET"
+        encoding = None
+        if e.variants and not ranged:
+            accept = request.accept_encodings
+            for enc, _ in ENCODINGS:
+                if enc in e.variants and accept[enc] > 0:
+                    encoding = enc
+                    break
+        etag = f'"{e.digest}-{encoding}"' if encoding else f'"{e.digest}"'
+        last_modified = e.mtime_ns // 1_000_000_000
+        headers = {"ETag": etag, "Cache-Control": cache_control,
+                   "Last-Modified": http_date(last_modified)}
+        if e.vary:
+            headers["Vary"] = "Accept-Encoding"
+
+        # conditional GET: If-None-Match wins over If-Modified-Since (weak comparison)
+        inm = request.headers.get("If-None-Match")
+        if inm is not None:
+            tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+            fresh = "*" in tags or etag in tags
+        else:
+            ims = parse_date(request.headers.get("If-Modified-Since"))
+            fresh = ims is not None and ims.timestamp() >= last_modified
+        if fresh:
+            self.not_modified += 1
+            return Response(status=304, headers=headers)
+
+        headers["Content-Type"] = e.ctype
+        if encoding:
+            body = e.variants[encoding]
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            return Response(body, status=200, headers=headers)
+
+        headers["Accept-Ranges"] = "bytes"
+        start, stop, status = 0, e.size, 200
+        rng = request.range if ranged else None
+        if rng is not None and len(rng.ranges) == 1 and self._if_range(etag, last_modified):
+            bounds = rng.range_for_length(e.size)
+            if bounds is None:
+                headers["Content-Range"] = f"bytes */{e.size}"
+                return Response(status=416, headers=headers)
+            start, stop = bounds
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{stop - 1}/{e.size}"
+        headers["Content-Length"] = str(stop - start)
+        if e.body is not None:
+            body = e.body if (start, stop) == (0, e.size) else e.body[start:stop]
+            return Response(body, status=status, headers=headers)
+        return Response(_read_range(e.path, start, stop), status=status, headers=headers,
+                        direct_passthrough=True)
+
+    @staticmethod
+    def _if_range(etag: str, last_modified: int) -> bool:
+        """A Range only applies if If-Range (when sent) still matches this representation."""
+        from flask import request
+        from werkzeug.http import parse_date
+        cond = request.headers.get("If-Range")
+        if not cond:
+            return True
+        if cond.startswith('"') or cond.startswith("W/"):
+            return cond == etag                         # strong comparison only
+        when = parse_date(cond)
+        return when is not None and int(when.timestamp()) == last_modified
+
+
+def _read_range(path: Path, start: int, stop: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        left = stop - start
+        while left > 0:
+            block = f.read(min(_CHUNK, left))
+            if not block:
+                break
+            left -= len(block)
+            yield block
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Fingerprint + precompress the static files.")
+    ap.add_argument("--build", action="store_true", help="write the manifest and .gz/.br copies")
+    ap.add_argument("--out", default=str(STATIC_BUILD_DIR), help="build directory")
+    args = ap.parse_args(argv)
+    if not args.build:
+        ap.print_help()
+        return 2
+    t0 = time.perf_counter()
+    manifest = build(Path(args.out))
+    s = manifest["stats"]
+    print(f"{s['files']} files -> {args.out} in {time.perf_counter() - t0:.2f}s; "
+          f"text {s['compressedFrom'] / 1024:.0f} KiB -> {s['compressedTo'] / 1024:.0f} KiB "
+          f"(brotli {'on' if manifest['brotli'] else 'off: pip install brotli'})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
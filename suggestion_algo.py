@@ -3,15 +3,51 @@ City-recommendation engine, web-ready version of algo found in development
 
 `df_raw` : master CSV of city metrics
 `suggest_top_cities(prefs, n)` : return best-matching city names
+`score_vector(prefs)` : raw score for every row (dense NumPy scoring)
+`score_cities(prefs, n)` : one pass -> top-N rows, all scores, summary stats
+`top_rows(prefs, n)` : top-N rows + scores; large models use the TopNIndex
+`filter_rows(filters)` : rows within a radius / in states / in numeric ranges
+`score_matrix(profiles)` : (P x N) scores for many profiles at once
+`explain_rows(rows, prefs)` : top-k reason features for many cities at once
+`quantize_prefs(prefs)` : canonical, quantized prefs (response-cache key)
+`ScoringSession(prefs)` : keeps a score vector; .update(changes) is O(N) per slider
+
+The scoring arrays are compiled from the three CSVs into one versioned
+artifact (`MODEL_ARTIFACT`) and loaded from there on import; it is rebuilt
+automatically whenever a source CSV's hash changes. Large arrays are
+memory-mapped read-only (CITY_MODEL_MMAP=0 to read them into the heap), so
+gunicorn workers share one copy. `df_master`, `df` and `df_norm` are only
+parsed on first access.
+
+CLI: `python suggestion_algo.py profiles.jsonl -o top.jsonl --top 10`
+     `python suggestion_algo.py --build-model`
 """
 
 
 from __future__ import annotations
+import argparse
+import hashlib
+import json
+import logging
+import os
+import struct
+import sys
+import tempfile
+import time
+import zipfile
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Union, Iterable
+from typing import Dict, Iterator, List, Tuple, Union, Iterable, IO
 
 import numpy as np
-import pandas as pd
+
+from gazetteer import GAZETTEER_PATH, US_STATES, split_query
+from metrics import METRICS
+from name_index import NameIndex
+from row_filter import RowFilter
+from topn_index import TopNIndex
+
+log = logging.getLogger("suggestion_algo")
 
 # ─────────────────────────────────────────────────────────────────────
 # Paths
@@ -20,124 +56,53 @@ BASE = Path(__file__).parent / "data"
 MASTER_CSV       = BASE / "CityMaster1.9.5.csv"
 PCA_CSV          = BASE / "PCA_1.3.csv"          # pivoted two-column version
 FEATURE_CFG_CSV  = BASE / "feature_handling.csv"
+SOURCE_CSVS      = (MASTER_CSV, PCA_CSV, FEATURE_CFG_CSV)
+COORDS_CSV       = Path(GAZETTEER_PATH)           # optional: city lat/lon for geo filters
 
-# ─────────────────────────────────────────────────────────────────────
-# Load master
-# ─────────────────────────────────────────────────────────────────────
-df_master = pd.read_csv(MASTER_CSV, low_memory=False)
-df = df_master.copy()
+# Compiled model (kept out of the served /data directory)
+MODEL_ARTIFACT = Path(os.getenv("CITY_MODEL_PATH", "") or
+                      Path(__file__).parent / "build" / "city_model.npz")
+MODEL_FORMAT = 3   # bump when the artifact layout changes
+MODEL_MMAP = os.getenv("CITY_MODEL_MMAP", "1").strip().lower() not in {"0", "false", "no"}
+# Row count from which top-N queries prune with the threshold index
+TOPN_INDEX_MIN = int(os.getenv("TOPN_INDEX_MIN", "50000"))
 
 # ─────────────────────────────────────────────────────────────────────
-# PCA weights (tolerant to header variants)
+# Raw frames (lazy; compiled arrays below serve the request path)
 # ─────────────────────────────────────────────────────────────────────
-_df_pca = pd.read_csv(PCA_CSV)
-
-def _pick_header(cands: Iterable[str], cols: Iterable[str]) -> str:
-    norm = {str(c).strip().lower(): c for c in cols}
-    for want in cands:
-        if want in norm:
-            return norm[want]
-    raise KeyError(f"Could not find any of {cands} in PCA columns {list(cols)}")
-
-col_feat = _pick_header({"feature", "variable"}, _df_pca.columns)
-col_pc1  = _pick_header({"pc-1", "pc1", "loading"}, _df_pca.columns)
-
-PCA_SCORES: Dict[str, float] = (
-    _df_pca.assign(**{col_feat: _df_pca[col_feat].astype(str).str.strip()})
-           .set_index(col_feat)[col_pc1]
-           .apply(pd.to_numeric, errors="coerce")
-           .dropna()
-           .to_dict()
-)
-
-# ─────────────────────────────────────────────────────────────────────
-# Feature handling config (drop / invert / gold)
-# ─────────────────────────────────────────────────────────────────────
-df_cfg = pd.read_csv(FEATURE_CFG_CSV).fillna("")
-VAR_COL      = "Variable"
-HANDLING_COL = "Handling (Normal scale, 'Goldilocks')"
-INV_COL      = "Inversion (Y/N)"
-
-def _norm_series(s: pd.Series) -> pd.Series:
-    return s.astype(str).str.strip().str.lower()
-
-drop_vars: List[str] = []
-invert_vars: List[str] = []
-gold_vars: List[str] = []
-
-if all(c in df_cfg.columns for c in [VAR_COL, HANDLING_COL, INV_COL]):
-    drop_vars = df_cfg[_norm_series(df_cfg[HANDLING_COL]).str.startswith("obs")][VAR_COL].astype(str).tolist()
-    invert_vars = df_cfg[_norm_series(df_cfg[INV_COL]).eq("y")][VAR_COL].astype(str).tolist()
-    gold_vars = df_cfg[_norm_series(df_cfg[HANDLING_COL]).eq("gold")][VAR_COL].astype(str).tolist()
-
-# ─────────────────────────────────────────────────────────────────────
-# Column resolution / synthesis
-# ─────────────────────────────────────────────────────────────────────
-ALIASES: Dict[str, Iterable[str]] = {
-    "time_zone_C": ["time_zone_CM", "time_zone_CE"],  # synthesize Central from CM/CE when needed
-}
-
-def _resolve_col(name: str, frame: pd.DataFrame) -> str | None:
-    """Return a column present in frame for 'name', using ALIASES if needed.
-       If two alias parts exist, synthesize 'name' as their mean."""
-    if name in frame.columns:
-        return name
-    if name in ALIASES:
-        opts = [c for c in ALIASES[name] if c in frame.columns]
-        if len(opts) == 1:
-            frame[name] = frame[opts[0]]
-            return name
-        if len(opts) >= 2:
-            frame[name] = frame[opts].mean(axis=1, skipna=True)
-            return name
-    return None
-
-# Ensure synthesized columns up-front
-_ = _resolve_col("time_zone_C", df)
-
-# time_zone_other = not ET/CT/MT/PT
-if "time_zone_other" not in df.columns:
-    core = ["time_zone_E", "time_zone_C", "time_zone_M", "time_zone_P"]
-    if set(core).issubset(df.columns):
-        df["time_zone_other"] = (1.0 - df[core].sum(axis=1)).clip(lower=0.0)
-
-# ─────────────────────────────────────────────────────────────────────
-# Normalization (min–max) and inversion
-# ─────────────────────────────────────────────────────────────────────
-def _minmax(s: pd.Series) -> pd.Series:
-    s = pd.to_numeric(s, errors="coerce")
-    mn, mx = s.min(skipna=True), s.max(skipna=True)
-    if pd.isna(mn) or pd.isna(mx) or mx == mn:
-        return pd.Series(np.zeros(len(s)), index=s.index)
-    return (s - mn) / (mx - mn)
-
-df_norm = df.copy()
-for c in df_norm.columns:
-    if pd.api.types.is_numeric_dtype(df_norm[c]):
-        df_norm[c] = _minmax(df_norm[c])
-
-# Invert “bad is high” features after normalization
-for v in invert_vars:
-    if v in df_norm.columns:
-        df_norm[v] = 1.0 - df_norm[v]
-
-# Gold ranges from raw (non-normalized) values
-gold_ranges: Dict[str, float] = {}
-for v in gold_vars:
-    if v in df.columns:
-        series = pd.to_numeric(df[v], errors="coerce")
-        rng = series.max(skipna=True) - series.min(skipna=True)
-        gold_ranges[v] = float(rng) if pd.notna(rng) and rng > 0 else 0.0
+_FRAMES: Dict[str, object] | None = None
+
+def _frames() -> Dict[str, object]:
+    """Parsed CSV frames, loaded on first use (request path never needs them)."""
+    global _FRAMES
+    if _FRAMES is None:
+        import model_build
+        _FRAMES = model_build.load_sources(MASTER_CSV, PCA_CSV, FEATURE_CFG_CSV, COORDS_CSV)
+    return _FRAMES
+
+def __getattr__(name: str):
+    # df_master / df / df_norm stay importable, but only cost a CSV parse
+    # for callers that actually touch them.
+    if name in ("df_master", "df", "df_norm"):
+        return _frames()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ─────────────────────────────────────────────────────────────────────
 # Scoring
 # ─────────────────────────────────────────────────────────────────────
 def _row_score(idx: int, prefs: Dict[str, Union[int, float, str]]) -> float:
+    """Scalar reference scorer for one row (kept for parity checks against
+       score_vector(); not used on the request path)."""
+    import pandas as pd
+    from model_build import resolve_col
+
+    src = _frames()
+    df, df_norm = src["df"], src["df_norm"]
     total = 0.0
 
     for var, pca_w in PCA_SCORES.items():
         # Wire up columns (synthesizing when possible)
-        col_norm = _resolve_col(var, df_norm)
+        col_norm = resolve_col(var, df_norm)
         if col_norm is None:
             continue  # skip unknown features
 
@@ -166,72 +131,674 @@ def _row_score(idx: int, prefs: Dict[str, Union[int, float, str]]) -> float:
     return float(total)
 
 # ─────────────────────────────────────────────────────────────────────
-# City/state extraction (robust)
+# Compiled model artifact (one .npz: arrays + JSON meta)
+# ─────────────────────────────────────────────────────────────────────
+def _source_digests() -> Dict[str, str]:
+    paths = SOURCE_CSVS + ((COORDS_CSV,) if COORDS_CSV.exists() else ())
+    return {p.name: hashlib.sha256(p.read_bytes()).hexdigest() for p in paths}
+
+def compile_model(digests: Dict[str, str] | None = None) -> Dict[str, np.ndarray]:
+    import model_build
+    return model_build.compile_model(_frames(), digests or _source_digests(), MODEL_FORMAT)
+
+def save_model(arrays: Dict[str, np.ndarray], path: Path = MODEL_ARTIFACT) -> Path:
+    """Write atomically so concurrently booting workers never see a torn file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=path.name, suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return path
+
+def build_model(path: Path = MODEL_ARTIFACT) -> Dict[str, np.ndarray]:
+    arrays = compile_model()
+    try:
+        save_model(arrays, path)
+    except OSError as e:
+        log.warning("Could not write model artifact %s (%s); using in-memory model", path, e)
+    return arrays
+
+# ─────────────────────────────────────────────────────────────────────
+# Shared read-only mapping of the artifact
+# ─────────────────────────────────────────────────────────────────────
+# np.savez stores members uncompressed, so every large array can be mapped
+# straight from the zip. All workers then share the same page-cache pages
+# instead of each holding a private heap copy.
+_MMAP_MIN_BYTES = 64 * 1024   # smaller members are just read
+
+def _mmap_npz(path: Path) -> Dict[str, np.ndarray]:
+    """Zero-copy, read-only views of an uncompressed .npz's arrays."""
+    out: Dict[str, np.ndarray] = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as fh:
+        for info in zf.infolist():
+            key = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type == zipfile.ZIP_STORED:
+                # local header: 30 fixed bytes, then name + extra field
+                fh.seek(info.header_offset + 26)
+                n_name, n_extra = struct.unpack("<HH", fh.read(4))
+                fh.seek(info.header_offset + 30 + n_name + n_extra)
+                version = np.lib.format.read_magic(fh)
+                read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                               else np.lib.format.read_array_header_2_0)
+                shape, fortran, dtype = read_header(fh)
+                nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+                if not dtype.hasobject and nbytes >= _MMAP_MIN_BYTES:
+                    mm = np.memmap(path, dtype=dtype, mode="r", offset=fh.tell(),
+                                   shape=shape, order="F" if fortran else "C")
+                    out[key] = mm.view(np.ndarray)
+                    continue
+            with zf.open(info) as member:
+                out[key] = np.lib.format.read_array(member, allow_pickle=False)
+    return out
+
+def _read_model(path: Path) -> Dict[str, np.ndarray]:
+    if MODEL_MMAP:
+        return _mmap_npz(path)
+    with np.load(path, allow_pickle=False) as z:
+        return {k: z[k] for k in z.files}
+
+def load_model(path: Path = MODEL_ARTIFACT) -> Dict[str, np.ndarray]:
+    """Load the artifact, rebuilding it if missing, unreadable or stale."""
+    digests = _source_digests()
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+        if meta.get("format") == MODEL_FORMAT and meta.get("sources") == digests:
+            return _read_model(path)
+        log.info("Model artifact %s is stale; rebuilding", path)
+    except FileNotFoundError:
+        log.info("No model artifact at %s; building", path)
+    except Exception as e:
+        log.warning("Unreadable model artifact %s (%s); rebuilding", path, e)
+    arrays = build_model(path)
+    try:
+        return _read_model(path)
+    except OSError:
+        return arrays          # artifact could not be written; stay in memory
+
+# ─────────────────────────────────────────────────────────────────────
+# Memory measurement (per process)
+# ─────────────────────────────────────────────────────────────────────
+_SMAPS_FIELDS = {"Rss": "rss_kb", "Pss": "pss_kb",
+                 "Shared_Clean": "shared_clean_kb", "Shared_Dirty": "shared_dirty_kb",
+                 "Private_Clean": "private_clean_kb", "Private_Dirty": "private_dirty_kb"}
+
+def memory_report() -> Dict[str, int]:
+    """
+    This process's memory in kB. On Linux, smaps_rollup also gives PSS and
+    the shared/private split, which is what shows the mmap win per worker.
+    """
+    out: Dict[str, int] = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/smaps_rollup") as fh:
+            for line in fh:
+                name, _, rest = line.partition(":")
+                if name in _SMAPS_FIELDS:
+                    out[_SMAPS_FIELDS[name]] = int(rest.split()[0])
+    except OSError:
+        import resource
+        out["max_rss_kb"] = int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    return out
+
+# ─────────────────────────────────────────────────────────────────────
+# Load model
+# ─────────────────────────────────────────────────────────────────────
+_mem_before = memory_report()
+_MODEL = load_model()
+MODEL_MEMORY: Dict[str, Dict[str, int]] = {"before": _mem_before, "after": memory_report()}
+log.info("Model loaded (mmap=%s): rss %s -> %s kB", MODEL_MMAP,
+         _mem_before.get("rss_kb", "?"), MODEL_MEMORY["after"].get("rss_kb", "?"))
+_META: Dict[str, object] = json.loads(str(_MODEL["meta"]))
+
+MODEL_VERSION: str = _META["version"]
+PCA_SCORES: Dict[str, float] = _META["pca_scores"]
+drop_vars: List[str] = _META["drop_vars"]
+invert_vars: List[str] = _META["invert_vars"]
+gold_vars: List[str] = _META["gold_vars"]
+gold_ranges: Dict[str, float] = _META["gold_ranges"]
+
+NORM_FEATURES: List[str] = _META["norm_features"]
+GOLD_FEATURES: List[str] = _META["gold_features"]
+_X_NORM   = _MODEL["x_norm"]
+_W_NORM   = _MODEL["w_norm"]
+_X_GOLD   = _MODEL["x_gold"]
+_W_GOLD   = _MODEL["w_gold"]
+_GOLD_RNG = _MODEL["gold_rng"]
+_NAN_ROWS = _MODEL["nan_rows"]
+
+EXPLAIN_FEATURES: List[str] = _META["explain_features"]
+_X_EXPLAIN   = _MODEL["x_explain"]
+_EXPLAIN_GOLD = _MODEL["explain_gold"]
+_EXPLAIN_W   = _MODEL["explain_w"]
+_EXPLAIN_RNG = _MODEL["explain_rng"]
+# ties break on feature name, descending (matches sort(reverse=True) on tuples)
+_EXPLAIN_NAME_RANK = np.argsort(np.argsort(np.array(EXPLAIN_FEATURES, dtype=object)))
+
+CITY_COL  = _META["city_col"]
+STATE_COL = _META["state_col"]
+_CITY_NAMES  = _MODEL["city_names"]
+_STATE_NAMES = _MODEL["state_names"]
+CITY_FIPS    = _MODEL["fips"]          # raw county FIPS string per row
+CITY_INDEX   = NameIndex.from_columns(_MODEL["lookup_city"], _MODEL["lookup_state"])
+N_CITIES     = int(_X_NORM.shape[0])
+
+# Pre-filter indexes (coordinates come from COORDS_CSV when it exists)
+FILTER_COLUMNS: List[str] = _META["filter_columns"]
+CITY_COORDS  = _MODEL["coords"]        # (N x 2) lat/lon, NaN where unknown
+ROW_FILTER   = RowFilter(CITY_COORDS, _STATE_NAMES,
+                         dict(zip(FILTER_COLUMNS, _MODEL["filter_values"])))
+_CITY_POP    = (_MODEL["filter_values"][FILTER_COLUMNS.index("population")]
+                if "population" in FILTER_COLUMNS else np.full(N_CITIES, np.nan))
+
+# ─────────────────────────────────────────────────────────────────────
+# Request-time scoring
+# ─────────────────────────────────────────────────────────────────────
+def _pref_value(prefs: Dict[str, Union[int, float, str]], var: str) -> float:
+    try:
+        return float(prefs.get(var, 0))
+    except Exception:
+        return 0.0
+
+def _importance(user_val: float) -> float:
+    # Scale user importance 0..1 (sliders 0..5)
+    return max(0.0, min(user_val, 5.0)) / 5.0
+
+# Every preference key the scorer or the explainer reads
+PREF_FEATURES = sorted(set(NORM_FEATURES) | set(GOLD_FEATURES) | set(EXPLAIN_FEATURES))
+_GOLD_RANGE = {f: float(r) for f, r in zip(GOLD_FEATURES, _GOLD_RNG)}
+
+def quantize_prefs(prefs: Dict[str, Union[int, float, str]],
+                   step: float = 0.1, gold_frac: float = 0.005) -> Dict[str, float]:
+    """
+    Canonical copy of prefs for caching: only PREF_FEATURES, as floats
+    rounded to `step` (non-numeric / non-finite / negative -> 0; a negative
+    value neither scores nor explains). Goldilocks ideals beyond the 0..5
+    slider span round to `gold_frac` of the feature's range instead, but
+    never below 5 (where their importance would drop). Scoring the quantized
+    prefs is what makes equal keys give identical responses.
+    """
+    out: Dict[str, float] = {}
+    for f in PREF_FEATURES:
+        v = _pref_value(prefs, f)
+        if not np.isfinite(v) or v < 0:
+            v = 0.0
+        q = step
+        if f in _GOLD_RANGE and v > 5.0:
+            q = max(step, _GOLD_RANGE[f] * gold_frac)
+        qv = round(round(v / q) * q, 9) if q > 0 else v
+        out[f] = max(qv, 5.0) if v >= 5.0 else qv
+    return out
+
+def score_vector(prefs: Dict[str, Union[int, float, str]],
+                 rows: np.ndarray | None = None) -> np.ndarray:
+    """
+    Raw score for every row of df (positional order), identical to
+    `_row_score` but computed as a mat-vec plus a vectorized gold kernel.
+    With `rows`, only those positions are scored (result aligned to rows).
+    """
+    sel = slice(None) if rows is None else rows
+    imp_norm = np.array([_importance(_pref_value(prefs, v)) for v in NORM_FEATURES],
+                        dtype=np.float64)
+    scores = _X_NORM[sel] @ (_W_NORM * imp_norm)
+
+    if GOLD_FEATURES:
+        ideal = np.array([_pref_value(prefs, v) for v in GOLD_FEATURES], dtype=np.float64)
+        imp_gold = np.array([_importance(u) for u in ideal], dtype=np.float64)
+        # closeness = max(0, 1 - |val - ideal| / range); missing raw values add 0
+        closeness = np.fmax(0.0, 1.0 - np.abs(_X_GOLD[sel] - ideal) / _GOLD_RNG)
+        scores += closeness @ (_W_GOLD * imp_gold)
+
+    scores[_NAN_ROWS[sel]] = np.nan
+    return scores
+
+def _place_row(place) -> int:
+    """
+    Row of a model city with coordinates. Without a state the most populous
+    match wins (as in Gazetteer.find); a tie it can't break is a ValueError
+    listing the candidates.
+    """
+    name, code = split_query(place)
+    if code:
+        hits = [CITY_INDEX.lookup(name, US_STATES[code])]
+    else:
+        hits = CITY_INDEX.lookup_any(name)
+    hits = [p for p in hits if p is not None and np.isfinite(CITY_COORDS[p]).all()]
+    if not hits:
+        raise ValueError(f"no coordinates for place: {place!r}")
+    if len(hits) == 1:
+        return hits[0]
+    pop = np.nan_to_num(_CITY_POP[hits], nan=0.0)
+    ranked = [hits[i] for i in np.argsort(-pop, kind="stable")]
+    if np.sort(pop)[-1] <= np.sort(pop)[-2]:
+        names = "; ".join(f"{str(place).strip()}, {_STATE_NAMES[p]}" for p in ranked)
+        raise ValueError(f"ambiguous place {place!r}, add a state: {names}")
+    return ranked[0]
+
+def filter_rows(filters: Dict | None) -> np.ndarray | None:
+    """
+    Sorted positions passing `filters` (see row_filter), None for no filters.
+    "near" also takes {"place": "Austin, TX", "miles": 300} for a model city
+    with known coordinates (see _place_row). Bad specs raise ValueError.
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+    if isinstance(filters.get("near"), dict) and "place" in filters["near"]:
+        near = dict(filters["near"])
+        pos = _place_row(near.pop("place"))
+        near["lat"], near["lon"] = (float(v) for v in CITY_COORDS[pos])
+        filters = {**filters, "near": near}
+    return ROW_FILTER.rows(filters)
+
+# ─────────────────────────────────────────────────────────────────────
+# Bulk scoring: (P x F) preference matrix against the (N x F) city matrix
 # ─────────────────────────────────────────────────────────────────────
-CITY_CANDS  = ["city", "City", "city_ascii", "Place", "name", "NAME"]
-STATE_CANDS = ["state", "State", "state_name", "ST", "st", "usps", "STATE"]
+def preference_matrix(
+    profiles: List[Dict[str, Union[int, float, str]]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (imp_norm, ideal):
+      imp_norm : (P x len(NORM_FEATURES)) importances scaled 0..1
+      ideal    : (P x len(GOLD_FEATURES)) gold ideals in real units
+    """
+    imp_norm = np.array(
+        [[_importance(_pref_value(p, v)) for v in NORM_FEATURES] for p in profiles],
+        dtype=np.float64).reshape(len(profiles), len(NORM_FEATURES))
+    ideal = np.array(
+        [[_pref_value(p, v) for v in GOLD_FEATURES] for p in profiles],
+        dtype=np.float64).reshape(len(profiles), len(GOLD_FEATURES))
+    return imp_norm, ideal
+
+_GOLD_TILE = 32   # profiles per gold-kernel tile; keeps the work buffer in cache
+
+def _score_block(imp_norm: np.ndarray, ideal: np.ndarray) -> np.ndarray:
+    # Normal part is one GEMM for the whole block
+    scores = (imp_norm * _W_NORM) @ _X_NORM.T
+
+    # Gold part: w*imp*max(0, 1 - |x - ideal|/rng) == max(0, a - |x - ideal|*a/rng),
+    # evaluated in a small reused buffer rather than P x N temporaries.
+    a_gold = _W_GOLD * (np.clip(ideal, 0.0, 5.0) / 5.0)
+    buf = np.empty((min(_GOLD_TILE, scores.shape[0]), scores.shape[1]))
+    for t0 in range(0, scores.shape[0], _GOLD_TILE):
+        out = scores[t0:t0 + _GOLD_TILE]
+        b = buf[:out.shape[0]]
+        for g in range(ideal.shape[1]):
+            a = a_gold[t0:t0 + _GOLD_TILE, g:g + 1]
+            np.subtract(_X_GOLD[:, g], ideal[t0:t0 + _GOLD_TILE, g:g + 1], out=b)
+            np.abs(b, out=b)
+            b *= -(a / _GOLD_RNG[g])
+            b += a
+            np.fmax(b, 0.0, out=b)
+            out += b
+
+    scores[:, _NAN_ROWS] = np.nan
+    return scores
+
+def iter_score_batches(
+    profiles: List[Dict[str, Union[int, float, str]]],
+    batch_size: int = 256
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yield (offset, scores) blocks of at most batch_size profiles each."""
+    batch_size = max(1, int(batch_size))
+    for start in range(0, len(profiles), batch_size):
+        imp_norm, ideal = preference_matrix(profiles[start:start + batch_size])
+        yield start, _score_block(imp_norm, ideal)
+
+def score_matrix(
+    profiles: List[Dict[str, Union[int, float, str]]],
+    batch_size: int = 256
+) -> np.ndarray:
+    """(P x N) raw scores; row p matches score_vector(profiles[p])."""
+    out = np.empty((len(profiles), N_CITIES), dtype=np.float64)
+    for start, block in iter_score_batches(profiles, batch_size):
+        out[start:start + block.shape[0]] = block
+    return out
 
-def _pick_col(cands: Iterable[str], frame: pd.DataFrame) -> str | None:
-    for c in cands:
-        if c in frame.columns:
-            return c
-    return None
+# ─────────────────────────────────────────────────────────────────────
+# Per-city explanations
+# ─────────────────────────────────────────────────────────────────────
+def explain_rows(
+    rows: Iterable[int],
+    prefs: Dict[str, Union[int, float, str]],
+    k: int = 5
+) -> List[List[str]]:
+    """Top-k reason feature keys for each row position, in one batched pass."""
+    rows = np.asarray(list(rows), dtype=np.intp)
+    k = min(max(0, int(k)), len(EXPLAIN_FEATURES))
+    if rows.size == 0 or k == 0:
+        return [[] for _ in range(rows.size)]
+
+    imp = np.array([_pref_value(prefs, f) for f in EXPLAIN_FEATURES], dtype=np.float64)
+    active = imp > 0
+    X = _X_EXPLAIN[rows]
+
+    with np.errstate(invalid="ignore"):
+        S = X * np.where(_EXPLAIN_GOLD, 0.0, imp)
+        g = _EXPLAIN_GOLD
+        if g.any():
+            closeness = np.clip(1.0 - np.abs(X[:, g] - imp[g]) / _EXPLAIN_RNG[g], 0.0, 1.0)
+            S[:, g] = _EXPLAIN_W[g] * closeness
+        S[:, ~active] = -np.inf
+        S[~(S > 0)] = -np.inf              # also drops NaN (missing values)
+
+    top = np.argpartition(-S, k - 1, axis=1)[:, :k] if k < S.shape[1] else \
+        np.broadcast_to(np.arange(S.shape[1]), S.shape)
+    vals = np.take_along_axis(S, top, axis=1)
+    order = np.lexsort((-_EXPLAIN_NAME_RANK[top], -vals), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    vals = np.take_along_axis(vals, order, axis=1)
+    return [
+        [EXPLAIN_FEATURES[j] for j, v in zip(t, vs) if v > -np.inf]
+        for t, vs in zip(top, vals)
+    ]
 
-CITY_COL  = _pick_col(CITY_CANDS, df)
-STATE_COL = _pick_col(STATE_CANDS, df)
+# ─────────────────────────────────────────────────────────────────────
+# Single-pass result: top-N + global distribution
+# ─────────────────────────────────────────────────────────────────────
+STAT_PERCENTILES = (5, 25, 50, 75, 95)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k best scores, best first; NaN rows rank last."""
+    key = np.where(np.isnan(scores), -np.inf, scores)
+    k = max(0, min(int(k), key.size))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < key.size:
+        part = np.argpartition(-key, k - 1)[:k]
+    else:
+        part = np.arange(key.size)
+    return part[np.argsort(-key[part], kind="stable")]
+
+@dataclass
+class ScoreResult:
+    """Everything /api/suggest needs from one scoring pass."""
+    top_idx: np.ndarray                       # positional rows, best first
+    scores: np.ndarray                        # raw score for every scored row
+    stats: Dict[str, float] = field(default_factory=dict)
+    rows: np.ndarray | None = None            # scored positions (None = all rows)
+    _sorted: np.ndarray | None = field(default=None, repr=False)
+
+    def score_at(self, pos: int) -> float:
+        if self.rows is None:
+            return float(self.scores[pos])
+        return float(self.scores[np.searchsorted(self.rows, pos)])
+
+    def suggestions(self, positions=None) -> List[Dict[str, Union[str, float]]]:
+        """Name + raw score per top row (or per row in `positions`, e.g. one chunk)."""
+        return [
+            {"cityName": _CITY_NAMES[pos], "stateName": _STATE_NAMES[pos],
+             "score": self.score_at(pos)}
+            for pos in (self.top_idx if positions is None else positions)
+        ]
+
+    def minmax_scaled(self, raw: float) -> float:
+        """0-100 using the global min/max (the historic scaledScore)."""
+        lo, hi = self.stats.get("min", 0.0), self.stats.get("max", 1.0)
+        if not hi - lo > 1e-12:
+            return 100.0
+        return 100.0 * (float(raw) - lo) / (hi - lo)
+
+    def percentile_rank(self, raw: float) -> float:
+        """0-100: share of scored cities at or below `raw`."""
+        if self._sorted is None:
+            finite = self.scores[~np.isnan(self.scores)]
+            self._sorted = np.sort(finite)
+        if np.isnan(raw):
+            return float("nan")
+        if self._sorted.size == 0:
+            return 100.0
+        return 100.0 * np.searchsorted(self._sorted, raw, side="right") / self._sorted.size
+
+def _summary_stats(scores: np.ndarray, percentiles: bool = True) -> Dict[str, float]:
+    finite = scores[~np.isnan(scores)]
+    if finite.size == 0:
+        return {"count": 0}
+    stats = {"count": int(finite.size), "min": float(finite.min()),
+             "max": float(finite.max()), "mean": float(finite.mean())}
+    if percentiles:
+        pct = np.percentile(finite, STAT_PERCENTILES)
+        stats.update({f"p{q}": float(v) for q, v in zip(STAT_PERCENTILES, pct)})
+    return stats
 
 # ─────────────────────────────────────────────────────────────────────
 # Public API
 # ─────────────────────────────────────────────────────────────────────
+def score_cities(
+    prefs: Dict[str, Union[int, float, str]],
+    top_n: int = 10,
+    filters: Dict | None = None
+) -> ScoreResult:
+    """
+    Score every city once; return the top-N positions plus global stats.
+    With `filters`, only the surviving rows are scored and the stats cover
+    just those rows.
+    """
+    with METRICS.stage("suggest.score"):
+        rows = filter_rows(filters)
+        scores = score_vector(prefs, rows)
+        top = _top_k(scores, max(1, int(top_n)))
+    with METRICS.stage("suggest.minmax"):
+        stats = _summary_stats(scores)
+    return ScoreResult(
+        top_idx=top if rows is None else rows[top],
+        scores=scores,
+        stats=stats,
+        rows=rows,
+    )
+
 def suggest_top_cities(
     prefs: Dict[str, Union[int, float, str]],
-    top_n: int = 10
+    top_n: int = 10,
+    filters: Dict | None = None
 ) -> List[Dict[str, Union[str, float]]]:
-    # Drop obsolete features (if any)
-    to_drop = [c for c in drop_vars if c in df.columns]
-    frame = df.drop(columns=to_drop) if to_drop else df
-
-    # Score all rows
-    indices = frame.index.to_list()
-    scores  = np.array([_row_score(i, prefs) for i in indices])
-    if scores.size == 0:
-        return []
-
-    top_idx = np.argsort(-scores)[:max(1, int(top_n))]
-    out: List[Dict[str, Union[str, float]]] = []
-    for pos in top_idx:
-        i = indices[pos]
-        city  = str(frame.loc[i, CITY_COL]) if CITY_COL else str(i)
-        state = str(frame.loc[i, STATE_COL]) if STATE_COL else ""
-        out.append({"cityName": city, "stateName": state, "score": float(scores[pos])})
-    return out
+    rows, scores = top_rows(prefs, top_n, rows=filter_rows(filters))
+    return [{"cityName": _CITY_NAMES[pos], "stateName": _STATE_NAMES[pos], "score": float(s)}
+            for pos, s in zip(rows, scores)]
 
 def score_all_cities(prefs: Dict[str, Union[int, float]]) -> List[float]:
     """
     Returns raw scores for every row in df_master using the same weighting rules
     as suggest_top_cities(). Order matches df_master.index.
     """
-    # build gold_ranges exactly like suggest_top_cities
-    df = df_master.drop(columns=[c for c in drop_vars if c in df_master.columns]).copy()
-    for v in invert_vars:
-        if v in df.columns:
-            df[v] = 1 - df[v]
-    gold_ranges = {
-        v: float(df[v].max() - df[v].min())
-        for v in gold_vars if v in df.columns
-    }
-
-    # relevance weights
-    rel_weights: Dict[str, Union[float, Dict[str, float]]] = {}
-    for var, pca_w in PCA_SCORES.items():
-        if var not in df.columns:
+    return score_vector(prefs).tolist()
+
+def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row-wise _top_k for a (P x N) score block -> (P x k) positions."""
+    key = np.where(np.isnan(scores), -np.inf, scores)
+    k = max(0, min(int(k), key.shape[1]))
+    if k == 0:
+        return np.empty((key.shape[0], 0), dtype=np.intp)
+    if k < key.shape[1]:
+        part = np.argpartition(-key, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(key.shape[1]), key.shape)
+    order = np.argsort(-np.take_along_axis(key, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+# ─────────────────────────────────────────────────────────────────────
+# Top-N without scoring every row (threshold algorithm, see topn_index)
+# ─────────────────────────────────────────────────────────────────────
+_TOPN_INDEX: TopNIndex | None = None
+
+def topn_index() -> TopNIndex:
+    """Sorted-list index over the loaded model, built on first use."""
+    global _TOPN_INDEX
+    if _TOPN_INDEX is None:
+        _TOPN_INDEX = TopNIndex(_X_NORM, _W_NORM, _X_GOLD, _W_GOLD, _GOLD_RNG, _NAN_ROWS)
+    return _TOPN_INDEX
+
+def top_rows(
+    prefs: Dict[str, Union[int, float, str]],
+    top_n: int = 10,
+    use_index: bool | None = None,
+    rows: np.ndarray | None = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (positions, raw scores) of the top-N rows, best first; same rows as
+    score_cities() but without global stats. use_index=None picks the index
+    once the model has TOPN_INDEX_MIN rows. `rows` (from filter_rows)
+    restricts the candidates and scores just those.
+    """
+    top_n = max(1, int(top_n))
+    if rows is not None:
+        scores = score_vector(prefs, rows)
+        top = _top_k(scores, top_n)
+        return rows[top], scores[top]
+    if use_index is None:
+        use_index = N_CITIES >= TOPN_INDEX_MIN
+    if use_index and top_n <= len(topn_index()):
+        imp_norm, ideal = preference_matrix([prefs])
+        rows, scores, _ = topn_index().top_k(imp_norm[0], ideal[0], top_n)
+        return rows, scores
+    scores = score_vector(prefs)
+    rows = _top_k(scores, top_n)
+    return rows, scores[rows]
+
+# ─────────────────────────────────────────────────────────────────────
+# Incremental rescoring (one session per user, e.g. while dragging sliders)
+# ─────────────────────────────────────────────────────────────────────
+_PREF_SET = frozenset(PREF_FEATURES)
+_NORM_POS = {f: j for j, f in enumerate(NORM_FEATURES)}
+_GOLD_POS = {f: j for j, f in enumerate(GOLD_FEATURES)}
+
+class ScoringSession:
+    """
+    Keeps one user's prefs and score vector between slider moves. Normal
+    features enter the score linearly (X[:, j] * w_j * imp_j), so moving
+    slider j is the rank-1 update X[:, j] * w_j * (imp_new - imp_old); a
+    Goldilocks feature swaps one closeness column. Both are O(N) instead of
+    O(N x F). A full rescore every REFRESH_EVERY updates bounds float drift.
+    """
+    REFRESH_EVERY = 256
+
+    def __init__(self, prefs: Dict[str, Union[int, float, str]]):
+        self.prefs: Dict[str, float] = {f: _pref_value(prefs, f) for f in PREF_FEATURES}
+        self.version = MODEL_VERSION
+        self._rescore()
+
+    def _rescore(self) -> None:
+        self.scores = score_vector(self.prefs)
+        # per-feature gold contributions, so a move only computes the new column
+        self._gold = [self._gold_column(j, self.prefs[f]) for j, f in enumerate(GOLD_FEATURES)]
+        self.updates = 0
+
+    @staticmethod
+    def _gold_column(j: int, ideal: float) -> np.ndarray:
+        closeness = np.fmax(0.0, 1.0 - np.abs(_X_GOLD[:, j] - ideal) / _GOLD_RNG[j])
+        return closeness * (_W_GOLD[j] * _importance(ideal))
+
+    def update(self, changes: Dict[str, Union[int, float, str]]) -> int:
+        """Apply changed prefs in place; returns how many values changed."""
+        changed = 0
+        for f in changes:
+            if f not in _PREF_SET:
+                continue                            # the model never reads it
+            new, old = _pref_value(changes, f), self.prefs[f]
+            if new == old:
+                continue
+            self.prefs[f] = new
+            changed += 1
+            j = _NORM_POS.get(f)
+            if j is not None:
+                delta = _importance(new) - _importance(old)
+                if delta:
+                    self.scores += _X_NORM[:, j] * (_W_NORM[j] * delta)
+            j = _GOLD_POS.get(f)
+            if j is not None:
+                col = self._gold_column(j, new)
+                self.scores += col - self._gold[j]
+                self._gold[j] = col
+        self.updates += changed
+        if self.updates >= self.REFRESH_EVERY:
+            self._rescore()
+        return changed
+
+    def result(self, top_n: int = 10) -> ScoreResult:
+        """Like score_cities() for the current prefs (stats without percentiles)."""
+        scores = self.scores.copy()
+        return ScoreResult(top_idx=_top_k(scores, max(1, int(top_n))),
+                           scores=scores, stats=_summary_stats(scores, percentiles=False))
+
+# ─────────────────────────────────────────────────────────────────────
+# CLI: JSONL profiles in -> JSONL top-N out (streamed in batches)
+# ─────────────────────────────────────────────────────────────────────
+def _read_profiles(fh: IO[str]) -> Iterator[Tuple[object, Dict]]:
+    """Each line is {"id": ..., "preferences": {...}} or a bare prefs dict."""
+    for n, line in enumerate(fh, start=1):
+        line = line.strip()
+        if not line:
             continue
-        user_imp = float(prefs.get(var, 0))
-        if var in gold_ranges:
-            rel_weights[var] = {"ideal": user_imp, "pca": pca_w}
+        rec = json.loads(line)
+        if isinstance(rec, dict) and isinstance(rec.get("preferences"), dict):
+            yield rec.get("id", n), rec["preferences"]
         else:
-            rel_weights[var] = user_imp * pca_w
-
-    # row scores
-    scores = df.apply(lambda r: _row_score(r, rel_weights, gold_ranges), axis=1)
-    return scores.tolist()
+            yield n, rec if isinstance(rec, dict) else {}
+
+def stream_top_cities(src: IO[str], dst: IO[str], top_n: int = 10,
+                      batch_size: int = 256) -> int:
+    """Score profiles from src in batches, write one JSON line each to dst."""
+    written = 0
+    batch: List[Tuple[object, Dict]] = []
+
+    def flush() -> None:
+        nonlocal written
+        imp_norm, ideal = preference_matrix([p for _, p in batch])
+        block = _score_block(imp_norm, ideal)
+        for (pid, _), row, top in zip(batch, block, top_k_rows(block, top_n)):
+            dst.write(json.dumps({
+                "id": pid,
+                "suggestions": [
+                    {"cityName": _CITY_NAMES[pos], "stateName": _STATE_NAMES[pos],
+                     "score": float(row[pos])}
+                    for pos in top
+                ],
+            }) + "\n")
+        written += len(batch)
+        batch.clear()
+
+    for rec in _read_profiles(src):
+        batch.append(rec)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return written
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Batch-score preference profiles (JSONL).")
+    ap.add_argument("profiles", nargs="?", default="-", help="input JSONL ('-' = stdin)")
+    ap.add_argument("-o", "--out", default="-", help="output JSONL ('-' = stdout)")
+    ap.add_argument("--top", type=int, default=10, help="cities per profile")
+    ap.add_argument("--batch-size", type=int, default=256, help="profiles per BLAS batch")
+    ap.add_argument("--build-model", action="store_true",
+                    help=f"recompile the model artifact ({MODEL_ARTIFACT}) and exit")
+    args = ap.parse_args(argv)
+
+    if args.build_model:
+        t0 = time.perf_counter()
+        meta = json.loads(str(build_model()["meta"]))
+        print(f"built model {meta['version']} -> {MODEL_ARTIFACT} "
+              f"in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+        return 0
+
+    src = sys.stdin if args.profiles == "-" else open(args.profiles, encoding="utf-8")
+    dst = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    try:
+        n = stream_top_cities(src, dst, top_n=max(1, args.top), batch_size=args.batch_size)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    print(f"scored {n} profiles", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+"""Shared fixtures: repo root + api/ on sys.path, model loaded eagerly."""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "api")]
+os.environ.setdefault("MODEL_WARMUP", "eager")
+os.environ.setdefault("SUGGEST_CACHE_ENTRIES", "0")
+
+
+@pytest.fixture(scope="session")
+def client():
+    import app
+    app.MODEL_READY.wait(60)
+    return app.app.test_client()
@@ -0,0 +1,27 @@
+import time
+
+import numpy as np
+import pytest
+
+import trip_mapper as tm
+
+EPS = 0.1           # distance matrix, neighbor lists and bookkeeping past the deadline
+
+
+def _points(n, seed=0):
+    r = np.random.default_rng(seed)
+    return list(zip(r.uniform(25, 49, n).tolist(), r.uniform(-124, -67, n).tolist()))
+
+
+@pytest.mark.parametrize("budget", [0.2, 0.5])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_multistart_stays_within_budget(budget, workers):
+    pts = _points(1000)
+    tm.solve_multistart(pts[:20], starts=2, seed=0, budget=0.1, workers=workers)   # pool warm-up
+    t0 = time.perf_counter()
+    tour, stats = tm.solve_multistart(pts, mode="quality", starts=8, seed=1, budget=budget,
+                                      workers=workers)
+    elapsed = time.perf_counter() - t0
+    assert elapsed <= budget + EPS, f"{elapsed:.3f}s for a {budget}s budget"
+    assert sorted(tour) == list(range(len(pts)))
+    assert stats["multistart"]["completed"] >= 1
@@ -0,0 +1,44 @@
+import pytest
+
+import trip_mapper as tm
+
+TRIP = {"home": "Austin, TX", "stops": ["Dallas, TX", "Houston, TX", "San Antonio, TX", "Waco, TX"]}
+
+
+def test_stage_budgets_are_capped():
+    assert tm._stage_list([["2opt", 1e9], ["oropt", -1], "or2opt"]) == [
+        ("2opt", tm.STAGE_BUDGET_MAX), ("oropt", 0.0), ("or2opt", 1.0)]
+
+
+@pytest.mark.parametrize("improve", [[["2opt", "x"]], [["2opt", None]], [["2opt"]], "2opt",
+                                     [["bogus", 1]]])
+def test_bad_stages_are_a_400(client, improve):
+    r = client.post("/api/route", json={**TRIP, "improve": improve})
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "bad_request"
+
+
+@pytest.mark.parametrize("extra, detail", [
+    ({"mode": "bogus"}, '"mode" must be one of fast, quality'),
+    ({"mode": ["fast"]}, '"mode" must be one of fast, quality'),
+    ({"construct": "bogus"}, '"construct" must be one of'),
+    ({"dayKm": "x"}, '"dayKm" must be a number'),
+    ({"dayKm": 0}, '"dayKm" must be > 0'),
+    ({"large": "false"}, '"large" must be true or false'),
+    ({"improve": {"2opt": 1}}, '"improve" must be a list'),
+    ({"starts": "x"}, '"starts" must be an integer'),
+    ({"budget": "inf"}, '"budget" must be a number'),
+])
+def test_bad_route_options_are_a_400(client, extra, detail):
+    r = client.post("/api/route", json={**TRIP, **extra})
+    assert r.status_code == 400
+    body = r.get_json()
+    assert body["error"] == "bad_request" and body["detail"].startswith(detail)
+
+
+def test_valid_route_options(client):
+    r = client.post("/api/route", json={**TRIP, "mode": "quality", "construct": "nn",
+                                        "large": False, "dayKm": "300"})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["solver"]["construct"] == "nn" and body["days"]
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import suggestion_algo as S
+
+
+@pytest.mark.parametrize("filters", [[1, 2], "abc", 5])
+def test_non_object_filters_are_a_json_400(client, filters):
+    r = client.post("/api/suggest", json={"preferences": {}, "filters": filters})
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "bad_filter"
+
+
+def test_place_without_state_picks_most_populous():
+    pos = S._place_row("Austin")
+    assert S._STATE_NAMES[pos] == "Texas"
+    assert pos == S._place_row("Austin, TX")
+
+
+def test_ambiguous_place_lists_candidates(client, monkeypatch):
+    # no population to break the tie between the Springfields
+    monkeypatch.setattr(S, "_CITY_POP", np.full(S.N_CITIES, np.nan))
+    with pytest.raises(ValueError, match="ambiguous") as e:
+        S._place_row("Springfield")
+    assert "Springfield, Ohio" in str(e.value) and "Springfield, Tennessee" in str(e.value)
+
+    r = client.post("/api/suggest", json={"preferences": {},
+                                          "filters": {"near": {"place": "Springfield", "miles": 50}}})
+    assert r.status_code == 400
+    assert "ambiguous" in r.get_json()["detail"]
+    assert S._place_row("Springfield, IL") is not None
+
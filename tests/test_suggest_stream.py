@@ -0,0 +1,11 @@
+def test_stream_chunk_must_be_an_integer(client):
+    r = client.post("/api/suggest", json={"preferences": {}, "stream": True, "chunk": "abc"})
+    assert r.status_code == 400
+    assert r.get_json() == {"error": "bad_request", "detail": '"chunk" must be an integer'}
+
+
+def test_stream_chunk_is_capped(client):
+    r = client.post("/api/suggest", json={"preferences": {}, "stream": True, "chunk": 10**12,
+                                          "limit": 5})
+    assert r.status_code == 200
+    assert len(r.get_data(as_text=True).strip().splitlines()) >= 1
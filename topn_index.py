@@ -0,0 +1,206 @@
+"""
+Exact top-N retrieval without evaluating the full score for every city
+
+`TopNIndex(x_norm, w_norm, x_gold, w_gold, gold_rng, nan_rows)` : built once
+`TopNIndex.top_k(imp_norm, ideal, k)` : (rows, scores, stats), best first
+`TopNIndex.brute_force(imp_norm, ideal, k)` : reference full-matrix path
+
+The normal part of a score is X[r] . (w * imp). The front end sends every
+feature, mostly at one default rating, so the index keeps the base score
+X @ w and splits a query as c * base + X[:, D] . delta over the features D
+rated differently from the common importance c.
+
+Few active lists (base, D, gold ideals): Fagin's threshold algorithm. Each
+list is read from its best end in growing blocks (gold lists outward from
+the ideal), newly seen rows get exact scores, and the sum of the list heads
+bounds every unseen row; once the k-th best score reaches it we stop.
+Many lists, or TA past its budget: a column scan over only base, D and the
+gold columns (column-major), instead of all normal features.
+
+Both paths are exact, so results equal brute force up to float summation
+order. Rows with a NaN normal feature never score (same as score_vector)
+and are left out of the index.
+"""
+
+
+from __future__ import annotations
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+_BLOCK_MIN = 64          # rows read per list in the first TA round (doubles after)
+_TA_MAX_LISTS = 4        # more active lists than this and the bound is too loose
+_TA_BUDGET = 0.1         # share of rows TA may score before falling back to the scan
+_TOL = 1e-12             # stop margin against float summation-order noise
+
+Terms = Tuple[float, np.ndarray, np.ndarray, List[Tuple[int, float, float]]]
+
+
+class TopNIndex:
+    def __init__(self, x_norm: np.ndarray, w_norm: np.ndarray, x_gold: np.ndarray,
+                 w_gold: np.ndarray, gold_rng: np.ndarray, nan_rows=None) -> None:
+        n = x_norm.shape[0]
+        live = np.ones(n, dtype=bool) if nan_rows is None else ~np.asarray(nan_rows, dtype=bool)
+        self.rows = np.flatnonzero(live)                    # index position -> model row
+        self.w_norm = np.asarray(w_norm, dtype=np.float64)
+        self.w_gold = np.asarray(w_gold, dtype=np.float64)
+        self.gold_rng = np.asarray(gold_rng, dtype=np.float64)
+        # column-major copies: a query reads whole columns, not whole rows
+        self.xt = np.ascontiguousarray(np.asarray(x_norm, dtype=np.float64)[self.rows].T)
+        self.gt = np.ascontiguousarray(np.asarray(x_gold, dtype=np.float64)[self.rows].T)
+        itype = np.int32 if self.rows.size < 2**31 else np.int64
+
+        # base list: every normal feature at the same importance
+        self.base = self.w_norm @ self.xt
+        self.base_order = np.argsort(self.base, kind="stable").astype(itype)
+        # one ascending order per normal feature (read from either end)
+        self.norm_order = np.argsort(self.xt, axis=1, kind="stable").astype(itype)
+        # per gold feature: non-NaN rows by raw value, plus the sorted values
+        self.gold_order: List[np.ndarray] = []
+        self.gold_vals: List[np.ndarray] = []
+        for col in self.gt:
+            order = np.flatnonzero(~np.isnan(col))
+            order = order[np.argsort(col[order], kind="stable")].astype(itype)
+            self.gold_order.append(order)
+            self.gold_vals.append(col[order])
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.xt, self.gt, self.base, self.base_order, self.norm_order,
+                  *self.gold_order, *self.gold_vals]
+        return int(sum(a.nbytes for a in arrays))
+
+    def __len__(self) -> int:
+        return int(self.rows.size)
+
+    # ── query terms and exact scores ────────────────────────────────
+    def _terms(self, imp_norm, ideal) -> Terms:
+        """(c, D, delta[D], gold terms) with w * imp == c * w + delta."""
+        imp = np.asarray(imp_norm, dtype=np.float64)
+        c = 0.0
+        if imp.size:
+            vals, counts = np.unique(imp, return_counts=True)
+            c = float(vals[np.argmax(counts)])               # most common importance
+        D = np.flatnonzero(imp != c)
+        delta = self.w_norm[D] * imp[D] - c * self.w_norm[D]
+        ideal = np.asarray(ideal, dtype=np.float64)
+        a = self.w_gold * (np.clip(ideal, 0.0, 5.0) / 5.0)
+        gold = [(g, float(ideal[g]), float(a[g])) for g in range(ideal.size) if a[g] != 0]
+        return c, D, delta, gold
+
+    def _score(self, pos, terms: Terms) -> np.ndarray:
+        c, D, delta, gold = terms
+        s = self.base[pos] * c
+        for j, d in zip(D, delta):
+            s += self.xt[j, pos] * d
+        buf = np.empty_like(s)
+        for g, v, a in gold:
+            # a * max(0, 1 - |val - ideal| / range); NaN adds 0 (fmax)
+            np.subtract(self.gt[g, pos], v, out=buf)
+            np.abs(buf, out=buf)
+            buf *= -(a / self.gold_rng[g])
+            buf += a
+            s += np.fmax(buf, 0.0, out=buf)
+        return s
+
+    def _best(self, pos: np.ndarray, s: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, s.size)
+        if k < s.size:
+            part = np.argpartition(-s, k - 1)[:k]
+            pos, s = pos[part], s[part]
+        order = np.lexsort((pos, -s))                       # best first, ties by row
+        return pos[order], s[order]
+
+    def brute_force(self, imp_norm, ideal, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Reference: full X @ (w * imp) plus the gold kernel, for every row."""
+        q = self.w_norm * np.asarray(imp_norm, dtype=np.float64)
+        a = self.w_gold * (np.clip(ideal, 0.0, 5.0) / 5.0)
+        closeness = np.fmax(0.0, 1.0 - np.abs(self.gt.T - ideal) / self.gold_rng)
+        s = self.xt.T @ q + closeness @ a
+        pos, s = self._best(np.arange(len(self)), s, k)
+        return self.rows[pos], s
+
+    # ── search ──────────────────────────────────────────────────────
+    def top_k(self, imp_norm, ideal, k: int = 10) -> Tuple[np.ndarray, np.ndarray, Dict]:
+        """
+        Best k model rows for one profile (imp_norm: 0..1 per normal feature,
+        ideal: raw value per gold feature). Returns (rows, scores, stats);
+        stats has the path taken and how many rows were scored exactly.
+        """
+        n = len(self)
+        k = max(0, min(int(k), n))
+        terms = self._terms(imp_norm, ideal)
+        c, D, _, gold = terms
+        if k == 0:
+            return self.rows[:0], np.empty(0), {"path": "empty", "scored": 0}
+        n_lists = (c > 0) + D.size + sum(a > 0 for _, _, a in gold)
+        if 0 < n_lists <= _TA_MAX_LISTS:
+            found = self._threshold(terms, k, int(n * _TA_BUDGET))
+            if found is not None:
+                pos, s, scored = found
+                return self.rows[pos], s, {"path": "threshold", "scored": scored}
+        pos, s = self._best(np.arange(n), self._score(slice(None), terms), k)
+        return self.rows[pos], s, {"path": "scan", "scored": n}
+
+    def _threshold(self, terms: Terms, k: int, budget: int):
+        """TA over the active lists; None once more than `budget` rows were scored."""
+        c, D, delta, gold = terms
+        n = len(self)
+        lists = [(self.base_order, self.base, c)] if c > 0 else []
+        lists += [(self.norm_order[j], self.xt[j], d) for j, d in zip(D, delta)]
+        # cursors: normal lists count rows taken from the best end; gold
+        # lists are [lo, hi) windows growing outward from the ideal
+        taken = [0] * len(lists)
+        windows = [[int(np.searchsorted(self.gold_vals[g], v))] * 2 for g, v, _ in gold]
+
+        seen = np.zeros(n, dtype=bool)
+        best_pos, best_s = np.empty(0, dtype=np.intp), np.empty(0)
+        block, scored = max(_BLOCK_MIN, 4 * k), 0
+        while True:
+            picked = []
+            bound, done = 0.0, True                         # done: every list fully read
+            for i, (order, col, coef) in enumerate(lists):
+                t = taken[i]
+                if coef > 0:                                # largest values first
+                    picked.append(order[max(0, n - t - block):n - t])
+                else:
+                    picked.append(order[t:t + block])
+                t = taken[i] = min(n, t + block)
+                if t < n:
+                    bound += coef * col[order[n - t - 1] if coef > 0 else order[t]]
+                    done = False
+            for (g, v, a), w in zip(gold, windows):
+                if a < 0:
+                    continue                                # never above 0: bound 0
+                vals, order = self.gold_vals[g], self.gold_order[g]
+                lo, hi = w
+                left = v - vals[max(0, lo - block):lo][::-1]
+                right = vals[hi:hi + block] - v
+                take = np.argsort(np.concatenate((left, right)), kind="stable")[:block]
+                n_left = int(np.count_nonzero(take < left.size))
+                picked.append(order[lo - n_left:lo])
+                picked.append(order[hi:hi + take.size - n_left])
+                lo, hi = w[0], w[1] = lo - n_left, hi + take.size - n_left
+                d = min(v - vals[lo - 1] if lo > 0 else np.inf,
+                        vals[hi] - v if hi < vals.size else np.inf)
+                bound += a * max(0.0, 1.0 - d / self.gold_rng[g])   # NaN / far rows add 0
+                done = done and d == np.inf
+
+            cand = np.unique(np.concatenate(picked)) if picked else np.empty(0, np.intp)
+            cand = cand[~seen[cand]]
+            seen[cand] = True
+            if done:                                        # finish off exactly
+                rest = np.flatnonzero(~seen)
+                seen[rest] = True
+                cand = np.concatenate((cand, rest))
+            if cand.size:
+                scored += cand.size
+                best_pos, best_s = self._best(np.concatenate((best_pos, cand)),
+                                              np.concatenate((best_s, self._score(cand, terms))), k)
+            if done or scored >= n:
+                return best_pos, best_s, scored
+            if best_s.size >= k and best_s[-1] >= bound + _TOL * max(1.0, abs(bound)):
+                return best_pos, best_s, scored
+            if scored > budget:
+                return None
+            block *= 2
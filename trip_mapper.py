@@ -3,19 +3,39 @@ from __future__ import annotations
 import os
 import math
 import time
+import sqlite3
 import logging
-from typing import Dict, List, Tuple
+import multiprocessing
+import random
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, List, Sequence, Tuple
 
+import numpy as np
 import googlemaps
 from googlemaps import exceptions as gmaps_exc
 
+from geocode_cache import GEOCODE_CACHE_PATH, GeocodeCache, normalize_query
+from gazetteer import GAZETTEER_PATH, Gazetteer, Geocoder
+from http_pool import HTTP_TIMING, pooled_session
+from metrics import COUNT_BUCKETS, METRICS
+from rate_limit import TokenBucket
+
 log = logging.getLogger("trip_mapper")
 
 
 # ------------------------- distance helpers -------------------------
+R_EARTH = 6371000.0                 # meters
+# Above this many stops the matrix is computed row-by-row on demand instead
+# of all at once (n x n float64 is 8 * n**2 bytes).
+LAZY_DIST_MIN = int(os.getenv("TRIP_LAZY_DIST_MIN", "2000"))
+_DIST_BLOCK = 512                   # rows per vectorized block
+
+
 def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Great-circle distance in meters."""
-    R = 6371000.0
+    R = R_EARTH
     dlat = math.radians(lat2 - lat1)
     dlon = math.radians(lon2 - lon1)
     a = (math.sin(dlat / 2) ** 2 +
@@ -25,59 +45,989 @@ def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return R * c
 
 
-def _build_distance_matrix(coords: Dict[str, Tuple[float, float]]
-                           ) -> Dict[Tuple[str, str], float]:
-    names = list(coords.keys())
-    d: Dict[Tuple[str, str], float] = {}
-    for i, a in enumerate(names):
-        for j, b in enumerate(names):
-            if i == j:
-                continue
-            d[(a, b)] = _haversine(coords[a][0], coords[a][1],
-                                   coords[b][0], coords[b][1])
-    return d
+def haversine_rows(lat: np.ndarray, lon: np.ndarray, rows,
+                   dtype=np.float64) -> np.ndarray:
+    """Meters from each of `rows` (index or slice) to every point; lat/lon in radians."""
+    lat1, lon1 = np.atleast_1d(lat[rows])[:, None], np.atleast_1d(lon[rows])[:, None]
+    a = (np.sin((lat - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat) * np.sin((lon - lon1) / 2) ** 2)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(np.clip(1 - a, 0.0, None)))
+    return (R_EARTH * c).astype(dtype, copy=False)
+
+
+class _LazyRow:
+    """One row of a lazy DistanceMatrix: D[i][j] computed per lookup."""
+    __slots__ = ("_m", "_i")
+
+    def __init__(self, m: "DistanceMatrix", i: int) -> None:
+        self._m, self._i = m, i
+
+    def __getitem__(self, j: int) -> float:
+        m, i = self._m, self._i
+        h = (math.sin((m._lat_l[j] - m._lat_l[i]) / 2) ** 2 +
+             m._cos_l[i] * m._cos_l[j] * math.sin((m._lon_l[j] - m._lon_l[i]) / 2) ** 2)
+        return 2 * R_EARTH * math.asin(math.sqrt(min(h, 1.0)))
+
+    def __len__(self) -> int:
+        return self._m.n
+
+
+class DistanceMatrix:
+    """
+    Haversine distances (meters) between points, addressed by integer node
+    id: D[i][j]. Rows come back as Python lists (or list-like rows), which is
+    what the solvers' scalar inner loops index fastest.
+
+    Full mode computes the n x n array in one vectorized pass. Lazy mode
+    never materializes it: the solvers only look at a handful of entries per
+    node, so single entries are computed on lookup, whole rows on demand
+    (row()), and whole-matrix sweeps go in blocks of rows (blocks()).
+    """
+
+    def __init__(self, pts, lazy: bool | None = None, dtype=np.float64) -> None:
+        arr = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+        self.n = len(arr)
+        self.dtype = dtype
+        self._lat, self._lon = np.radians(arr[:, 0]), np.radians(arr[:, 1])
+        self.lazy = self.n >= LAZY_DIST_MIN if lazy is None else lazy
+        self.array: np.ndarray | None = None
+        self._rows: List | None = None
+        if self.lazy:
+            self._lat_l, self._lon_l = self._lat.tolist(), self._lon.tolist()
+            self._cos_l = np.cos(self._lat).tolist()
+            self._rows = [_LazyRow(self, i) for i in range(self.n)]
+        else:
+            self.array = haversine_rows(self._lat, self._lon, slice(None), dtype)
+            self._rows = self.array.tolist()
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, i: int):
+        return self._rows[i]
+
+    def row(self, i: int) -> np.ndarray:
+        if self.array is not None:
+            return self.array[i]
+        return haversine_rows(self._lat, self._lon, i, self.dtype)[0]
+
+    def blocks(self, size: int = _DIST_BLOCK):
+        """Yield (first_row, rows x n array) covering the matrix."""
+        if self.array is not None:
+            yield 0, self.array
+            return
+        for s in range(0, self.n, size):
+            yield s, haversine_rows(self._lat, self._lon, slice(s, s + size), self.dtype)
+
+    def pairs(self, a, b) -> np.ndarray:
+        """Elementwise D[a[t]][b[t]] without touching whole rows."""
+        a, b = np.asarray(a), np.asarray(b)
+        la, lb = self._lat[a], self._lat[b]
+        h = (np.sin((lb - la) / 2) ** 2 +
+             np.cos(la) * np.cos(lb) * np.sin((self._lon[b] - self._lon[a]) / 2) ** 2)
+        return R_EARTH * 2 * np.arctan2(np.sqrt(h), np.sqrt(np.clip(1 - h, 0.0, None)))
+
+    def neighbors(self, k: int) -> List[List[int]]:
+        """
+        k nearest other nodes per node via a haversine BallTree, O(n log n);
+        used for lazy matrices where a blockwise sweep would be n**2.
+        """
+        from sklearn.neighbors import BallTree
+        X = np.column_stack([self._lat, self._lon])
+        _, idx = BallTree(X, metric="haversine").query(X, k=min(k + 1, self.n))
+        return [[j for j in row if j != i][:k] for i, row in enumerate(idx.tolist())]
+
+    def nbytes(self) -> int:
+        """Bytes held by the dense array (0 when lazy)."""
+        return 0 if self.array is None else self.array.nbytes
+
+
+def _build_distance_matrix(pts, lazy: bool | None = None,
+                           dtype=np.float64) -> DistanceMatrix:
+    """pts: [(lat, lon), ...] in node order. See DistanceMatrix."""
+    return DistanceMatrix(pts, lazy=lazy, dtype=dtype)
+
+
+Rows = Sequence[Sequence[float]]     # DistanceMatrix or a plain list of rows
+
+
+def _row(D: Rows, i: int) -> np.ndarray:
+    return D.row(i) if isinstance(D, DistanceMatrix) else np.asarray(D[i], dtype=float)
 
 
 # ------------------------- tour construction ------------------------
-def _nearest_neighbor(start: str, nodes: List[str],
-                      dist: Dict[Tuple[str, str], float]) -> List[str]:
-    """Greedy seed path (open tour)."""
-    path = [start]
-    unvisited = [n for n in nodes if n != start]
-    while unvisited:
-        cur = path[-1]
-        nxt = min(unvisited, key=lambda n: dist[(cur, n)])
-        path.append(nxt)
-        unvisited.remove(nxt)
-    return path
-
-
-def _two_opt(path: List[str],
-             dist: Dict[Tuple[str, str], float]) -> List[str]:
-    """Classic 2-opt on an *open* path (no final home)."""
-    improved = True
-    n = len(path)
-    while improved:
-        improved = False
-        for i in range(1, n - 2):
-            for j in range(i + 1, n - 1):
-                if j - i == 1:
+# Constructors work on integer node ids over a distance matrix D (D[i][j] in
+# meters; a DistanceMatrix or list of rows) and return a closed tour as a
+# node list. pts[i] is (lat, lon).
+_INF = float("inf")
+
+
+def _expired(deadline: float) -> bool:
+    return time.perf_counter() > deadline
+
+
+def _nn_order(D: Rows, start: int, deadline: float = _INF,
+              neigh: List[List[int]] | None = None, pts=None) -> List[int]:
+    """
+    Greedy nearest-neighbor walk from start. The k-NN list is tried first;
+    a full (vectorized) row scan only happens when all of it is visited.
+    Past the deadline, the rest follow in space-filling-curve order.
+    """
+    n = len(D)
+    left = np.ones(n, dtype=bool)
+    left[start] = False
+    tour = [start]
+    for _ in range(n - 1):
+        cur = tour[-1]
+        nxt = next((j for j in neigh[cur] if left[j]), -1) if neigh else -1
+        if nxt < 0:
+            if pts is not None and _expired(deadline):
+                rest = np.flatnonzero(left).tolist()
+                tour.extend(rest[k] for k in _space_filling_curve(None, [pts[j] for j in rest], 0, []))
+                break
+            nxt = int(np.where(left, _row(D, cur), np.inf).argmin())
+        tour.append(nxt)
+        left[nxt] = False
+    return tour
+
+
+def _nearest_neighbor(D: Rows, start: int = 0) -> List[int]:
+    """Greedy seed path (open tour) over node ids."""
+    return _nn_order(D, start)
+
+
+def _greedy_edge(D: Rows, pts, start: int, neigh: List[List[int]],
+                 deadline: float = _INF) -> List[int]:
+    """
+    Greedy matching on the k-NN candidate edges (shortest first, degree <= 2,
+    no premature cycles), then fragments are chained nearest-endpoint-first.
+    """
+    n = len(D)
+    if n < 4:
+        return list(range(n))
+    parent = list(range(n))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    edges = sorted({(min(i, j), max(i, j)) for i in range(n) for j in neigh[i]},
+                   key=lambda e: D[e[0]][e[1]])
+    adj: List[List[int]] = [[] for _ in range(n)]
+    for i, j in edges:
+        if len(adj[i]) < 2 and len(adj[j]) < 2:
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                parent[ri] = rj
+                adj[i].append(j)
+                adj[j].append(i)
+
+    # Walk each fragment (path) from one of its ends
+    seen = [False] * n
+    frags: List[List[int]] = []
+    for s in range(n):
+        if seen[s] or len(adj[s]) == 2:
+            continue
+        frag, prev, cur = [], -1, s
+        while cur != -1:
+            seen[cur] = True
+            frag.append(cur)
+            nxt = next((x for x in adj[cur] if x != prev), -1)
+            prev, cur = cur, nxt
+        frags.append(frag)
+
+    # Chain fragments, starting with the one holding `start`
+    first = next(k for k, f in enumerate(frags) if start in f)
+    tour = frags.pop(first)
+    while frags:
+        end = D[tour[-1]]
+        k, flip = min(((k, D[tour[-1]][f[-1]] < end[f[0]]) for k, f in enumerate(frags)),
+                      key=lambda kf: min(end[frags[kf[0]][0]], end[frags[kf[0]][-1]]))
+        frag = frags.pop(k)
+        tour.extend(reversed(frag) if flip else frag)
+    return tour
+
+
+def _cheapest_insertion(D: Rows, pts, start: int, neigh: List[List[int]],
+                        deadline: float = _INF) -> List[int]:
+    """
+    Cheapest insertion with a per-node cache of its best edge; only nodes whose
+    cached edge was split are re-scanned. On deadline, the remaining nodes are
+    placed next to their nearest already-toured neighbor instead.
+    """
+    n = len(D)
+    if n < 4:
+        return list(range(n))
+    b0 = min((j for j in range(n) if j != start), key=D[start].__getitem__)
+    nxt, prv = [-1] * n, [-1] * n
+    nxt[start], nxt[b0] = b0, start
+    prv[start], prv[b0] = b0, start
+    in_tour = [start, b0]
+
+    def best_edge(u: int) -> Tuple[float, int]:
+        du = D[u]
+        return min(((du[a] + du[nxt[a]] - D[a][nxt[a]], a) for a in in_tour))
+
+    best: Dict[int, Tuple[float, int]] = {
+        u: best_edge(u) for u in range(n) if u != start and u != b0}
+    while best:
+        if _expired(deadline):
+            for u in sorted(best, key=lambda v: best[v][0]):
+                du = D[u]
+                cands = [(du[a] + du[nxt[a]] - D[a][nxt[a]], a)
+                         for c in neigh[u] if nxt[c] != -1 for a in (prv[c], c)]
+                _, a = min(cands) if cands else best[u]
+                b = nxt[a]
+                nxt[a], nxt[u], prv[u], prv[b] = u, b, a, u
+            break
+        u = min(best, key=lambda v: best[v][0])
+        _, a = best.pop(u)
+        b = nxt[a]
+        nxt[a], nxt[u], prv[u], prv[b] = u, b, a, u
+        in_tour.append(u)
+        for v, (cost, av) in best.items():
+            if av == a:
+                best[v] = best_edge(v)
+            else:
+                dv = D[v]
+                c1 = dv[a] + dv[u] - D[a][u]
+                c2 = dv[u] + dv[b] - D[u][b]
+                if c1 < cost or c2 < cost:
+                    best[v] = (c1, a) if c1 <= c2 else (c2, u)
+
+    tour, cur = [start], nxt[start]
+    while cur != start:
+        tour.append(cur)
+        cur = nxt[cur]
+    return tour
+
+
+def _hilbert_index(x: int, y: int, order: int = 16) -> int:
+    """Position of grid cell (x, y) along a Hilbert curve of side 2**order."""
+    d, s = 0, 1 << (order - 1)
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x, y = s - 1 - x, s - 1 - y
+            x, y = y, x
+        s >>= 1
+    return d
+
+
+def _space_filling_curve(D: Rows, pts, start: int, neigh: List[List[int]],
+                         deadline: float = _INF) -> List[int]:
+    """Visit stops in Hilbert-curve order of their (lon, lat); O(n log n)."""
+    lats = [p[0] for p in pts]
+    lons = [p[1] for p in pts]
+    side = (1 << 16) - 1
+    lat0, lon0 = min(lats), min(lons)
+    span = max(max(lats) - lat0, max(lons) - lon0) or 1.0
+    keys = [_hilbert_index(int((lon - lon0) / span * side), int((lat - lat0) / span * side))
+            for lat, lon in pts]
+    return sorted(range(len(pts)), key=keys.__getitem__)
+
+
+def _nn_construct(D: Rows, pts, start: int, neigh: List[List[int]],
+                  deadline: float = _INF) -> List[int]:
+    return _nn_order(D, start, deadline, neigh, pts)
+
+
+# --------------------------- local search ---------------------------
+_NEIGHBOR_K = 10     # candidate list size per node
+_EPS = 1e-7          # meters; ignore float-noise "improvements"
+
+
+def _neighbor_lists(D: Rows, k: int = _NEIGHBOR_K) -> List[List[int]]:
+    """k nearest other nodes for every node, closest first (blockwise argpartition)."""
+    n = len(D)
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+    if isinstance(D, DistanceMatrix) and D.lazy:
+        return D.neighbors(k)
+    blocks = D.blocks() if isinstance(D, DistanceMatrix) else [(0, np.asarray(D, dtype=float))]
+    out: List[List[int]] = []
+    for s, block in blocks:
+        block = np.array(block, dtype=float)
+        rows = np.arange(len(block))
+        block[rows, s + rows] = np.inf                  # never your own neighbor
+        if k < n - 1:
+            part = np.argpartition(block, k - 1, axis=1)[:, :k]
+        else:
+            part = np.tile(np.arange(n), (len(block), 1))
+        order = np.argsort(np.take_along_axis(block, part, axis=1), axis=1, kind="stable")
+        out.extend(np.take_along_axis(part, order, axis=1)[:, :k].tolist())
+    return out
+
+
+def _tour_length(tour: List[int], D: Rows) -> float:
+    """Closed-loop length in meters."""
+    if isinstance(D, DistanceMatrix):
+        return float(D.pairs(tour, tour[1:] + tour[:1]).sum())
+    return sum(D[a][b] for a, b in zip(tour, tour[1:] + tour[:1]))
+
+
+def _reverse(tour: List[int], pos: List[int], i: int, j: int) -> None:
+    """Reverse the cyclic tour segment tour[i..j]; flips the shorter side
+    (equivalent on a cycle), keeping pos[] in sync."""
+    n = len(tour)
+    length = (j - i) % n + 1
+    if 2 * length > n:
+        i, j = (j + 1) % n, (i - 1) % n
+        length = n - length
+    for _ in range(length // 2):
+        ci, cj = tour[i], tour[j]
+        tour[i], pos[cj] = cj, i
+        tour[j], pos[ci] = ci, j
+        i = (i + 1) % n
+        j = (j - 1) % n
+
+
+def _positions(tour: List[int]) -> List[int]:
+    pos = [0] * len(tour)
+    for i, c in enumerate(tour):
+        pos[c] = i
+    return pos
+
+
+def _two_opt_closed(tour: List[int], D: Rows,
+                    neigh: List[List[int]], deadline: float = _INF,
+                    active: List[int] | None = None) -> List[int]:
+    """
+    2-opt on the *closed* tour using neighbor candidate lists and
+    don't-look bits. A node is re-examined only after one of its tour edges
+    changed, and scanning continues from the queue instead of restarting.
+    Stops early (keeping the best tour so far) once the deadline passes.
+    """
+    n = len(tour)
+    if n < 4:
+        return tour
+    tour = list(tour)
+    pos = _positions(tour)
+
+    queue = deque(tour if active is None else active)
+    queued = [False] * n
+    for x in queue:
+        queued[x] = True
+    scans = moves = 0
+    while queue:
+        if _expired(deadline):
+            break
+        a = queue.popleft()
+        queued[a] = False
+        scans += 1
+        for forward in (True, False):
+            step = 1 if forward else -1
+            b = tour[(pos[a] + step) % n]
+            d_ab = D[a][b]
+            moved = False
+            for c in neigh[a]:
+                d_ac = D[a][c]
+                if d_ac >= d_ab:
+                    break                       # lists are sorted: no gain left
+                d = tour[(pos[c] + step) % n]
+                if c == b or d == a:
                     continue
-                a, b = path[i - 1], path[i]
-                c, d = path[j], path[j + 1]
-                old = dist[(a, b)] + dist[(c, d)]
-                new = dist[(a, c)] + dist[(b, d)]
-                if new < old:
-                    path[i:j + 1] = reversed(path[i:j + 1])
-                    improved = True
+                if d_ac + D[b][d] - d_ab - D[c][d] < -_EPS:
+                    # forward:  a b .. c d -> a c .. b d ; backward mirrors it
+                    if forward:
+                        _reverse(tour, pos, pos[b], pos[c])
+                    else:
+                        _reverse(tour, pos, pos[c], pos[b])
+                    for x in (a, b, c, d):
+                        if not queued[x]:
+                            queued[x] = True
+                            queue.append(x)
+                    moved = True
+                    moves += 1
                     break
-            if improved:
+            if moved:
+                break
+    if METRICS.enabled:
+        METRICS.observe("two_opt_scans", scans, COUNT_BUCKETS)
+        METRICS.observe("two_opt_moves", moves, COUNT_BUCKETS)
+    return tour
+
+
+def _or_opt(tour: List[int], D: Rows, neigh: List[List[int]],
+            deadline: float = _INF, active: List[int] | None = None,
+            max_seg: int = 3) -> List[int]:
+    """
+    Or-opt: move a segment of 1..max_seg consecutive stops (either
+    orientation) between two other neighbors, best gain per segment.
+    Candidate insertion points come from the segment ends' k-NN lists.
+    """
+    n = len(tour)
+    if n < 5:
+        return tour
+    tour = list(tour)
+    pos = _positions(tour)
+    queue = deque(tour if active is None else active)
+    queued = [False] * n
+    for x in queue:
+        queued[x] = True
+
+    while queue:
+        if _expired(deadline):
+            break
+        s1 = queue.popleft()
+        queued[s1] = False
+        for seg_len in range(1, min(max_seg, n - 3) + 1):
+            i = pos[s1]
+            j = (i + seg_len - 1) % n
+            s2 = tour[j]
+            p, q = tour[(i - 1) % n], tour[(j + 1) % n]
+            removed = D[p][s1] + D[s2][q] - D[p][q]
+            if removed <= _EPS:
+                continue
+            seg = [tour[(i + t) % n] for t in range(seg_len)]
+            in_seg = set(seg)
+            best = None
+            for end, other in ((s1, s2), (s2, s1)):
+                for c in neigh[end]:
+                    if D[end][c] >= removed:
+                        break
+                    if c in in_seg:
+                        continue
+                    for e in (tour[(pos[c] + 1) % n], tour[(pos[c] - 1) % n]):
+                        if e in in_seg:
+                            continue
+                        gain = removed - (D[c][end] + D[other][e] - D[c][e])
+                        if gain > _EPS and (best is None or gain > best[0]):
+                            best = (gain, c, e, end)
+            if best is None:
+                continue
+
+            _, c, e, end = best
+            rest = [tour[(j + 1 + t) % n] for t in range(n - seg_len)]
+            ic = rest.index(c)
+            if rest[(ic + 1) % len(rest)] == e:      # c -> [end .. other] -> e
+                ins, piece = ic + 1, seg if end == s1 else seg[::-1]
+            else:                                    # e -> [other .. end] -> c
+                ins, piece = ic, seg[::-1] if end == s1 else seg
+            tour[:] = rest[:ins] + piece + rest[ins:]
+            pos = _positions(tour)
+            for x in (p, q, c, e, s1, s2):
+                if not queued[x]:
+                    queued[x] = True
+                    queue.append(x)
+            break
+    return tour
+
+
+def _or_two_opt(tour: List[int], D: Rows, neigh: List[List[int]],
+                deadline: float = _INF, active: List[int] | None = None) -> List[int]:
+    """Or-2opt: alternate 2-opt and Or-opt until neither finds a gain.
+    With `active`, each pass only queues those nodes (seam repair)."""
+    length = _tour_length(tour, D)
+    while not _expired(deadline):
+        tour = _or_opt(_two_opt_closed(tour, D, neigh, deadline, active=active),
+                       D, neigh, deadline, active=active)
+        new_length = _tour_length(tour, D)
+        if new_length > length - _EPS:
+            break
+        length = new_length
+    return tour
+
+
+def _two_opt(tour: List[int], D: Rows) -> List[int]:
+    """
+    2-opt on the looped route (tour[0] -> ... -> tour[0]). Returns the
+    order starting at tour[0], without the closing return.
+    """
+    if len(tour) < 4:
+        return list(tour)
+    return _rotate(_two_opt_closed(list(tour), D, _neighbor_lists(D)), tour[0])
+
+
+# --------------------------- solver pipeline ---------------------------
+METRICS.describe("two_opt_scans", "Nodes examined per 2-opt run.")
+METRICS.describe("two_opt_moves", "Improving 2-opt moves applied per run.")
+METRICS.describe("route_improved_km", "Tour length removed by each improvement stage.")
+METRICS.describe("geocode_lookups", "Route stops resolved, by source.")
+METRICS.describe("geocode_cache_lookups", "Persistent geocode cache lookups, by result.")
+
+CONSTRUCTORS = {
+    "nn": _nn_construct,                 # nearest neighbor from home
+    "greedy": _greedy_edge,              # greedy edge matching
+    "insertion": _cheapest_insertion,    # cheapest insertion
+    "sfc": _space_filling_curve,         # Hilbert space-filling curve
+}
+
+IMPROVERS = {
+    "2opt": lambda t, D, nb, dl: _two_opt_closed(t, D, nb, dl),
+    "oropt": lambda t, D, nb, dl: _or_opt(t, D, nb, dl),
+    "or2opt": _or_two_opt,               # 2-opt + Or-opt (restricted 3-opt)
+}
+
+# Per-mode pipeline: constructor + its budget, then (stage, seconds) pairs.
+# Budgets bound the solver only; geocoding and distances come on top.
+# Client-supplied stage budgets are capped at STAGE_BUDGET_MAX seconds.
+STAGE_BUDGET_MAX = float(os.getenv("TRIP_STAGE_BUDGET_MAX", "10.0"))
+SOLVER_MODES: Dict[str, Dict] = {
+    "fast":    {"construct": "nn", "construct_budget": 0.5,
+                "improve": [("2opt", 0.5)]},
+    "quality": {"construct": "greedy", "construct_budget": 2.0,
+                "improve": [("2opt", 2.0), ("or2opt", 6.0)]},
+}
+
+
+def _rotate(tour: List[int], start: int) -> List[int]:
+    k = tour.index(start)
+    return tour[k:] + tour[:k]
+
+
+def _stage_list(improve) -> List[Tuple[str, float]]:
+    """Accepts ["2opt", ...] or [["2opt", 0.5], ...]; default budget 1 s,
+    capped at STAGE_BUDGET_MAX. Malformed stages raise ValueError."""
+    if not isinstance(improve or [], (list, tuple)):
+        raise ValueError("improve must be a list of stages")
+    out = []
+    for st in improve or []:
+        if isinstance(st, str):
+            name, budget = st, 1.0
+        elif isinstance(st, (list, tuple)) and len(st) == 2:
+            name, budget = st
+            try:
+                if isinstance(budget, bool):
+                    raise TypeError
+                budget = float(budget)
+                if budget != budget:
+                    raise ValueError
+            except (TypeError, ValueError):
+                raise ValueError(f"Budget for stage '{name}' must be a number") from None
+        else:
+            raise ValueError(f"Bad improvement stage {st!r} (use \"2opt\" or [\"2opt\", seconds])")
+        if not isinstance(name, str) or name not in IMPROVERS:
+            raise ValueError(f"Unknown improvement stage '{name}' "
+                             f"(choose from {', '.join(IMPROVERS)})")
+        out.append((name, min(max(0.0, budget), STAGE_BUDGET_MAX)))
+    return out
+
+
+def solve_tour(D: Rows, pts: List[Tuple[float, float]], start: int = 0,
+               mode: str = "fast", construct: str | None = None,
+               improve=None, deadline: float = _INF) -> Tuple[List[int], Dict]:
+    """
+    Run construction + improvement stages; each stage gets its own wall-clock
+    budget and returns the best tour found when it runs out (anytime).
+    `deadline` (perf_counter time) cuts every stage short past it.
+    Returns (tour starting at `start`, stats).
+    """
+    if mode not in SOLVER_MODES:
+        raise ValueError(f"Unknown mode '{mode}' (choose from {', '.join(SOLVER_MODES)})")
+    cfg = SOLVER_MODES[mode]
+    construct = construct or cfg["construct"]
+    if construct not in CONSTRUCTORS:
+        raise ValueError(f"Unknown construction '{construct}' "
+                         f"(choose from {', '.join(CONSTRUCTORS)})")
+    stages = _stage_list(improve if improve is not None else cfg["improve"])
+
+    stats: Dict = {"mode": mode, "construct": construct, "stages": []}
+    n = len(D)
+    if n < 2:
+        return list(range(n)), stats
+
+    t0 = time.perf_counter()
+    neigh = _neighbor_lists(D)
+    dt = time.perf_counter() - t0
+    METRICS.record_stage("route.neighbors", dt)
+    stats["stages"].append({"stage": "neighbors", "ms": round(dt * 1000, 2)})
+
+    t0 = time.perf_counter()
+    tour = CONSTRUCTORS[construct](D, pts, start, neigh,
+                                   min(deadline, t0 + cfg["construct_budget"]))
+    dt = time.perf_counter() - t0
+    METRICS.record_stage(f"route.{construct}", dt)
+    stats["stages"].append({"stage": construct, "ms": round(dt * 1000, 2),
+                            "km": round(_tour_length(tour, D) / 1000, 3)})
+
+    for name, budget in stages:
+        t0 = time.perf_counter()
+        stage_deadline = min(deadline, t0 + budget)
+        before = _tour_length(tour, D)
+        tour = IMPROVERS[name](tour, D, neigh, stage_deadline)
+        dt = time.perf_counter() - t0
+        after = _tour_length(tour, D)
+        METRICS.record_stage(f"route.{name}", dt)
+        METRICS.inc("route_improved_km", (before - after) / 1000, stage=name)
+        stats["stages"].append({"stage": name, "ms": round(dt * 1000, 2),
+                                "km": round(after / 1000, 3),
+                                "timedOut": _expired(stage_deadline)})
+    return _rotate(tour, start), stats
+
+
+# --------------------- large trips (divide and conquer) ---------------------
+# Above LARGE_TRIP_MIN stops, build_route partitions the stops into compact
+# clusters (contiguous runs of the Hilbert-curve order), solves every
+# cluster's closed tour in a process pool with the usual pipeline, visits
+# the clusters in the order of a tour over their centroids, cuts each
+# cluster's cycle where it best joins its neighbors, and finally repairs the
+# seams with 2-opt / Or-opt restricted to nodes near them.
+LARGE_TRIP_MIN = int(os.getenv("TRIP_LARGE_MIN", "10000"))         # 0 = never automatic
+TRIP_CLUSTER_SIZE = int(os.getenv("TRIP_CLUSTER_SIZE", "300"))     # stops per cluster
+TRIP_WORKERS = int(os.getenv("TRIP_WORKERS", "0"))                 # 0 = one per CPU
+TRIP_REPAIR_BUDGET = float(os.getenv("TRIP_REPAIR_BUDGET", "1.0"))  # repair s per 10k stops (min 1 s)
+
+_SOLVER_POOL: ProcessPoolExecutor | None = None
+_SOLVER_POOL_PID = 0
+
+
+def _solver_workers() -> int:
+    return max(1, TRIP_WORKERS or os.cpu_count() or 1)
+
+
+def _solver_pool() -> ProcessPoolExecutor:
+    """
+    Process pool for cluster solves, kept for the life of the process (re-made
+    after fork). Workers come from a forkserver (spawn where unavailable) so
+    they never inherit the geocoding threads' locks.
+    """
+    global _SOLVER_POOL, _SOLVER_POOL_PID
+    if _SOLVER_POOL is None or _SOLVER_POOL_PID != os.getpid():
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        if ctx.get_start_method() == "forkserver" and __name__ != "__main__":
+            ctx.set_forkserver_preload([__name__])
+        _SOLVER_POOL = ProcessPoolExecutor(max_workers=_solver_workers(), mp_context=ctx)
+        _SOLVER_POOL_PID = os.getpid()
+    return _SOLVER_POOL
+
+
+def _solve_cluster(job: Tuple[List[Tuple[float, float]], str, str | None, object]) -> List[int]:
+    """Closed tour (local ids) for one cluster; runs in a pool worker."""
+    pts, mode, construct, improve = job
+    if len(pts) < 4:
+        return list(range(len(pts)))
+    tour, _ = solve_tour(_build_distance_matrix(pts), pts, 0, mode=mode,
+                         construct=construct, improve=improve)
+    return tour
+
+
+def _meters_to(lat: np.ndarray, lon: np.ndarray, pt: Tuple[float, float]) -> np.ndarray:
+    """Haversine meters from one (lat, lon) in degrees to points given in radians."""
+    la0, lo0 = math.radians(pt[0]), math.radians(pt[1])
+    h = np.sin((lat - la0) / 2) ** 2 + math.cos(la0) * np.cos(lat) * np.sin((lon - lo0) / 2) ** 2
+    return 2 * R_EARTH * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def _partition(pts, start: int, size: int) -> List[List[int]]:
+    """Hilbert-order runs of ~size stops; the cluster holding `start` comes first."""
+    order = _space_filling_curve(None, pts, start, [])
+    k = max(1, math.ceil(len(pts) / max(2, size)))
+    clusters = [c.tolist() for c in np.array_split(np.asarray(order), k) if c.size]
+    home = next(i for i, c in enumerate(clusters) if start in c)
+    return clusters[home:] + clusters[:home]
+
+
+def _cut_cycle(cyc: List[int], lat: np.ndarray, lon: np.ndarray, prev_pt, next_pt,
+               start: int | None = None) -> List[int]:
+    """
+    Open a cluster's cycle into a path entered from prev_pt and left toward
+    next_pt: remove the edge (and pick the direction) that minimizes
+    join-in + join-out - removed edge. With `start`, the path must begin there.
+    """
+    m = len(cyc)
+    if m < 3:
+        return list(cyc)
+    c = np.asarray(cyc)
+    la, lo = lat[c], lon[c]
+    nxt = np.roll(np.arange(m), -1)
+    h = np.sin((la[nxt] - la) / 2) ** 2 + np.cos(la) * np.cos(la[nxt]) * np.sin((lo[nxt] - lo) / 2) ** 2
+    edge = 2 * R_EARTH * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))      # cyc[i] -> cyc[i+1]
+    to_next = _meters_to(la, lo, next_pt)
+    if start is not None:
+        i = cyc.index(start)
+        # forward ends at cyc[i-1], backward at cyc[i+1]
+        if to_next[(i - 1) % m] <= to_next[(i + 1) % m]:
+            return cyc[i:] + cyc[:i]
+        return [cyc[(i - t) % m] for t in range(m)]
+    from_prev = _meters_to(la, lo, prev_pt)
+    fwd = from_prev[nxt] + to_next - edge          # enter cyc[i+1], walk forward, leave at cyc[i]
+    bwd = from_prev + to_next[nxt] - edge          # enter cyc[i], walk backward, leave at cyc[i+1]
+    i_f, i_b = int(fwd.argmin()), int(bwd.argmin())
+    if fwd[i_f] <= bwd[i_b]:
+        s = (i_f + 1) % m
+        return cyc[s:] + cyc[:s]
+    return [cyc[(i_b - t) % m] for t in range(m)]
+
+
+def solve_large(pts: List[Tuple[float, float]], start: int = 0, mode: str = "fast",
+                construct: str | None = None, improve=None,
+                cluster_size: int | None = None, workers: int | None = None) -> Tuple[List[int], Dict]:
+    """
+    Divide-and-conquer tour for thousands of stops (see the section comment).
+    Each cluster runs solve_tour's `mode` pipeline; returns (tour starting at
+    `start`, stats) like solve_tour, with "clusters" / "workers" added.
+    """
+    if mode not in SOLVER_MODES:
+        raise ValueError(f"Unknown mode '{mode}' (choose from {', '.join(SOLVER_MODES)})")
+    size = cluster_size or TRIP_CLUSTER_SIZE
+    workers = workers or _solver_workers()
+    n = len(pts)
+    stats: Dict = {"mode": mode, "construct": "clusters", "stages": []}
+
+    def stage(name: str, t0: float, **extra) -> None:
+        dt = time.perf_counter() - t0
+        METRICS.record_stage(f"route.large_{name}", dt)
+        stats["stages"].append({"stage": name, "ms": round(dt * 1000, 2), **extra})
+
+    t0 = time.perf_counter()
+    clusters = _partition(pts, start, size)
+    cents = [(float(np.mean([pts[i][0] for i in c])), float(np.mean([pts[i][1] for i in c])))
+             for c in clusters]
+    if len(clusters) > 2:
+        Dc = _build_distance_matrix(cents)
+        seq, _ = solve_tour(Dc, cents, 0, mode="quality")
+    else:
+        seq = list(range(len(clusters)))
+    clusters, cents = [clusters[i] for i in seq], [cents[i] for i in seq]
+    stats.update({"clusters": len(clusters), "workers": min(workers, len(clusters))})
+    stage("partition", t0)
+
+    t0 = time.perf_counter()
+    jobs = [([pts[i] for i in c], mode, construct, improve) for c in clusters]
+    if workers > 1 and len(jobs) > 1:
+        chunk = max(1, len(jobs) // (workers * 4))
+        local = list(_solver_pool().map(_solve_cluster, jobs, chunksize=chunk))
+    else:
+        local = [_solve_cluster(j) for j in jobs]
+    cycles = [[c[i] for i in t] for c, t in zip(clusters, local)]
+    stage("clusters", t0)
+
+    t0 = time.perf_counter()
+    arr = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    lat, lon = np.radians(arr[:, 0]), np.radians(arr[:, 1])
+    tour: List[int] = []
+    seams: List[int] = []
+    k = len(cycles)
+    for j, cyc in enumerate(cycles):
+        next_pt = cents[j + 1] if j + 1 < k else pts[start]
+        prev_pt = pts[tour[-1]] if tour else None
+        path = _cut_cycle(cyc, lat, lon, prev_pt, next_pt, start=start if j == 0 else None)
+        seams += [path[0], path[-1]]
+        tour += path
+    D = _build_distance_matrix(pts)
+    stage("stitch", t0, km=round(_tour_length(tour, D) / 1000, 3))
+
+    # repair: local search seeded with the joins first, then with nodes that
+    # have a near neighbor in another cluster (cluster interiors are done)
+    t0 = time.perf_counter()
+    deadline = _INF
+    if n >= 8 and k > 1:
+        neigh = _neighbor_lists(D)
+        deadline = time.perf_counter() + TRIP_REPAIR_BUDGET * max(1.0, n / 10000)
+        cid = np.empty(n, dtype=np.intp)
+        for j, c in enumerate(clusters):
+            cid[c] = j
+        nb = np.asarray(neigh, dtype=np.intp).reshape(n, -1)
+        border = np.flatnonzero((cid[nb] != cid[:, None]).any(axis=1)).tolist()
+        tour = _or_two_opt(tour, D, neigh, deadline,
+                           list(dict.fromkeys(x for s in seams for x in [s, *neigh[s]])))
+        tour = _or_two_opt(tour, D, neigh, deadline, border)
+    stage("repair", t0, km=round(_tour_length(tour, D) / 1000, 3), timedOut=_expired(deadline))
+    return _rotate(tour, start), stats
+
+
+def day_legs(order: List[str], coords: Dict[str, Tuple[float, float]], day_km: float) -> List[Dict]:
+    """
+    Split a looped route into consecutive days of at most `day_km` driving
+    (great-circle km); each day starts where the previous one ended. A single
+    hop longer than the cap becomes its own day, flagged "overCap".
+    """
+    if day_km <= 0:
+        raise ValueError("dayKm must be > 0")
+    days: List[Dict] = []
+    stops, km = [order[0]], 0.0
+    for a, b in zip(order, order[1:]):
+        hop = _haversine(*coords[a], *coords[b]) / 1000
+        if km + hop > day_km and len(stops) > 1:
+            days.append({"day": len(days) + 1, "stops": stops, "km": round(km, 3)})
+            stops, km = [a], 0.0
+        stops.append(b)
+        km += hop
+        if km > day_km:                               # one hop alone is over the cap
+            days.append({"day": len(days) + 1, "stops": stops, "km": round(km, 3), "overCap": True})
+            stops, km = [b], 0.0
+    if len(stops) > 1:
+        days.append({"day": len(days) + 1, "stops": stops, "km": round(km, 3)})
+    return days
+
+
+# ---------------------------- multi-start ----------------------------
+# starts > 1: K independent starts on the solver pool, shortest tour wins.
+# Start 0 is the ordinary single-start pipeline (the baseline the
+# improvement is measured against); the rest cycle through MULTISTART_KINDS:
+#   nn        nearest neighbor from a random stop, then the mode's stages
+#   insertion random-order cheapest insertion, then the mode's stages
+#   kick      iterated local search: double-bridge kicks on the baseline
+#             tour, each repaired by 2-opt / Or-opt around the cut points
+# Start i draws from Random(f"{seed}:{i}") and ties go to the lower index,
+# so a seed reproduces the tour whenever every start finishes in budget.
+# Callers can ask for more starts / time, but never past the _MAX caps.
+MULTISTART_BUDGET = float(os.getenv("TRIP_MULTISTART_BUDGET", "2.0"))    # seconds
+MULTISTART_BUDGET_MAX = float(os.getenv("TRIP_MULTISTART_BUDGET_MAX", "10.0"))
+MULTISTART_MAX_STARTS = int(os.getenv("TRIP_MULTISTART_MAX_STARTS", "32"))
+MULTISTART_KINDS = ("nn", "insertion", "kick")
+_KICKS = 50                     # min double-bridge kicks per "kick" start (2 per stop above that)
+
+
+def _random_insertion(D: Rows, order: List[int], deadline: float = _INF) -> List[int]:
+    """Insert nodes in the given order, each at its cheapest position so far.
+    Past the deadline, the rest are appended in order."""
+    tour = list(order[:3])
+    for k, u in enumerate(order[3:], start=3):
+        if _expired(deadline):
+            return tour + order[k:]
+        t = np.asarray(tour)
+        du = _row(D, u)
+        nxt = np.roll(t, -1)
+        cost = du[t] + du[nxt] - np.asarray([D[a][b] for a, b in zip(tour, nxt.tolist())])
+        tour.insert(int(cost.argmin()) + 1, u)
+    return tour
+
+
+def _double_bridge(tour: List[int], rng) -> Tuple[List[int], List[int]]:
+    """A B C D -> A C B D at three random cuts; returns (tour, nodes at the cuts)."""
+    n = len(tour)
+    i, j, k = sorted(rng.sample(range(1, n), 3))
+    new = tour[:i] + tour[j:k] + tour[i:j] + tour[k:]
+    ends = {tour[i - 1], tour[i], tour[j - 1], tour[j], tour[k - 1], tour[k % n]}
+    return new, list(ends)
+
+
+def _multistart_job(job, D: Rows | None = None) -> Tuple[float, List[int], str, bool]:
+    """
+    One start (runs in a pool worker): (length, closed tour, kind, cut short).
+    `t_end` is the whole run's perf_counter deadline (system-wide monotonic
+    clock, so it holds across pool processes), not a per-job budget. Inline
+    runs pass the distance matrix they share.
+    """
+    pts, start, mode, construct, improve, kind, seed, t_end = job
+    if D is None:
+        D = _build_distance_matrix(pts)
+    n = len(pts)
+    if kind == "single" or n < 8:
+        tour, st = solve_tour(D, pts, start, mode=mode, construct=construct, improve=improve,
+                              deadline=t_end)
+        cut = any(x.get("timedOut") for x in st["stages"])
+        return _tour_length(tour, D), tour, "single", cut
+
+    rng = random.Random(seed)
+    cfg = SOLVER_MODES[mode]
+    stages = _stage_list(improve if improve is not None else cfg["improve"])
+    neigh = _neighbor_lists(D)
+    if kind == "kick":
+        tour, _ = solve_tour(D, pts, start, mode=mode, construct=construct, improve=improve,
+                             deadline=t_end)
+        length = _tour_length(tour, D)
+        for _ in range(max(_KICKS, 2 * n)):
+            if _expired(t_end):
                 break
-    return path
+            cand, ends = _double_bridge(tour, rng)
+            cand = _two_opt_closed(cand, D, neigh, t_end, active=ends)
+            cand = _or_opt(cand, D, neigh, t_end, active=ends)
+            cand_len = _tour_length(cand, D)
+            if cand_len < length - _EPS:
+                tour, length = cand, cand_len
+        return length, tour, kind, _expired(t_end)
+
+    if kind == "insertion" and not getattr(D, "lazy", False):
+        order = list(range(n))
+        rng.shuffle(order)
+        tour = _random_insertion(D, order, t_end)
+    else:
+        kind = "nn"
+        tour = _nn_order(D, rng.randrange(n), t_end, neigh, pts)
+    cut = False
+    for name, stage_budget in stages:
+        deadline = min(t_end, time.perf_counter() + stage_budget)
+        tour = IMPROVERS[name](tour, D, neigh, deadline)
+        cut = cut or _expired(deadline)
+    return _tour_length(tour, D), tour, kind, cut
+
+
+def solve_multistart(pts: List[Tuple[float, float]], start: int = 0, mode: str = "fast",
+                     construct: str | None = None, improve=None, starts: int = 8,
+                     seed: int | None = None, budget: float | None = None,
+                     workers: int | None = None) -> Tuple[List[int], Dict]:
+    """
+    Best of `starts` starts within `budget` seconds (see the section comment).
+    Returns (tour starting at `start`, stats); stats["multistart"] reports
+    the seed used, starts finished, single-start vs best length and the gain.
+    """
+    if mode not in SOLVER_MODES:
+        raise ValueError(f"Unknown mode '{mode}' (choose from {', '.join(SOLVER_MODES)})")
+    starts = min(max(1, int(starts)), MULTISTART_MAX_STARTS)
+    seed = int.from_bytes(os.urandom(4), "little") if seed is None else int(seed)
+    budget = MULTISTART_BUDGET if budget is None else max(0.0, float(budget))
+    budget = min(budget, MULTISTART_BUDGET_MAX)
+    workers = min(workers or _solver_workers(), starts)
+    t0 = time.perf_counter()
+    t_end = t0 + budget
+    jobs = [(pts, start, mode, construct, improve,
+             "single" if i == 0 else MULTISTART_KINDS[(i - 1) % len(MULTISTART_KINDS)],
+             f"{seed}:{i}", t_end) for i in range(starts)]
+
+    results: Dict[int, Tuple[float, List[int], str, bool]] = {}
+    if workers > 1:
+        pool = _solver_pool()
+        futures = {pool.submit(_multistart_job, job): i for i, job in enumerate(jobs)}
+        done, pending = wait(futures, timeout=max(0.0, t_end - time.perf_counter()))
+        first = next(f for f, i in futures.items() if i == 0)
+        if first in pending:                        # the baseline is always kept
+            first.result()
+            done.add(first)
+        for f in pending - done:
+            f.cancel()
+        results = {futures[f]: f.result() for f in done}
+    else:
+        D = _build_distance_matrix(pts)
+        for i, job in enumerate(jobs):
+            if i and _expired(t_end):
+                break
+            results[i] = _multistart_job(job, D)
+
+    best_i = min(results, key=lambda i: (results[i][0], i))
+    single_len = results[0][0]
+    best_len, tour, kind, _ = results[best_i]
+    cut = len(results) < starts or any(r[3] for r in results.values())
+    elapsed = time.perf_counter() - t0
+    METRICS.record_stage("route.multistart", elapsed)
+    stats: Dict = {"mode": mode, "construct": construct or SOLVER_MODES[mode]["construct"],
+                   "stages": [{"stage": "multistart", "ms": round(elapsed * 1000, 2),
+                               "km": round(best_len / 1000, 3),
+                               "timedOut": cut}],
+                   "multistart": {
+                       "seed": seed, "starts": starts, "completed": len(results),
+                       "reproducible": not cut,
+                       "workers": workers, "best": {"start": best_i, "kind": kind},
+                       "singleKm": round(single_len / 1000, 3), "bestKm": round(best_len / 1000, 3),
+                       "improvementPct": round(100 * (1 - best_len / single_len), 3) if single_len else 0.0,
+                   }}
+    return _rotate(tour, start), stats
 
 
 # ---------------------------- geocoding ------------------------------
-def _gmaps_client() -> googlemaps.Client:
+# Concurrency / provider QPS (shared by every worker using the cache file)
+GEOCODE_WORKERS = int(os.getenv("GEOCODE_WORKERS", "8"))
+GEOCODE_QPS = float(os.getenv("GEOCODE_QPS", "40"))
+
+# One googlemaps client (and HTTP connection pool) per process
+GMAPS_POOL_SIZE = int(os.getenv("GMAPS_POOL_SIZE", str(max(10, GEOCODE_WORKERS))))
+GMAPS_HTTP_RETRIES = int(os.getenv("GMAPS_HTTP_RETRIES", "2"))
+GMAPS_RETRY_BACKOFF = float(os.getenv("GMAPS_RETRY_BACKOFF", "0.3"))
+_GMAPS: googlemaps.Client | None = None
+_GMAPS_PID = 0
+_GMAPS_LOCK = threading.Lock()
+
+
+def _new_gmaps_client() -> googlemaps.Client:
     api_key = os.getenv("GMAPS_KEY", "").strip()
     if not api_key:
         raise RuntimeError("GMAPS_KEY not set")
@@ -87,12 +1037,39 @@ def _gmaps_client() -> googlemaps.Client:
     read_timeout    = float(os.getenv("GMAPS_READ_TIMEOUT", "5"))
     retry_timeout   = float(os.getenv("GMAPS_RETRY_TIMEOUT", "60"))
 
-    return googlemaps.Client(
+    t0 = time.perf_counter()
+    client = googlemaps.Client(
         key=api_key,
         connect_timeout=connect_timeout,
         read_timeout=read_timeout,
         retry_timeout=retry_timeout,
+        # pacing and quota back-off are done globally by _geocode_one's limiter;
+        # the client's own per-instance 60 QPS cap would serialize the pool
+        retry_over_query_limit=False,
+        queries_per_second=1000,
+        queries_per_minute=60000,
+        requests_session=pooled_session(GMAPS_POOL_SIZE, GMAPS_HTTP_RETRIES,
+                                        GMAPS_RETRY_BACKOFF),
+        base_url=os.getenv("GMAPS_BASE_URL", "https://maps.googleapis.com"),
     )
+    HTTP_TIMING.record("client_init", time.perf_counter() - t0)
+    return client
+
+
+def _gmaps_client() -> googlemaps.Client:
+    """
+    Process-wide client, created on first use. Its pooled session keeps
+    connections alive across requests and is shared by the geocoding threads;
+    a forked child (gunicorn pre-fork) builds its own instead of reusing the
+    parent's sockets.
+    """
+    global _GMAPS, _GMAPS_PID
+    if _GMAPS is None or _GMAPS_PID != os.getpid():
+        with _GMAPS_LOCK:
+            if _GMAPS is None or _GMAPS_PID != os.getpid():
+                _GMAPS = _new_gmaps_client()
+                _GMAPS_PID = os.getpid()
+    return _GMAPS
 
 
 def _dedupe_preserve_order(items: List[str]) -> List[str]:
@@ -100,25 +1077,65 @@ def _dedupe_preserve_order(items: List[str]) -> List[str]:
     seen = set()
     out: List[str] = []
     for s in items:
-        key = " ".join(s.split()).lower()
+        key = normalize_query(s)
         if key and key not in seen:
             seen.add(key)
             out.append(s)
     return out
 
 
-def _geocode_one(q: str, gmaps: googlemaps.Client) -> Tuple[float, float]:
+_QUOTA_STATUSES = {"OVER_QUERY_LIMIT", "RESOURCE_EXHAUSTED"}
+
+_LIMITER: TokenBucket | None = None
+_POOL: ThreadPoolExecutor | None = None
+_POOL_PID = 0
+
+
+def _geocode_limiter() -> TokenBucket:
+    """Process-wide token bucket; shared across processes via the cache file."""
+    global _LIMITER
+    if _LIMITER is None:
+        try:
+            _LIMITER = TokenBucket(GEOCODE_QPS, path=GEOCODE_CACHE_PATH or None, name="geocode")
+        except (OSError, sqlite3.Error) as e:
+            log.warning("shared rate limiter unavailable (%s); limiting per process", e)
+            _LIMITER = TokenBucket(GEOCODE_QPS, name="geocode")
+    return _LIMITER
+
+
+def _geocode_pool() -> ThreadPoolExecutor:
+    """Bounded pool shared by all requests of this process (re-made after fork)."""
+    global _POOL, _POOL_PID
+    if _POOL is None or _POOL_PID != os.getpid():
+        _POOL = ThreadPoolExecutor(max_workers=max(1, GEOCODE_WORKERS),
+                                   thread_name_prefix="geocode")
+        _POOL_PID = os.getpid()
+    return _POOL
+
+
+def _geocode_one(q: str, gmaps: googlemaps.Client,
+                 limiter: TokenBucket | None = None) -> Tuple[float, float]:
     """
     Geocode a single query with small, targeted retries for quota/rate hiccups.
+    With a limiter, every attempt first takes a token, and a quota error
+    pauses all callers of that limiter rather than just this one.
     NOTE: timeouts are set on the client; there is NO per-call timeout kwarg.
     """
     delays = [0.0, 0.5, 1.0, 2.0]  # bounded backoff
     last_err = None
+    quota = False
     for delay in delays:
         if delay:
-            time.sleep(delay)
+            if quota and limiter is not None:
+                limiter.backoff(delay)
+            else:
+                time.sleep(delay)
+        if limiter is not None:
+            limiter.acquire()
+        quota = False
         try:
-            results = gmaps.geocode(q)  # <-- no timeout kwarg here
+            with METRICS.stage("route.geocode_call"):
+                results = gmaps.geocode(q)  # <-- no timeout kwarg here
             if not results:
                 raise RuntimeError(f"No geocoding results for '{q}'")
             loc = results[0]["geometry"]["location"]
@@ -134,8 +1151,9 @@ def _geocode_one(q: str, gmaps: googlemaps.Client) -> Tuple[float, float]:
             msg = (e.args[1] if len(e.args) > 1 else "")
             last_err = f"Geocode API error for '{q}': {status} {msg}"
             log.warning(last_err)
-            if str(status) not in {"OVER_QUERY_LIMIT", "RESOURCE_EXHAUSTED"}:
+            if str(status) not in _QUOTA_STATUSES:
                 break
+            quota = True
         except Exception as e:
             last_err = f"Unexpected geocode error for '{q}': {e}"
             log.warning(last_err)
@@ -143,34 +1161,172 @@ def _geocode_one(q: str, gmaps: googlemaps.Client) -> Tuple[float, float]:
     raise RuntimeError(last_err or f"Failed to geocode '{q}'")
 
 
-def _geocode_many(names: List[str], gmaps: googlemaps.Client
-                  ) -> Dict[str, Tuple[float, float]]:
+# Geocoder backends tried in order; "google" (the remote fallback) is
+# handled by _geocode_many itself, the rest are local Geocoder objects.
+GEOCODERS = [b.strip() for b in os.getenv("GEOCODERS", "gazetteer,google").split(",") if b.strip()]
+
+
+def _load_gazetteer() -> Geocoder | None:
+    if not os.path.exists(GAZETTEER_PATH):
+        log.info("no gazetteer at %s (build it with `python gazetteer.py build`)", GAZETTEER_PATH)
+        return None
+    return Gazetteer.load(GAZETTEER_PATH)
+
+
+GEOCODER_BACKENDS = {
+    "gazetteer": _load_gazetteer,        # local place-name file, exact + fuzzy
+}
+_LOCAL_GEOCODERS: List[Geocoder] | None = None
+
+
+def _local_geocoders() -> List[Geocoder]:
+    """Local backends named in GEOCODERS, loaded once per process."""
+    global _LOCAL_GEOCODERS
+    if _LOCAL_GEOCODERS is None:
+        unknown = [b for b in GEOCODERS if b != "google" and b not in GEOCODER_BACKENDS]
+        if unknown:
+            log.warning("unknown geocoder backend(s) ignored: %s", ", ".join(unknown))
+        loaded = (GEOCODER_BACKENDS[b]() for b in GEOCODERS if b in GEOCODER_BACKENDS)
+        _LOCAL_GEOCODERS = [g for g in loaded if g is not None]
+    return _LOCAL_GEOCODERS
+
+
+_GEOCODE_CACHE: GeocodeCache | None = None
+
+
+def _geocode_cache() -> GeocodeCache | None:
+    """Process-wide persistent cache (None when GEOCODE_CACHE_PATH is empty)."""
+    global _GEOCODE_CACHE
+    if _GEOCODE_CACHE is None and GEOCODE_CACHE_PATH:
+        try:
+            _GEOCODE_CACHE = GeocodeCache(GEOCODE_CACHE_PATH)
+        except (OSError, sqlite3.Error) as e:
+            log.warning("geocode cache unavailable (%s); geocoding uncached", e)
+            return None
+    return _GEOCODE_CACHE
+
+
+def _geocode_many(names: List[str], gmaps: googlemaps.Client | None = None,
+                  cache: GeocodeCache | bool | None = None, workers: int | None = None,
+                  limiter: TokenBucket | None = None, local: List[Geocoder] | None = None,
+                  stats: Dict | None = None) -> Dict[str, Tuple[float, float]]:
+    """
+    Coordinates for every name, in input order: local backends first (the
+    gazetteer), then the persistent cache, then Google for the rest (the
+    client is only created if something missed). Google misses are geocoded
+    concurrently on the shared pool, paced by the shared token bucket;
+    whatever succeeded is written back to the cache before the first failure
+    (in input order) is raised. cache=False skips the cache, local=[] the
+    local backends; `stats` receives per-source counts.
+    """
+    if cache is None or cache is True:
+        cache = _geocode_cache()
+    elif cache is False:
+        cache = None
+    local = _local_geocoders() if local is None else local
+
+    queries: Dict[str, str] = {}                # key -> first spelling seen
+    for name in names:
+        key = normalize_query(name)
+        if key:
+            queries.setdefault(key, name)
+    hits: Dict[str, Tuple[float, float]] = {}
+    with METRICS.stage("route.geocode_local"):
+        for key, q in queries.items():
+            for backend in local:
+                latlng = backend.lookup(q)
+                if latlng is not None:
+                    hits[key] = latlng
+                    break
+    n_local = len(hits)
+    if cache is not None and len(hits) < len(queries):
+        with METRICS.stage("route.geocode_cache"):
+            hits.update(cache.get_many(q for k, q in queries.items() if k not in hits))
+    misses = {k: q for k, q in queries.items() if k not in hits}
+    if stats is not None:
+        stats.update({"local": n_local, "cache": len(hits) - n_local, "google": len(misses)})
+    if METRICS.enabled:
+        METRICS.inc("geocode_lookups", n_local, source="local")
+        if cache is not None:
+            METRICS.inc("geocode_cache_lookups", len(hits) - n_local, result="hit")
+            METRICS.inc("geocode_cache_lookups", len(misses), result="miss")
+        METRICS.inc("geocode_lookups", len(hits) - n_local, source="cache")
+        METRICS.inc("geocode_lookups", len(misses), source="google")
+
+    fresh: Dict[str, Tuple[float, float]] = {}
+    error: Exception | None = None
+    if misses:
+        if gmaps is None and "google" not in GEOCODERS:
+            raise RuntimeError("No local match for " + ", ".join(f"'{q}'" for q in misses.values())
+                               + " (Google fallback disabled)")
+        if gmaps is None:
+            with METRICS.stage("route.client"):
+                gmaps = _gmaps_client()
+        limiter = limiter if limiter is not None else _geocode_limiter()
+        workers = GEOCODE_WORKERS if workers is None else workers
+        t_google = time.perf_counter()
+        if workers > 1 and len(misses) > 1:
+            pool = (_geocode_pool() if workers == GEOCODE_WORKERS
+                    else ThreadPoolExecutor(max_workers=workers, thread_name_prefix="geocode"))
+            futures = {key: pool.submit(_geocode_one, q, gmaps, limiter)
+                       for key, q in misses.items()}
+            for key, fut in futures.items():
+                try:
+                    fresh[key] = fut.result()
+                except Exception as e:
+                    error = error or e
+            if pool is not _POOL:
+                pool.shutdown(wait=False)
+        else:
+            for key, q in misses.items():
+                try:
+                    fresh[key] = _geocode_one(q, gmaps, limiter)
+                except Exception as e:
+                    error = e
+                    break
+        METRICS.record_stage("route.geocode_google", time.perf_counter() - t_google)
+
+    if cache is not None and fresh:
+        try:
+            cache.put_many(fresh)
+        except sqlite3.Error as e:
+            log.warning("geocode cache write failed: %s", e)
+    if error is not None:
+        raise error
+
     out: Dict[str, Tuple[float, float]] = {}
-    cache: Dict[str, Tuple[float, float]] = {}
     for name in names:
-        if not name:
-            continue
-        key = " ".join(name.split()).lower()
-        if key in cache:
-            out[name] = cache[key]
-            continue
-        latlng = _geocode_one(name, gmaps)
-        cache[key] = latlng
-        out[name] = latlng
+        key = normalize_query(name)
+        if key:
+            out[name] = hits[key] if key in hits else fresh[key]
     return out
 
 
 # ----------------------------- public API ----------------------------
-def build_route(home: str, stops: List[str]) -> Dict:
+def build_route(home: str, stops: List[str], mode: str = "fast",
+                construct: str | None = None, improve=None,
+                large: bool | None = None, day_km: float | None = None,
+                starts: int = 1, seed: int | None = None, budget: float | None = None) -> Dict:
     """
     Compute a looped route:
       {
         "coordinates": { "City": [lat, lon], ... },
-        "order": ["Home", "Stop1", ..., "Home"]
+        "order": ["Home", "Stop1", ..., "Home"],
+        "solver": { "mode": ..., "construct": ..., "stages": [...] },
+        "geocoding": { "local": n, "cache": n, "google": n },
+        "days": [ {"day": 1, "stops": [...], "km": ...}, ... ]    # with day_km
       }
 
-    - Uses Google Geocoding only (no local fallback).
-    - NN seed + 2-opt refinement.
+    - Geocodes through the local gazetteer (gazetteer.py), then the
+      persistent geocode cache (geocode_cache.py), then Google.
+    - mode "fast" (NN + 2-opt) or "quality" (greedy edge + 2-opt + Or-2opt);
+      `construct` / `improve` override the mode's pipeline (see solve_tour).
+    - From LARGE_TRIP_MIN stops (or with large=True) the divide-and-conquer
+      solver runs that pipeline per cluster in a process pool (solve_large).
+    - day_km splits the loop into days of at most that many km (day_legs).
+    - starts > 1 keeps the best of that many seeded starts within `budget`
+      seconds (solve_multistart, capped at MULTISTART_MAX_STARTS /
+      MULTISTART_BUDGET_MAX); `seed` makes the run repeatable.
     """
     home = " ".join((home or "").split())
     if not home:
@@ -181,24 +1337,44 @@ def build_route(home: str, stops: List[str]) -> Dict:
 
     # Compose list with home exactly once at start
     names: List[str] = [home] + [s for s in stops if s.lower() != home.lower()]
-    gmaps = _gmaps_client()
-
+    geo_stats: Dict = {}
     if len(names) < 2:
-        coords_single = _geocode_many([home], gmaps)
+        coords_single = _geocode_many([home], stats=geo_stats)
         lat, lon = coords_single[home]
-        return {"coordinates": {home: [lat, lon]}, "order": [home, home]}
+        out = {"coordinates": {home: [lat, lon]}, "order": [home, home],
+               "geocoding": geo_stats}
+        if day_km:
+            out["days"] = day_legs([home, home], coords_single, day_km)
+        return out
 
-    # Geocode all
-    coords = _geocode_many(names, gmaps)
+    # Geocode all (gazetteer -> cache -> Google)
+    coords = _geocode_many(names, stats=geo_stats)
 
-    # Distances
-    dist = _build_distance_matrix(coords)
+    nodes = list(coords.keys())
+    pts = [coords[k] for k in nodes]
+    if large is None:
+        large = 0 < LARGE_TRIP_MIN <= len(nodes)
+    if large:
+        tour, stats = solve_large(pts, nodes.index(home), mode=mode,
+                                  construct=construct, improve=improve)
+    elif starts and int(starts) > 1:
+        tour, stats = solve_multistart(pts, nodes.index(home), mode=mode, construct=construct,
+                                       improve=improve, starts=int(starts), seed=seed, budget=budget)
+    else:
+        # Distances
+        with METRICS.stage("route.distance_matrix"):
+            D = _build_distance_matrix(pts)
 
-    # Build tour (open), then close by returning home
-    nn_path = _nearest_neighbor(home, list(coords.keys()), dist)
-    best = _two_opt(nn_path, dist)
+        # Build tour (closed, starting at home), then close by returning home
+        tour, stats = solve_tour(D, pts, nodes.index(home),
+                                 mode=mode, construct=construct, improve=improve)
+    best = [nodes[i] for i in tour]
     if best[-1] != home:
         best.append(home)
 
     coords_out = {k: [coords[k][0], coords[k][1]] for k in coords.keys()}
-    return {"coordinates": coords_out, "order": best}
\ No newline at end of file
+    out = {"coordinates": coords_out, "order": best, "solver": stats,
+           "geocoding": geo_stats}
+    if day_km:
+        out["days"] = day_legs(best, coords, float(day_km))
+    return out